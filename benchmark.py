@@ -0,0 +1,535 @@
+from argparse import ArgumentParser
+import contextlib
+import csv
+import io
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Startup budgets in milliseconds (median over the runs). Raise them only on purpose.
+IMPORT_BUDGET_MS = 150
+PROMPT_BUDGET_MS = 300
+
+PROMPT = b'Enter the number of your selection: '
+
+SYNTHETIC_TYPES = ['Normal', 'Fire', 'Water', 'Electric', 'Grass', 'Ice', 'Fighting', 'Poison', 'Ground',
+                   'Flying', 'Psychic', 'Bug', 'Rock', 'Ghost', 'Dragon', 'Dark', 'Steel', 'Fairy']
+
+
+def time_import(runs):
+
+    """
+    Times `import pokemon` in a fresh interpreter.
+
+    Parameters:
+        runs (int): The number of fresh interpreters to start.
+
+    Returns:
+        list: The wall-clock time of each run in milliseconds.
+    """
+
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', 'import pokemon'], cwd=HERE, check=True)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def time_first_prompt(file_path, runs):
+
+    """
+    Times `python pokemon.py <file>` from process start until the menu prompt is printed.
+
+    Parameters:
+        file_path (str): The pokedex JSON file passed to the CLI.
+        runs (int): The number of times to start the CLI.
+
+    Returns:
+        list: The wall-clock time of each run in milliseconds.
+
+    Raises:
+        RuntimeError: If the CLI exits before printing the prompt.
+    """
+
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, '-u', 'pokemon.py', file_path], cwd=HERE,
+                                stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        output = b''
+        while not output.endswith(PROMPT):
+            chunk = proc.stdout.read1(4096)
+            if not chunk:
+                raise RuntimeError('pokemon.py exited before showing the menu')
+            output += chunk
+        timings.append((time.perf_counter() - start) * 1000)
+        proc.communicate(b'9\n')
+    return timings
+
+
+def run_startup(args):
+
+    """
+    Runs the startup benchmark and checks it against the budgets.
+
+    Parameters:
+        args (argparse.Namespace): The parsed command-line arguments.
+
+    Returns:
+        int: 0 if every median is within its budget, otherwise 1.
+    """
+
+    results = {
+        'import': {'budget_ms': IMPORT_BUDGET_MS, 'timings_ms': time_import(args.runs)},
+        'first_prompt': {'budget_ms': PROMPT_BUDGET_MS, 'timings_ms': time_first_prompt(args.file, args.runs)}
+    }
+    status = 0
+    for name, result in results.items():
+        result['median_ms'] = statistics.median(result['timings_ms'])
+        result['ok'] = result['median_ms'] <= result['budget_ms']
+        print(f"{name}: median {result['median_ms']:.1f} ms (budget {result['budget_ms']} ms)"
+              f"{'' if result['ok'] else ' OVER BUDGET'}")
+        if not result['ok']:
+            status = 1
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    return status
+
+
+def generate_synthetic(count, json_path, csv_path, seed=0):
+
+    """
+    Writes a synthetic pokedex with the same schema as pokedex.json and pokedex.csv.
+
+    Parameters:
+        count (int): The number of Pokemon.
+        json_path (str): Where to write the JSON file.
+        csv_path (str): Where to write the CSV file.
+        seed (int, optional): The seed of the random stats and types.
+
+    Returns:
+        list: The English names of the generated Pokemon.
+    """
+
+    from pokemon import CSV_COLUMNS
+
+    rng = random.Random(seed)
+    names = []
+    with open(json_path, 'w', encoding='utf-8') as json_file, \
+            open(csv_path, 'w', encoding='utf-8', newline='') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(CSV_COLUMNS)
+        json_file.write('[')
+        for pkmn_id in range(1, count + 1):
+            name = f"Synthmon{pkmn_id}"
+            types = rng.sample(SYNTHETIC_TYPES, rng.choice((1, 2)))
+            base = {stat: rng.randint(5, 255) for stat in ('HP', 'Attack', 'Defense', 'Sp. Attack', 'Sp. Defense', 'Speed')}
+            record = {
+                'id': pkmn_id,
+                'name': {'english': name, 'japanese': f"シンセ{pkmn_id}", 'chinese': f"合成{pkmn_id}", 'french': f"Synthémon{pkmn_id}"},
+                'type': types,
+                'base': base
+            }
+            json_file.write((',\n' if pkmn_id > 1 else '\n') + json.dumps(record, ensure_ascii=False))
+            writer.writerow([pkmn_id, *record['name'].values(), types[0], types[1] if len(types) > 1 else '', *base.values()])
+            names.append(name)
+        json_file.write('\n]\n')
+    return names
+
+
+def summarize(timings_ns, total_s=None):
+
+    """
+    Summarizes per-operation timings.
+
+    Parameters:
+        timings_ns (list): The duration of each operation in nanoseconds.
+        total_s (float, optional): The wall-clock time of all the operations; the sum of
+            the timings when not given.
+
+    Returns:
+        dict: The operation count, throughput per second and latency percentiles in microseconds.
+    """
+
+    timings_us = sorted(t / 1000 for t in timings_ns)
+    total_s = total_s if total_s is not None else sum(timings_ns) / 1e9
+    def percentile(p):
+        return timings_us[min(len(timings_us) - 1, int(p / 100 * len(timings_us)))]
+    return {
+        'ops': len(timings_us),
+        'throughput_per_s': len(timings_us) / total_s if total_s else None,
+        'p50_us': percentile(50),
+        'p90_us': percentile(90),
+        'p99_us': percentile(99),
+        'max_us': timings_us[-1]
+    }
+
+
+def time_ops(operation, arguments):
+
+    """
+    Calls an operation once per argument tuple and records each call's duration.
+
+    Parameters:
+        operation (callable): The operation to time.
+        arguments (list): One tuple of positional arguments per call.
+
+    Returns:
+        dict: The summary of the timings (see summarize).
+    """
+
+    timings = []
+    start = time.perf_counter()
+    for args in arguments:
+        call_start = time.perf_counter_ns()
+        operation(*args)
+        timings.append(time.perf_counter_ns() - call_start)
+    return summarize(timings, time.perf_counter() - start)
+
+
+def synthetic_paths(count, work_dir):
+
+    """
+    Returns the paths of the synthetic JSON and CSV files of one size in work_dir.
+    """
+
+    return (os.path.join(work_dir, f"synthetic-{count}.json"),
+            os.path.join(work_dir, f"synthetic-{count}.csv"))
+
+
+def measure_size(count, work_dir, ops, seed=0):
+
+    """
+    Benchmarks every Pokedex operation on a synthetic pokedex of one size.
+
+    The files must already be in work_dir (see run_generate). Run it in a fresh process
+    (see run_scale) so that the peak RSS belongs to loading and querying this size only.
+    Everything the operations print is discarded, so stdout carries only the results.
+
+    Parameters:
+        count (int): The number of Pokemon in the synthetic files.
+        work_dir (str): The directory of the generated files.
+        ops (int): The number of calls per read operation; mutations use a fifth of it.
+        seed (int, optional): The seed of the queries.
+
+    Returns:
+        dict: The timings of each operation and the peak RSS in kilobytes.
+    """
+
+    from pokemon import Pokedex
+
+    json_path, csv_path = synthetic_paths(count, work_dir)
+    rng = random.Random(seed)
+    results = {'size': count}
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        pokedex = Pokedex(json_path, csv_path=csv_path)
+        results['load_s'] = time.perf_counter() - start
+
+        lookups = [(rng.choice(pokedex.pokemon).name['english'],) for _ in range(ops)]
+        results['search_by_name'] = time_ops(pokedex.search_by_name, lookups)
+        results['get_pokemon_name'] = time_ops(pokedex.get_pokemon_name, lookups)
+        results['search_by_type'] = time_ops(pokedex.search_by_type, [(rng.choice(SYNTHETIC_TYPES), 10) for _ in range(ops)])
+        stat_queries = []
+        for _ in range(ops):
+            low = rng.randint(5, 200)
+            stat_queries.append((rng.choice(('hp', 'attack', 'defense', 'sp_attack', 'sp_defense', 'speed')), low, low + 40))
+        results['search_by_stats'] = time_ops(pokedex.search_by_stats, stat_queries)
+        results['search_by_stat_ranges'] = time_ops(pokedex.search_by_stat_ranges,
+                                                    [({stat: (low, high), 'speed': (150, None)},) for stat, low, high in stat_queries])
+        results['search_by_prefix'] = time_ops(pokedex.search_by_prefix, [(name[:rng.randint(3, len(name))],) for (name,) in lookups])
+        results['search_fuzzy'] = time_ops(pokedex.search_fuzzy, [(name[:-1] + 'x',) for (name,) in lookups])
+        pairs = [(pokedex.search_by_name(a), pokedex.search_by_name(b)) for (a,), (b,) in zip(lookups, reversed(lookups))]
+        results['compare_pokemon'] = time_ops(pokedex.compare_pokemon, pairs)
+        results['get_all_types'] = time_ops(pokedex.get_all_types, [()] * ops)
+
+        mutations = max(1, ops // 5)
+        new_names = [f"Benchmon{i}" for i in range(mutations)]
+        results['add_pokemon'] = time_ops(pokedex.add_pokemon, [(['', name, '', '', '', 'Fire', '', '1', '2', '3', '4', '5', '6'],)
+                                                                for name in new_names])
+        results['remove_pokemon'] = time_ops(pokedex.remove_pokemon, [(name,) for name in new_names])
+
+    results['peak_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return results
+
+
+def git_revision():
+
+    """
+    Returns the current git revision of the repository, or None outside a git checkout.
+    """
+
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=HERE, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_scale(args):
+
+    """
+    Runs measure_size for each size in its own process and reports the results.
+
+    Parameters:
+        args (argparse.Namespace): The parsed command-line arguments.
+
+    Returns:
+        int: 0
+    """
+
+    report = {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'ops': args.ops,
+        'sizes': []
+    }
+    with tempfile.TemporaryDirectory() as work_dir:
+        for size in args.sizes:
+            # The data is written by its own process, so the peak RSS of measure leaves the generator out
+            subprocess.run([sys.executable, os.path.join(HERE, 'benchmark.py'), 'generate',
+                            '--size', str(size), '--dir', work_dir], cwd=HERE, check=True)
+            output = subprocess.run([sys.executable, os.path.join(HERE, 'benchmark.py'), 'measure',
+                                     '--size', str(size), '--dir', work_dir, '--ops', str(args.ops)],
+                                    cwd=HERE, capture_output=True, text=True, check=True).stdout
+            results = json.loads(output)
+            report['sizes'].append(results)
+            print(f"{size:>9} Pokemon: load {results['load_s']:.2f} s, peak RSS {results['peak_rss_kb'] / 1024:.0f} MB")
+            for name, summary in results.items():
+                if isinstance(summary, dict):
+                    print(f"    {name:<21} p50 {summary['p50_us']:>9.1f} us  p99 {summary['p99_us']:>9.1f} us"
+                          f"  {summary['throughput_per_s']:>10.0f} ops/s")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+def run_generate(args):
+
+    """
+    Writes the synthetic files of one size for run_measure; used by run_scale.
+
+    Parameters:
+        args (argparse.Namespace): The parsed command-line arguments.
+
+    Returns:
+        int: 0
+    """
+
+    generate_synthetic(args.size, *synthetic_paths(args.size, args.dir))
+    return 0
+
+
+def run_measure(args):
+
+    """
+    Runs measure_size for one size and prints the results as JSON; used by run_scale.
+
+    Parameters:
+        args (argparse.Namespace): The parsed command-line arguments.
+
+    Returns:
+        int: 0
+    """
+
+    print(json.dumps(measure_size(args.size, args.dir, args.ops)))
+    return 0
+
+
+def stress_reader(pokedex, names, stop, timings, errors, seed):
+
+    """
+    Runs random queries until stopped and checks that every answer is consistent.
+
+    Parameters:
+        pokedex (Pokedex): The shared Pokedex.
+        names (list): English names that the writer never removes.
+        stop (threading.Event): Set when the run is over.
+        timings (list): Where the duration of each query in nanoseconds is appended.
+        errors (list): Where a description of each inconsistency or exception is appended.
+        seed (int): The seed of the query mix.
+
+    Returns:
+        None
+    """
+
+    rng = random.Random(seed)
+    while not stop.is_set():
+        kind = rng.randrange(6)
+        start = time.perf_counter_ns()
+        try:
+            if kind == 0:
+                name = rng.choice(names)
+                pkmn = pokedex.search_by_name(name)
+                ok = pkmn is not None and pkmn.name['english'] == name
+            elif kind == 1:
+                pkmn = pokedex.search_by_name(f"Stressmon{rng.randrange(100)}")
+                ok = pkmn is None or pkmn.name['english'].startswith('Stressmon')
+            elif kind == 2:
+                p_type = rng.choice(SYNTHETIC_TYPES)
+                ok = all(p_type in pkmn.type for pkmn in pokedex.search_by_type(p_type))
+            elif kind == 3:
+                low = rng.randint(5, 200)
+                ok = all(low <= pkmn.speed for pkmn in pokedex.search_by_stat_ranges({'speed': (low, None)}))
+            elif kind == 4:
+                snapshot = pokedex.pokemon
+                ok = len({pkmn.id for pkmn in snapshot}) == len(snapshot)
+            else:
+                p_type = rng.choice(SYNTHETIC_TYPES)
+                page, cursor = pokedex.page_by_type(p_type, 50)
+                next_page, _ = pokedex.page_by_type(p_type, 50, cursor=cursor) if cursor else ([], None)
+                ids = [pkmn.id for pkmn in page + next_page]
+                ok = ids == sorted(set(ids)) and all(p_type in pkmn.type for pkmn in page + next_page)
+        except Exception as error:
+            errors.append(f"query {kind} raised {error!r}")
+            continue
+        timings.append(time.perf_counter_ns() - start)
+        if not ok:
+            errors.append(f"query {kind} returned an inconsistent answer")
+
+
+def stress_writer(pokedex, stop, timings, errors):
+
+    """
+    Adds and removes Stressmon Pokemon until stopped.
+
+    Parameters:
+        pokedex (Pokedex): The shared Pokedex.
+        stop (threading.Event): Set when the run is over.
+        timings (list): Where the duration of each mutation in nanoseconds is appended.
+        errors (list): Where a description of each exception is appended.
+
+    Returns:
+        None
+    """
+
+    i = 0
+    while not stop.is_set():
+        name = f"Stressmon{i % 100}"
+        try:
+            start = time.perf_counter_ns()
+            pokedex.add_pokemon(['', name, '', '', '', 'Fire', 'Flying', '50', '60', '70', '80', '90', '100'])
+            timings.append(time.perf_counter_ns() - start)
+            start = time.perf_counter_ns()
+            pokedex.remove_pokemon(name)
+            timings.append(time.perf_counter_ns() - start)
+        except Exception as error:
+            errors.append(f"mutation raised {error!r}")
+        i += 1
+
+
+def run_concurrency(args):
+
+    """
+    Stress-tests a Pokedex shared by many reader threads and one writer thread.
+
+    Readers check every answer they get while the writer keeps adding and removing
+    Pokemon; the run fails if any answer was inconsistent, any call raised, or the
+    Pokedex does not end up with exactly the Pokemon it started with.
+
+    Parameters:
+        args (argparse.Namespace): The parsed command-line arguments.
+
+    Returns:
+        int: 0 if the run was consistent, otherwise 1.
+    """
+
+    from pokemon import Pokedex
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        json_path = os.path.join(work_dir, 'synthetic.json')
+        csv_path = os.path.join(work_dir, 'synthetic.csv')
+        names = generate_synthetic(args.size, json_path, csv_path)
+        pokedex = Pokedex(json_path, csv_path=csv_path)
+        stop = threading.Event()
+        errors = []
+        read_timings = [[] for _ in range(args.readers)]
+        write_timings = []
+        threads = [threading.Thread(target=stress_reader, args=(pokedex, names, stop, timings, errors, seed))
+                   for seed, timings in enumerate(read_timings)]
+        threads.append(threading.Thread(target=stress_writer, args=(pokedex, stop, write_timings, errors)))
+        for thread in threads:
+            thread.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        if sorted(pkmn.id for pkmn in pokedex.pokemon) != list(range(1, args.size + 1)):
+            errors.append("the Pokedex does not hold the original Pokemon after the run")
+        if any(pokedex.search_by_name(f"Stressmon{i}") for i in range(100)):
+            errors.append("a removed Pokemon can still be found by name")
+
+    print(f"{args.readers} readers, 1 writer, {args.seconds} s on {args.size} Pokemon")
+    for name, timings in (('reads', [t for timings in read_timings for t in timings]), ('writes', write_timings)):
+        if not timings:
+            continue
+        summary = summarize(timings, args.seconds)
+        print(f"    {name:<7} p50 {summary['p50_us']:>9.1f} us  p99 {summary['p99_us']:>9.1f} us"
+              f"  {summary['throughput_per_s']:>10.0f} ops/s")
+    for error in errors[:10]:
+        print(f"ERROR: {error}")
+    if len(errors) > 10:
+        print(f"... and {len(errors) - 10} more errors")
+    return 1 if errors else 0
+
+
+def parse_args(arglist):
+
+    """
+    Parse command-line arguments.
+
+    Args:
+        arglist (list of str): a list of command-line arguments to parse.
+
+    Returns:
+        argparse.Namespace: a namespace object with the selected benchmark and its options.
+    """
+
+    parser = ArgumentParser(description="Benchmarks for the Pokedex")
+    commands = parser.add_subparsers(dest='command', required=True)
+    startup = commands.add_parser('startup', help="time `import pokemon` and the CLI's first prompt")
+    startup.add_argument('--file', default='pokedex.json', help="file of Pokemon")
+    startup.add_argument('--runs', type=int, default=10, help="number of runs")
+    startup.add_argument('--output', help="write the results to this JSON file")
+    startup.set_defaults(run=run_startup)
+    scale = commands.add_parser('scale', help="time every Pokedex operation on synthetic dexes of growing size")
+    scale.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000], help="numbers of Pokemon")
+    scale.add_argument('--ops', type=int, default=1000, help="calls per read operation")
+    scale.add_argument('--output', help="write the results to this JSON file")
+    scale.set_defaults(run=run_scale)
+    concurrency = commands.add_parser('concurrency', help="stress-test concurrent queries during mutations")
+    concurrency.add_argument('--size', type=int, default=10000, help="number of Pokemon")
+    concurrency.add_argument('--readers', type=int, default=8, help="number of reader threads")
+    concurrency.add_argument('--seconds', type=float, default=5, help="duration of the run")
+    concurrency.set_defaults(run=run_concurrency)
+    generate = commands.add_parser('generate', help="write the synthetic files of a single size (used by scale)")
+    generate.add_argument('--size', type=int, required=True)
+    generate.add_argument('--dir', required=True)
+    generate.set_defaults(run=run_generate)
+    measure = commands.add_parser('measure', help="benchmark a single size (used by scale)")
+    measure.add_argument('--size', type=int, required=True)
+    measure.add_argument('--dir', required=True)
+    measure.add_argument('--ops', type=int, default=1000)
+    measure.set_defaults(run=run_measure)
+    return parser.parse_args(arglist)
+
+
+if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+    sys.exit(args.run(args))
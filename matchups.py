@@ -0,0 +1,476 @@
+import heapq
+
+from pokemon import STATS
+
+TYPES = ('Normal', 'Fire', 'Water', 'Electric', 'Grass', 'Ice', 'Fighting', 'Poison', 'Ground',
+         'Flying', 'Psychic', 'Bug', 'Rock', 'Ghost', 'Dragon', 'Dark', 'Steel', 'Fairy')
+
+TYPE_INDEX = {p_type.casefold(): i for i, p_type in enumerate(TYPES)}
+
+# Damage multiplier of an attacking type (outer key) against a defending type (inner
+# key); pairs that are not listed are neutral
+TYPE_CHART = {
+    'Normal': {'Rock': 0.5, 'Ghost': 0, 'Steel': 0.5},
+    'Fire': {'Fire': 0.5, 'Water': 0.5, 'Grass': 2, 'Ice': 2, 'Bug': 2, 'Rock': 0.5, 'Dragon': 0.5, 'Steel': 2},
+    'Water': {'Fire': 2, 'Water': 0.5, 'Grass': 0.5, 'Ground': 2, 'Rock': 2, 'Dragon': 0.5},
+    'Electric': {'Water': 2, 'Electric': 0.5, 'Grass': 0.5, 'Ground': 0, 'Flying': 2, 'Dragon': 0.5},
+    'Grass': {'Fire': 0.5, 'Water': 2, 'Grass': 0.5, 'Poison': 0.5, 'Ground': 2, 'Flying': 0.5, 'Bug': 0.5,
+              'Rock': 2, 'Dragon': 0.5, 'Steel': 0.5},
+    'Ice': {'Fire': 0.5, 'Water': 0.5, 'Grass': 2, 'Ice': 0.5, 'Ground': 2, 'Flying': 2, 'Dragon': 2, 'Steel': 0.5},
+    'Fighting': {'Normal': 2, 'Ice': 2, 'Poison': 0.5, 'Flying': 0.5, 'Psychic': 0.5, 'Bug': 0.5, 'Rock': 2,
+                 'Ghost': 0, 'Dark': 2, 'Steel': 2, 'Fairy': 0.5},
+    'Poison': {'Grass': 2, 'Poison': 0.5, 'Ground': 0.5, 'Rock': 0.5, 'Ghost': 0.5, 'Steel': 0, 'Fairy': 2},
+    'Ground': {'Fire': 2, 'Electric': 2, 'Grass': 0.5, 'Poison': 2, 'Flying': 0, 'Bug': 0.5, 'Rock': 2, 'Steel': 2},
+    'Flying': {'Electric': 0.5, 'Grass': 2, 'Fighting': 2, 'Bug': 2, 'Rock': 0.5, 'Steel': 0.5},
+    'Psychic': {'Fighting': 2, 'Poison': 2, 'Psychic': 0.5, 'Dark': 0, 'Steel': 0.5},
+    'Bug': {'Fire': 0.5, 'Grass': 2, 'Fighting': 0.5, 'Poison': 0.5, 'Flying': 0.5, 'Psychic': 2, 'Ghost': 0.5,
+            'Dark': 2, 'Steel': 0.5, 'Fairy': 0.5},
+    'Rock': {'Fire': 2, 'Ice': 2, 'Fighting': 0.5, 'Ground': 0.5, 'Flying': 2, 'Bug': 2, 'Steel': 0.5},
+    'Ghost': {'Normal': 0, 'Psychic': 2, 'Ghost': 2, 'Dark': 0.5},
+    'Dragon': {'Dragon': 2, 'Steel': 0.5, 'Fairy': 0},
+    'Dark': {'Fighting': 0.5, 'Psychic': 2, 'Ghost': 2, 'Dark': 0.5, 'Fairy': 0.5},
+    'Steel': {'Fire': 0.5, 'Water': 0.5, 'Electric': 0.5, 'Ice': 2, 'Rock': 2, 'Steel': 0.5, 'Fairy': 2},
+    'Fairy': {'Fire': 0.5, 'Fighting': 2, 'Poison': 0.5, 'Dragon': 2, 'Dark': 2, 'Steel': 0.5}
+}
+
+# Immunities count as this multiplier in the log-scale scores, so they weigh like a
+# strong resistance instead of an infinite one
+IMMUNITY_MULTIPLIER = 0.125
+
+
+def effectiveness_matrix():
+
+    """
+    Returns the type chart as an 18x18 NumPy array indexed by (attacking, defending) type.
+    """
+
+    import numpy as np
+
+    matrix = np.ones((len(TYPES), len(TYPES)))
+    for attacking, row in TYPE_CHART.items():
+        for defending, multiplier in row.items():
+            matrix[TYPE_INDEX[attacking.casefold()], TYPE_INDEX[defending.casefold()]] = multiplier
+    return matrix
+
+
+def _typing(types):
+
+    """
+    Returns the indexes in TYPES of a list of type names, sorted; unknown types are left out.
+    """
+
+    return tuple(sorted({TYPE_INDEX[key] for key in (t.casefold() for t in types) if key in TYPE_INDEX}))
+
+
+def _typing_name(typing):
+
+    """
+    Returns a typing as a name such as 'Fire/Flying'; 'None' when it has no known type.
+    """
+
+    return '/'.join(TYPES[i] for i in typing) or 'None'
+
+
+# Set by _init_search in each worker process of MatchupEngine.build_team
+_search = None
+
+
+def _init_search(scores, weights, size, initial):
+
+    """
+    Stores the data of a team search in a worker process.
+    """
+
+    global _search
+    _search = (scores, weights, size, initial)
+
+
+def _team_bound(np, scores, weights, current, value, start, remaining):
+
+    """
+    Returns an upper bound on the best team value reachable from a partial team.
+
+    The team value sums, over the opponents, the best score of a member against each
+    one. Adding members can only raise it by less than the sum of their separate gains
+    (the value is submodular), so the partial value plus the largest `remaining` gains
+    of the candidates still allowed is an upper bound.
+
+    Parameters:
+        np (module): NumPy.
+        scores (ndarray): Candidate-by-opponent scores.
+        weights (ndarray): The number of Pokemon of each opponent typing.
+        current (ndarray): The best score of the partial team against each opponent.
+        value (float): The value of the partial team.
+        start (int): The first candidate that may still be added.
+        remaining (int): The number of members still to add.
+
+    Returns:
+        tuple: (bound, gains), with the gain of each candidate from start on.
+    """
+
+    gains = (np.maximum(scores[start:], current) - current) @ weights
+    if remaining >= len(gains):
+        return value + gains.sum(), gains
+    return value + np.partition(gains, len(gains) - remaining)[-remaining:].sum(), gains
+
+
+def _search_branch(first):
+
+    """
+    Finds the best team whose lowest-numbered candidate is `first` by branch and bound.
+
+    Parameters:
+        first (int): The index of the first member among the candidates.
+
+    Returns:
+        tuple: (value, members) of the best team found that beats the initial value
+            given to _init_search, otherwise None.
+    """
+
+    import numpy as np
+
+    scores, weights, size, initial = _search
+    best = [initial, None]
+    floor = np.full(scores.shape[1], scores.min())
+    # later_max[i] is the best score of candidates i and after against each opponent; no
+    # team can do better than that against anyone
+    later_max = np.maximum.accumulate(np.vstack([scores, floor])[::-1])[::-1]
+
+    def visit(members, current, value):
+        if len(members) == size or members[-1] + 1 == len(scores):
+            if value > best[0] + 1e-9:
+                best[0], best[1] = value, list(members)
+            return
+        start = members[-1] + 1
+        remaining = size - len(members)
+        if remaining == 1:
+            # The best last member is simply the one with the largest gain
+            gains = (np.maximum(scores[start:], current) - current) @ weights
+            offset = int(gains.argmax())
+            if value + gains[offset] > best[0] + 1e-9:
+                best[0], best[1] = value + float(gains[offset]), members + [start + offset]
+            return
+        bound, gains = _team_bound(np, scores, weights, current, value, start, remaining)
+        if min(bound, float((np.maximum(current, later_max[start]) - floor) @ weights)) <= best[0] + 1e-9:
+            return
+        ceilings = ((np.maximum(np.maximum(current, scores[start:]), later_max[start + 1:]) - floor) @ weights).tolist()
+        # The bound of each child: its gain plus the largest gains among the candidates after it
+        gain_list = gains.tolist()
+        later_best = [0.0] * (len(gain_list) + 1)
+        largest = []
+        for offset in range(len(gain_list) - 1, -1, -1):
+            later_best[offset + 1] = sum(largest)
+            if remaining > 1:
+                if len(largest) < remaining - 1:
+                    heapq.heappush(largest, gain_list[offset])
+                elif gain_list[offset] > largest[0]:
+                    heapq.heapreplace(largest, gain_list[offset])
+        # Best gains first, so good teams are found early and prune the rest
+        for offset in sorted(range(len(gain_list)), key=lambda offset: -gain_list[offset]):
+            if min(value + gain_list[offset] + later_best[offset + 1], ceilings[offset]) <= best[0] + 1e-9:
+                continue
+            candidate = start + offset
+            visit(members + [candidate], np.maximum(current, scores[candidate]), value + gain_list[offset])
+
+    current = np.maximum(floor, scores[first])
+    visit([first], current, float((current - floor) @ weights))
+    return (best[0], best[1]) if best[1] is not None else None
+
+
+class MatchupEngine:
+
+    """
+    Scores Pokemon and teams against a whole Pokedex from the type chart.
+
+    A matchup only depends on the typings involved, so the Pokedex is reduced to its
+    distinct typings (at most 171) and how many Pokemon have each. The defensive vector
+    of a typing holds the multiplier each of the 18 attacking types deals to it. The
+    score of typing A against typing B is log2 of the best multiplier A's types deal to
+    B minus log2 of the best multiplier B's types deal to A. It is positive when A has
+    the upper hand. All typing-against-typing scores are computed once, so scoring
+    against the whole Pokedex is a weighted sum over one row of that matrix.
+
+    The engine follows add_pokemon and remove_pokemon: it recounts the typings the next
+    time it is used after the Pokedex changed.
+
+    Attributes:
+        pokedex (Pokedex): The Pokedex the opponents come from.
+        chart (ndarray): The 18x18 type chart (see effectiveness_matrix).
+    """
+
+    def __init__(self, pokedex):
+
+        """
+        Precomputes the typings of a Pokedex and their scores against each other.
+
+        Parameters:
+            pokedex (Pokedex): The Pokedex to score against.
+
+        Returns:
+            None
+        """
+
+        import numpy as np
+
+        self._np = np
+        self.pokedex = pokedex
+        self.chart = effectiveness_matrix()
+        self._source = None
+        self._refresh()
+
+    def _refresh(self):
+
+        """
+        Recounts the typings if the Pokedex has changed since the last call.
+
+        The Pokedex replaces its list of Pokemon on every change, so the identity of
+        the list tells whether it changed.
+        """
+
+        np = self._np
+        pokemon = self.pokedex.pokemon
+        if pokemon is self._source:
+            return
+        typings = {}
+        numbers = np.empty(len(pokemon), dtype=np.intp)
+        for i, pkmn in enumerate(pokemon):
+            numbers[i] = typings.setdefault(_typing(pkmn.type), len(typings))
+        self._typings = list(typings)
+        self._numbers = numbers
+        self._counts = np.bincount(numbers, minlength=len(typings)).astype(float)
+        self._defense = self._defensive_vectors(self._typings)
+        self._attack = self._attack_masks(self._typings)
+        self._total = len(pokemon)
+        self._source = pokemon
+
+    def _defensive_vectors(self, typings):
+
+        """
+        Returns, for each typing, the multiplier each attacking type deals to it.
+        """
+
+        vectors = self._np.ones((len(typings), len(TYPES)))
+        for row, typing in enumerate(typings):
+            for p_type in typing:
+                vectors[row] *= self.chart[:, p_type]
+        return vectors
+
+    def _attack_masks(self, typings):
+
+        """
+        Returns, for each typing, a boolean mask of the attacking types it has.
+        """
+
+        masks = self._np.zeros((len(typings), len(TYPES)), dtype=bool)
+        for row, typing in enumerate(typings):
+            masks[row, list(typing)] = True
+        return masks
+
+    def _offense(self, attack, defense):
+
+        """
+        Returns the best multiplier each attacker deals to each defender.
+
+        Parameters:
+            attack (ndarray): Attacking type masks, one row per attacker.
+            defense (ndarray): Defensive vectors, one row per defender.
+
+        Returns:
+            ndarray: One row per attacker and one column per defender. Attackers with
+                no known type deal neutral damage.
+        """
+
+        np = self._np
+        offense = np.where(attack[:, None, :], defense[None, :, :], -np.inf).max(axis=2)
+        offense[~attack.any(axis=1)] = 1
+        return offense
+
+    def _scores(self, typings):
+
+        """
+        Returns the score of each of some typings against each typing of the Pokedex.
+
+        Parameters:
+            typings (list): Typings as tuples of indexes in TYPES.
+
+        Returns:
+            ndarray: One row per given typing and one column per typing of the Pokedex.
+        """
+
+        np = self._np
+        attack = self._attack_masks(typings)
+        dealt = self._offense(attack, self._defense)
+        taken = self._offense(self._attack, self._defensive_vectors(typings)).T
+        return np.log2(np.maximum(dealt, IMMUNITY_MULTIPLIER)) - np.log2(np.maximum(taken, IMMUNITY_MULTIPLIER))
+
+    def _summary(self, scores):
+
+        """
+        Summarizes the best score against each typing of the Pokedex.
+        """
+
+        np = self._np
+        counts = self._counts
+        total = self._total or 1
+        order = np.lexsort((-counts, scores))
+        return {
+            'mean': float(scores @ counts / total),
+            'favorable': float(counts[scores > 0].sum() / total),
+            'neutral': float(counts[scores == 0].sum() / total),
+            'unfavorable': float(counts[scores < 0].sum() / total),
+            'threats': [_typing_name(self._typings[i]) for i in order[:5].tolist() if scores[i] < 0]
+        }
+
+    def defensive_vector(self, pkmn):
+
+        """
+        Returns the multiplier each of the 18 attacking types deals to a Pokemon.
+
+        Parameters:
+            pkmn (Pokemon): The defending Pokemon.
+
+        Returns:
+            dict: Maps each type in TYPES to its multiplier.
+        """
+
+        vector = self._defensive_vectors([_typing(pkmn.type)])[0]
+        return dict(zip(TYPES, vector.tolist()))
+
+    def scores(self, pkmn):
+
+        """
+        Returns the score of a Pokemon against every Pokemon of the Pokedex in one pass.
+
+        Parameters:
+            pkmn (Pokemon): The Pokemon to score.
+
+        Returns:
+            ndarray: The score against each Pokemon, in the order of pokedex.pokemon.
+        """
+
+        self._refresh()
+        return self._scores([_typing(pkmn.type)])[0][self._numbers]
+
+    def score_pokemon(self, pkmn):
+
+        """
+        Summarizes how a Pokemon fares against the whole Pokedex.
+
+        Parameters:
+            pkmn (Pokemon): The Pokemon to score.
+
+        Returns:
+            dict: 'mean' score, the 'favorable', 'neutral' and 'unfavorable' fractions of
+                the Pokedex, and up to five opposing typings it fares worst against ('threats').
+        """
+
+        self._refresh()
+        return self._summary(self._scores([_typing(pkmn.type)])[0])
+
+    def score_team(self, team):
+
+        """
+        Summarizes how a team fares against the whole Pokedex, where each opponent is
+        met by the member with the best score against it.
+
+        Parameters:
+            team (list): The Pokemon of the team.
+
+        Returns:
+            dict: As for score_pokemon, plus 'weaknesses', which maps each attacking type
+                that at least half of the team is weak to onto the number of weak members.
+        """
+
+        self._refresh()
+        typings = [_typing(pkmn.type) for pkmn in team]
+        summary = self._summary(self._scores(typings).max(axis=0))
+        weak = (self._defensive_vectors(typings) > 1).sum(axis=0)
+        summary['weaknesses'] = {TYPES[i]: int(weak[i]) for i in range(len(TYPES)) if weak[i] and 2 * weak[i] >= len(team)}
+        return summary
+
+    def build_team(self, size=6, pool=None, processes=None):
+
+        """
+        Finds the team whose members together fare best against the whole Pokedex.
+
+        The value of a team is the sum, over the Pokedex, of the best member's score
+        against each Pokemon. Only the typing matters for it, so candidates are the
+        distinct typings of the pool, each represented by its Pokemon with the highest
+        base stat total. A greedy team gives the first lower bound. Then a branch and
+        bound search drops every partial team whose submodular upper bound cannot beat
+        the best team so far. Its top-level branches, one per first member, run in a
+        pool of worker processes.
+
+        Parameters:
+            size (int, optional): The number of members.
+            pool (list, optional): The Pokemon to choose from; the whole Pokedex by default.
+            processes (int, optional): The number of worker processes. The default is
+                one per CPU; 1 searches in this process.
+
+        Returns:
+            list: The Pokemon of the best team, ordered from the strongest alone.
+        """
+
+        self._refresh()
+        np = self._np
+        representatives = {}
+        for pkmn in (pool if pool is not None else self._source):
+            typing = _typing(pkmn.type)
+            total = sum(getattr(pkmn, stat) for stat in STATS)
+            best = representatives.get(typing)
+            if best is None or (total, -pkmn.id) > best[0]:
+                representatives[typing] = ((total, -pkmn.id), pkmn)
+        if not representatives or size < 1:
+            return []
+
+        typings = list(representatives)
+        scores = self._scores(typings)
+        weights = self._counts
+        floor = np.full(len(weights), scores.min())
+        alone = (scores - floor) @ weights
+        order = np.argsort(-alone, kind='stable')
+        typings = [typings[i] for i in order.tolist()]
+        scores = scores[order]
+        size = min(size, len(typings))
+
+        # A greedy team gives the first bound for the search
+        members = []
+        current = floor
+        value = 0.0
+        for _ in range(size):
+            gains = (np.maximum(scores, current) - current) @ weights
+            gains[members] = -1
+            candidate = int(gains.argmax())
+            members.append(candidate)
+            current = np.maximum(current, scores[candidate])
+            value += float(gains[candidate])
+        # Then swap single members while that improves the team
+        improved = True
+        while improved:
+            improved = False
+            for position in range(len(members)):
+                others = members[:position] + members[position + 1:]
+                base = np.maximum(floor, scores[others].max(axis=0)) if others else floor
+                values = (np.maximum(scores, base) - floor) @ weights
+                values[others] = -1
+                candidate = int(values.argmax())
+                if values[candidate] > value + 1e-9:
+                    members[position] = candidate
+                    value = float(values[candidate])
+                    improved = True
+        best_value, best_members = value, sorted(members)
+
+        firsts = range(len(typings) - size + 1)
+        initial = best_value
+        if processes == 1 or len(firsts) <= 1:
+            _init_search(scores, weights, size, initial)
+            results = [_search_branch(first) for first in firsts]
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(processes, initializer=_init_search,
+                                     initargs=(scores, weights, size, initial)) as executor:
+                results = list(executor.map(_search_branch, firsts))
+        for result in results:
+            if result is not None and result[0] > best_value + 1e-9:
+                best_value, best_members = result
+        return [representatives[typings[i]][1] for i in sorted(best_members)]
@@ -0,0 +1,264 @@
+from argparse import ArgumentParser
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+
+from pokemon import Pokedex, execute_query
+
+
+# Largest number of Pokemon a query answered on the event loop can return
+INLINE_RESULTS = 100
+
+
+def runs_in_executor(query):
+
+    """
+    Tells whether a query should run in a worker thread instead of on the event loop.
+
+    Adds and removes wait for the journal to reach the disk, and type searches, composite
+    queries and pages without a small bound can return and encode every Pokemon.
+
+    Parameters:
+        query (dict): The decoded query.
+
+    Returns:
+        bool: True for a query that can block the event loop.
+    """
+
+    op = query.get('op')
+    if op in ('add', 'remove'):
+        return True
+    if op in ('type', 'query'):
+        bound = query.get('limit')
+    elif op == 'page':
+        bound = query.get('size')
+    else:
+        return False
+    return not isinstance(bound, int) or bound > INLINE_RESULTS
+
+
+async def handle_client(pokedex, reader, writer):
+
+    """
+    Answers the queries of one client until it disconnects.
+
+    The protocol is the one of the batch mode: the client sends one JSON query per line
+    (see pokemon.execute_query) and gets one JSON result per line, in the same order.
+    Lookups run directly on the event loop; queries that write to disk or can return
+    many Pokemon (see runs_in_executor) run and are encoded in a worker thread, so they
+    do not hold up the other clients. The Pokedex is safe to use from several threads.
+
+    Parameters:
+        pokedex (Pokedex): The resident Pokedex.
+        reader (asyncio.StreamReader): The client's input stream.
+        writer (asyncio.StreamWriter): The client's output stream.
+
+    Returns:
+        None
+    """
+
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+
+    def answer(query):
+        return encode(execute_query(pokedex, query))
+
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            if not line.strip():
+                continue
+            try:
+                query = json.loads(line)
+            except json.JSONDecodeError as error:
+                response = encode({'ok': False, 'error': f"Invalid JSON: {error}"})
+            else:
+                if not isinstance(query, dict):
+                    response = encode({'ok': False, 'error': "Each query must be a JSON object"})
+                elif runs_in_executor(query):
+                    response = await loop.run_in_executor(None, answer, query)
+                else:
+                    response = answer(query)
+            writer.write(response.encode('utf-8') + b'\n')
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(pokedex, host='127.0.0.1', port=8765, unix_path=None):
+
+    """
+    Serves a Pokedex over TCP, or over a Unix socket, until cancelled.
+
+    Parameters:
+        pokedex (Pokedex): The Pokedex to keep resident.
+        host (str, optional): The address to listen on.
+        port (int, optional): The TCP port to listen on.
+        unix_path (str, optional): Listen on this Unix socket instead of TCP.
+
+    Returns:
+        None
+    """
+
+    def client_connected(reader, writer):
+        return handle_client(pokedex, reader, writer)
+
+    if unix_path:
+        server = await asyncio.start_unix_server(client_connected, path=unix_path)
+    else:
+        server = await asyncio.start_server(client_connected, host, port)
+    addresses = ', '.join(str(sock.getsockname()) for sock in server.sockets)
+    print(f"Serving {len(pokedex.pokemon)} Pokemon on {addresses}", file=sys.stderr)
+    async with server:
+        await server.serve_forever()
+
+
+def sample_queries(file_path, count, seed=0):
+
+    """
+    Builds a mix of read queries over the Pokemon of a pokedex file.
+
+    Parameters:
+        file_path (str): The pokedex JSON file the server was started with.
+        count (int): The number of queries.
+        seed (int, optional): The seed of the random mix.
+
+    Returns:
+        list: The queries, already encoded as JSON lines.
+    """
+
+    with open(file_path, 'r', encoding='utf-8') as f:
+        names = [data['name']['english'] for data in json.load(f)]
+    types = ['Fire', 'Water', 'Grass', 'Dragon AND Flying', 'Water OR Ice']
+    stats = ['hp', 'attack', 'defense', 'sp_attack', 'sp_defense', 'speed']
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.4:
+            query = {'op': 'name', 'name': rng.choice(names)}
+        elif kind < 0.6:
+            query = {'op': 'translate', 'name': rng.choice(names)}
+        elif kind < 0.75:
+            query = {'op': 'type', 'type': rng.choice(types), 'limit': 5}
+        elif kind < 0.9:
+            low = rng.randint(20, 150)
+            query = {'op': 'stats', 'stat': rng.choice(stats), 'min': low, 'max': low + 30}
+        else:
+            query = {'op': 'compare', 'first': rng.choice(names), 'second': rng.choice(names)}
+        queries.append((json.dumps(query) + '\n').encode('utf-8'))
+    return queries
+
+
+async def run_client(queries, latencies, host, port, unix_path):
+
+    """
+    Sends queries one at a time over one connection and records each round-trip time.
+
+    Parameters:
+        queries (list): The encoded queries to send.
+        latencies (list): Where the round-trip times, in seconds, are appended.
+        host (str): The server address.
+        port (int): The server TCP port.
+        unix_path (str): The server Unix socket, used instead of TCP when given.
+
+    Returns:
+        None
+    """
+
+    if unix_path:
+        reader, writer = await asyncio.open_unix_connection(unix_path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    for query in queries:
+        start = time.perf_counter()
+        writer.write(query)
+        await writer.drain()
+        await reader.readline()
+        latencies.append(time.perf_counter() - start)
+    writer.close()
+    await writer.wait_closed()
+
+
+async def load_test(file_path, clients, requests, host='127.0.0.1', port=8765, unix_path=None):
+
+    """
+    Drives a running server with concurrent clients and summarizes the latencies.
+
+    Parameters:
+        file_path (str): The pokedex JSON file used to pick query arguments.
+        clients (int): The number of concurrent connections.
+        requests (int): The number of queries each client sends.
+        host (str, optional): The server address.
+        port (int, optional): The server TCP port.
+        unix_path (str, optional): The server Unix socket, used instead of TCP when given.
+
+    Returns:
+        dict: The request count, throughput per second, and p50/p99/max latency in milliseconds.
+    """
+
+    queries = sample_queries(file_path, requests * clients)
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(run_client(queries[i * requests:(i + 1) * requests], latencies, host, port, unix_path)
+                           for i in range(clients)))
+    elapsed = time.perf_counter() - start
+    cuts = statistics.quantiles(latencies, n=100)
+    return {
+        'requests': len(latencies),
+        'throughput_per_s': len(latencies) / elapsed,
+        'p50_ms': cuts[49] * 1000,
+        'p99_ms': cuts[98] * 1000,
+        'max_ms': max(latencies) * 1000
+    }
+
+
+def parse_args(arglist):
+
+    """
+    Parse command-line arguments.
+
+    Args:
+        arglist (list of str): a list of command-line arguments to parse.
+
+    Returns:
+        argparse.Namespace: a namespace object with the selected command and its options.
+    """
+
+    parser = ArgumentParser(description="Resident Pokedex query server")
+    commands = parser.add_subparsers(dest='command', required=True)
+    for name, help_text in (('serve', "serve a Pokedex"), ('bench', "load-test a running server")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("file", help="file of Pokemon")
+        command.add_argument("--host", default='127.0.0.1', help="server address")
+        command.add_argument("--port", type=int, default=8765, help="server TCP port")
+        command.add_argument("--unix", metavar="PATH", help="use this Unix socket instead of TCP")
+    commands.choices['serve'].add_argument("--snapshot", action="store_true",
+                                           help="cache the parsed file in a binary snapshot next to it")
+    commands.choices['serve'].add_argument("--watch", type=float, metavar="SECONDS",
+                                           help="reload the file when it changes, polling at this interval")
+    commands.choices['bench'].add_argument("--clients", type=int, default=50, help="concurrent connections")
+    commands.choices['bench'].add_argument("--requests", type=int, default=1000, help="queries per connection")
+    return parser.parse_args(arglist)
+
+
+if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+    if args.command == 'serve':
+        pokedex = Pokedex(args.file, snapshot=args.snapshot)
+        if args.watch:
+            pokedex.watch(args.watch)
+        try:
+            asyncio.run(serve(pokedex, args.host, args.port, args.unix))
+        except KeyboardInterrupt:
+            pass
+    else:
+        summary = asyncio.run(load_test(args.file, args.clients, args.requests, args.host, args.port, args.unix))
+        print(json.dumps(summary, indent=2))
@@ -1,10 +1,23 @@
 from argparse import ArgumentParser
 import json
 import random
+import array
+import base64
+import hashlib
+import heapq
+import mmap
+import os
+import struct
+import bisect
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+import re
 import csv
 import sys
-import pandas as pd
-import matplotlib.pyplot as plt
+import threading
+import time
+import functools
+import gc
 
 
 class Pokemon:
@@ -26,8 +39,14 @@ class Pokemon:
     Methods:
         def __init__(self, data):
             Initializes a Pokemon object with the data obtained from the JSON file.
+        
+        def to_dict(self):
+            Returns the Pokemon's data in the layout of the JSON file.
     """
     
+    # A Pokedex holds one object per Pokemon in every mode, so keep them small
+    __slots__ = ('id', 'name', 'type', 'hp', 'attack', 'defense', 'sp_attack', 'sp_defense', 'speed')
+    
     def __init__(self, data):
         
         """
@@ -53,258 +72,3916 @@ class Pokemon:
         self.sp_defense = data['base']['Sp. Defense']
         self.speed = data['base']['Speed']
 
-class Pokedex:
+    def to_dict(self):
+        
+        """
+        Returns the Pokemon's data in the same layout as an entry of the JSON file.
+        
+        Returns:
+            dict: The id, name, type and base stats of the Pokemon.
+        """
+        
+        return {
+            'id': self.id,
+            'name': self.name,
+            'type': self.type,
+            'base': {
+                'HP': self.hp,
+                'Attack': self.attack,
+                'Defense': self.defense,
+                'Sp. Attack': self.sp_attack,
+                'Sp. Defense': self.sp_defense,
+                'Speed': self.speed
+            }
+        }
+
+NAME_LANGUAGES = ('english', 'japanese', 'chinese', 'french')
+
+STATS = ('hp', 'attack', 'defense', 'sp_attack', 'sp_defense', 'speed')
+
+STAT_ALIASES = {
+    'hp': 'hp',
+    'attack': 'attack',
+    'defense': 'defense',
+    'sp_attack': 'sp_attack',
+    'sp. attack': 'sp_attack',
+    'sp attack': 'sp_attack',
+    'special attack': 'sp_attack',
+    'sp_defense': 'sp_defense',
+    'sp. defense': 'sp_defense',
+    'sp defense': 'sp_defense',
+    'special defense': 'sp_defense',
+    'speed': 'speed'
+}
+
+CSV_COLUMNS = ['id', 'name/english', 'name/japanese', 'name/chinese', 'name/french',
+               'type/0', 'type/1', 'base/HP', 'base/Attack', 'base/Defense',
+               'base/Sp. Attack', 'base/Sp. Defense', 'base/Speed']
+
+
+def _name_keys(pkmn):
     
     """
-    A class representing a collection of Pokemon.
+    Returns the case-folded names of a Pokemon in every language, without duplicates.
+    
+    Parameters:
+        pkmn (Pokemon): The Pokemon whose names are returned.
+        
+    Returns:
+        set: The case-folded, non-empty names of the Pokemon.
+    """
+    
+    return {pkmn.name[lang].casefold() for lang in NAME_LANGUAGES if pkmn.name.get(lang)}
+
+
+def _stat_attr(stat_name):
+    
+    """
+    Returns the Pokemon attribute for a stat name such as 'Sp. Attack' or 'speed'.
+    
+    Parameters:
+        stat_name (str): The name of the stat, in any case.
+        
+    Returns:
+        str: One of the names in STATS.
+        
+    Raises:
+        ValueError: If the name is not a known stat.
+    """
+    
+    try:
+        return STAT_ALIASES[stat_name.strip().lower()]
+    except KeyError:
+        raise ValueError(f"Unknown stat: {stat_name}") from None
+
+
+def _parse_type_query(p_type, operator='and'):
+    
+    """
+    Splits a type query into its types and its operator.
+    
+    Parameters:
+        p_type (str or list): A type, a list of types, or a string joining types with
+            AND or OR, such as "Fire AND Flying".
+        operator (str): 'and' or 'or', used when p_type is a list.
+        
+    Returns:
+        tuple: (types, operator), with the operator in lower case.
+        
+    Raises:
+        ValueError: If the operator is not 'and' or 'or', or a string query mixes both.
+    """
+    
+    if isinstance(p_type, str):
+        parts = re.split(r'\s+(and|or)\s+', p_type.strip(), flags=re.IGNORECASE)
+        types = parts[::2]
+        operators = {op.lower() for op in parts[1::2]}
+        if len(operators) > 1:
+            raise ValueError("Type queries cannot mix AND and OR")
+        if operators:
+            operator = operators.pop()
+    else:
+        types = list(p_type)
+    operator = operator.lower()
+    if operator not in ('and', 'or'):
+        raise ValueError(f"Unknown operator: {operator}")
+    return types, operator
+
+
+# The Japanese, Chinese and French name columns, which a row may leave out
+OPTIONAL_NAME_COLUMNS = CSV_COLUMNS[2:5]
+
+
+def _complete_csv_row(row):
+    
+    """
+    Returns a row in the pokedex.csv layout with a value for every column.
+    
+    Parameters:
+        row (list): The values of the row, in the order of CSV_COLUMNS, either with
+            every column or without the OPTIONAL_NAME_COLUMNS.
+        
+    Returns:
+        list: The row, with empty names for the optional columns it left out.
+        
+    Raises:
+        ValueError: If the row has neither length.
+    """
+    
+    if len(row) == len(CSV_COLUMNS):
+        return list(row)
+    if len(row) == len(CSV_COLUMNS) - len(OPTIONAL_NAME_COLUMNS):
+        return list(row[:2]) + [''] * len(OPTIONAL_NAME_COLUMNS) + list(row[2:])
+    raise ValueError(f"Expected {len(CSV_COLUMNS)} values, or {len(CSV_COLUMNS) - len(OPTIONAL_NAME_COLUMNS)} "
+                     f"without the Japanese, Chinese and French names, got {len(row)}")
+
+
+def _csv_row_to_data(row):
+    
+    """
+    Converts a row in the pokedex.csv layout to the dictionary layout of pokedex.json.
+    The id column is ignored because add_pokemon assigns the id.
+    
+    Parameters:
+        row (list): The values of the row, in the order of CSV_COLUMNS. The
+            OPTIONAL_NAME_COLUMNS may be left out, and are then empty.
+        
+    Returns:
+        dict: The Pokemon data in the same shape as an entry of pokedex.json.
+        
+    Raises:
+        ValueError: If the row does not have one value per column or a stat is not a number.
+    """
+    
+    values = dict(zip(CSV_COLUMNS, (str(value).strip() for value in _complete_csv_row(row))))
+    return {
+        'id': None,
+        'name': {lang: values[f'name/{lang}'] for lang in NAME_LANGUAGES},
+        'type': [t for t in (values['type/0'], values['type/1']) if t],
+        'base': {stat: int(values[f'base/{stat}'])
+                 for stat in ('HP', 'Attack', 'Defense', 'Sp. Attack', 'Sp. Defense', 'Speed')}
+    }
+
+
+_WHITESPACE = re.compile(r'\s*')
+
+# Characters that can continue a number the decoder has already matched
+_NUMBER_CHARACTERS = frozenset('0123456789.eE+-')
+
+
+def _iter_records(file_path, chunk_size=1 << 16):
+    
+    """
+    Parses a JSON file holding a top-level array and yields its elements one at a time.
+    
+    The file is read in chunks and each element is decoded as soon as it is complete,
+    so the whole JSON tree never has to be held in memory.
+    
+    Parameters:
+        file_path (str): The path to the JSON file.
+        chunk_size (int, optional): The number of characters to read at a time.
+        
+    Yields:
+        The decoded elements of the array, in order.
+        
+    Raises:
+        ValueError: If the file is not a JSON array.
+    """
+    
+    decoder = json.JSONDecoder()
+    with open(file_path, 'r', encoding='utf-8') as f:
+        buffer = ''
+        position = 0
+        expecting = '['
+        while True:
+            position = _WHITESPACE.match(buffer, position).end()
+            if position == len(buffer):
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    raise ValueError(f"{file_path}: unexpected end of file")
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+            
+            char = buffer[position]
+            if expecting == '[':
+                if char != '[':
+                    raise ValueError(f"{file_path}: expected a JSON array")
+                position += 1
+                expecting = 'first'
+            elif expecting == 'separator' or (expecting == 'first' and char == ']'):
+                if char == ']':
+                    return
+                if char != ',':
+                    raise ValueError(f"{file_path}: expected ',' or ']' between elements")
+                position += 1
+                expecting = 'value'
+            else:
+                try:
+                    record, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    # The element is not complete yet; read more of the file and retry
+                    chunk = f.read(chunk_size)
+                    if not chunk:
+                        raise
+                    buffer = buffer[position:] + chunk
+                    position = 0
+                    continue
+                if (isinstance(record, (int, float)) and not isinstance(record, bool)
+                        and (end == len(buffer) or buffer[end] in _NUMBER_CHARACTERS)):
+                    # Only part of the number may have been read; it may continue in the next chunk
+                    chunk = f.read(chunk_size)
+                    if chunk:
+                        buffer = buffer[position:] + chunk
+                        position = 0
+                        continue
+                yield record
+                position = end
+                expecting = 'separator'
+
+
+def iter_pokemon(file_path, chunk_size=1 << 16):
+    
+    """
+    Yields a Pokemon object for each entry of a pokedex JSON file, reading the file incrementally.
+    
+    Parameters:
+        file_path (str): The path to the JSON file containing the Pokemon data.
+        chunk_size (int, optional): The number of characters to read at a time.
+        
+    Yields:
+        Pokemon: One Pokemon per entry, in file order.
+    """
+    
+    for data in _iter_records(file_path, chunk_size):
+        yield Pokemon(data)
 
+
+class StatColumns:
+    
+    """
+    A columnar copy of the stats and types of a collection of Pokemon, held in NumPy arrays.
+    
+    Rows are appended at the end and removed by moving the last row into the gap, so
+    both operations are O(1) apart from the occasional doubling of the arrays.
+    
     Attributes:
-        pokemon (list): A list of Pokemon objects.
+        ids (ndarray): The id of the Pokemon in each row (int32).
+        stats (ndarray): One row per Pokemon and one column per stat in STATS (int16).
+        types (ndarray): Two type codes per row (int8); -1 when there is no second type.
+        type_names (list): The type name of each type code.
+        size (int): The number of rows in use.
+    """
+    
+    def __init__(self, pokemon):
+        
+        """
+        Builds the columns from a list of Pokemon.
+        
+        Parameters:
+            pokemon (list): The Pokemon objects to copy into the columns.
+            
+        Returns:
+            None
+        """
+        
+        import numpy as np
+        self._np = np
+        self.type_names = []
+        self._type_codes = {}
+        self.size = len(pokemon)
+        capacity = max(self.size, 16)
+        self._ids = np.zeros(capacity, dtype=np.int32)
+        self._stats = np.zeros((capacity, len(STATS)), dtype=np.int16)
+        self._types = np.full((capacity, 2), -1, dtype=np.int8)
+        
+        ids = [pkmn.id for pkmn in pokemon]
+        self._ids[:self.size] = ids
+        values = np.fromiter((getattr(pkmn, stat) for pkmn in pokemon for stat in STATS), np.int16,
+                             self.size * len(STATS))
+        self._stats[:self.size] = values.reshape(self.size, len(STATS))
+        codes = {}
+        for column in range(2):
+            column_codes = []
+            for pkmn in pokemon:
+                if len(pkmn.type) <= column:
+                    column_codes.append(-1)
+                    continue
+                p_type = pkmn.type[column]
+                if p_type not in codes:
+                    codes[p_type] = self._type_code(p_type)
+                column_codes.append(codes[p_type])
+            self._types[:self.size, column] = column_codes
+        self._rows = dict(zip(ids, range(self.size)))
+    
+    @property
+    def ids(self):
+        return self._ids[:self.size]
+    
+    @property
+    def stats(self):
+        return self._stats[:self.size]
+    
+    @property
+    def types(self):
+        return self._types[:self.size]
+    
+    def _type_code(self, p_type):
+        
+        """
+        Returns the code of a type, assigning the next free code to a new type.
+        """
+        
+        key = p_type.casefold()
+        if key not in self._type_codes:
+            self._type_codes[key] = len(self.type_names)
+            self.type_names.append(p_type)
+        return self._type_codes[key]
+    
+    def append(self, pkmn):
+        
+        """
+        Adds a Pokemon as the last row, doubling the arrays when they are full.
+        
+        Parameters:
+            pkmn (Pokemon): The Pokemon to add.
+            
+        Returns:
+            None
+        """
+        
+        np = self._np
+        if self.size == len(self._ids):
+            capacity = max(2 * len(self._ids), 16)
+            self._ids = np.resize(self._ids, capacity)
+            self._stats = np.resize(self._stats, (capacity, len(STATS)))
+            types = np.full((capacity, 2), -1, dtype=np.int8)
+            types[:self.size] = self.types
+            self._types = types
+        row = self.size
+        self._ids[row] = pkmn.id
+        self._stats[row] = [getattr(pkmn, stat) for stat in STATS]
+        self._types[row] = -1
+        self._types[row, :len(pkmn.type)] = [self._type_code(t) for t in pkmn.type[:2]]
+        self._rows[pkmn.id] = row
+        self.size += 1
+    
+    def copy(self):
+        
+        """
+        Returns an independent copy of the rows in use.
+        
+        append and remove change the arrays in place, so a reader that must not see
+        later changes, such as an export, works on a copy.
+        
+        Returns:
+            StatColumns: The copy.
+        """
+        
+        clone = object.__new__(StatColumns)
+        clone._np = self._np
+        clone.type_names = list(self.type_names)
+        clone._type_codes = dict(self._type_codes)
+        clone.size = self.size
+        clone._ids = self.ids.copy()
+        clone._stats = self.stats.copy()
+        clone._types = self.types.copy()
+        clone._rows = dict(self._rows)
+        return clone
+    
+    def remove(self, pkmn_id):
+        
+        """
+        Removes the row of a Pokemon by moving the last row into its place.
+        
+        Parameters:
+            pkmn_id (int): The id of the Pokemon to remove.
+            
+        Returns:
+            None
+        """
+        
+        row = self._rows.pop(pkmn_id, None)
+        if row is None:
+            return
+        last = self.size - 1
+        if row != last:
+            self._ids[row] = self._ids[last]
+            self._stats[row] = self._stats[last]
+            self._types[row] = self._types[last]
+            self._rows[int(self._ids[row])] = row
+        self.size = last
+    
+    def stat_mask(self, stat, stat_min=None, stat_max=None):
+        
+        """
+        Returns a boolean mask of the rows whose stat is within a range.
+        
+        Parameters:
+            stat (str): One of the names in STATS.
+            stat_min (int, optional): The minimum value, or None for no minimum.
+            stat_max (int, optional): The maximum value, or None for no maximum.
+            
+        Returns:
+            ndarray: One boolean per row.
+        """
+        
+        column = self.stats[:, STATS.index(stat)]
+        mask = self._np.ones(self.size, dtype=bool)
+        if stat_min is not None:
+            mask &= column >= max(stat_min, -32768)
+        if stat_max is not None:
+            mask &= column <= min(stat_max, 32767)
+        return mask
+    
+    def type_mask(self, types, operator='and'):
+        
+        """
+        Returns a boolean mask of the rows matching a type query.
+        
+        Parameters:
+            types (list): The type names to match.
+            operator (str): 'and' to require every type, 'or' to accept any of them.
+            
+        Returns:
+            ndarray: One boolean per row.
+        """
+        
+        np = self._np
+        masks = []
+        for p_type in types:
+            code = self._type_codes.get(p_type.strip().casefold())
+            if code is None:
+                masks.append(np.zeros(self.size, dtype=bool))
+            else:
+                masks.append((self.types == code).any(axis=1))
+        if not masks:
+            return np.zeros(self.size, dtype=bool)
+        if operator == 'or':
+            return np.logical_or.reduce(masks)
+        return np.logical_and.reduce(masks)
+    
+    def present_types(self):
+        
+        """
+        Returns the names of the types that at least one row has.
+        """
+        
+        codes = self._np.unique(self.types)
+        return [self.type_names[code] for code in codes.tolist() if code >= 0]
 
-    Methods:
-        __init__(self, file_path):
-            Initializes a Pokedex object with the data obtained from the JSON file.
 
-        search_by_name(self, name):
-            Searches for a Pokemon by name.
+SNAPSHOT_SUFFIX = '.snapshot'
+SNAPSHOT_MAGIC = b'PKDXSNAP'
+SNAPSHOT_VERSION = 2
 
-        search_by_type(self, p_type, limit):
-            Searches for Pokemon by type.
+# magic, version, source size, source mtime (ns), source SHA-256, record count, string count,
+# string table bytes, type reference count, name and type index size, aggregate value count
+_SNAPSHOT_HEADER = struct.Struct('<8sHqq32sIIIIII')
 
-        search_by_stats(self, stat_name, stat_min, stat_max):
-            Returns a random Pokemon whose stat value for the specified stat name is within the given range.
+# id, the six stats, four name strings, first type reference, type count; all 32-bit
+# so the records can be read as one array
+_SNAPSHOT_RECORD = struct.Struct('<13i')
 
-        compare_pokemon(self, pokemon1, pokemon2):
-            Compares two Pokemon based on their stats.
+# The string numbers of a name missing from the record and of a name that is null;
+# the string table starts after them
+_ABSENT_NAME, _NULL_NAME = 0, 1
+_FIRST_STRING = 2
 
-        pokemon_visualize(self, name):
-            Visualizes the base attributes of a given Pokémon using a bar chart.
 
-        add_pokemon(self, poke_info):
-            Adds a new Pokemon to the Pokedex with the provided information.
+@contextmanager
+def _gc_paused():
+    
+    """
+    Turns the cyclic garbage collector off for the duration of a with block.
+    
+    Loading creates hundreds of thousands of objects and no reference cycles, and the
+    collector would otherwise walk all of them again and again while they are created.
+    """
+    
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _read_csv_rows(csv_path):
+    
+    """
+    Reads a pokedex CSV file.
+    
+    Parameters:
+        csv_path (str): The path to the CSV file.
+        
+    Returns:
+        tuple: The header row (None if the file is missing or empty) and a list of the other rows.
+    """
+    
+    if not os.path.exists(csv_path):
+        return None, []
+    with open(csv_path, 'r', encoding='utf-8', newline='') as csvfile:
+        reader = csv.reader(csvfile)
+        header = next(reader, None)
+        return header, [row for row in reader if row]
+
+
+def _read_journal(journal_path):
+    
+    """
+    Yields the records of a journal file, skipping a last line cut short by a crash.
+    
+    Parameters:
+        journal_path (str): The path to the journal file.
+        
+    Yields:
+        dict: The recorded changes, oldest first.
+    """
+    
+    if not os.path.exists(journal_path):
+        return
+    with open(journal_path, 'r', encoding='utf-8') as journal:
+        for line in journal:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+class _JournalTable:
+    
+    """
+    The rows of a pokedex CSV file keyed by id, so that journal records apply in O(1).
+    
+    Adding a row whose id is already present does nothing, so a journal can be
+    replayed safely over a CSV file that already contains some of its changes.
+    
+    Attributes:
+        rows (dict): The rows, without the header, in file order. Rows of the CSV file
+            that repeat an earlier id are kept under an (id, position) key.
+        names (dict): Maps each English name to the keys of its rows.
+    """
+    
+    def __init__(self, rows=()):
+        
+        """
+        Builds the table from the rows of a CSV file.
+        """
+        
+        self.rows = {}
+        self.names = {}
+        for row in rows:
+            self._insert(row[0] if row[0] not in self.rows else (row[0], len(self.rows)), row)
+    
+    def _insert(self, key, row):
+        self.rows[key] = row
+        if len(row) >= 2:
+            self.names.setdefault(row[1], []).append(key)
+    
+    def apply(self, record):
+        
+        """
+        Applies one journal record.
+        
+        Parameters:
+            record (dict): An 'add' record with a 'row', or a 'remove' record with a 'name'.
+            
+        Returns:
+            None
+        """
+        
+        if record.get('op') == 'add':
+            row = record['row']
+            if row[0] not in self.rows:
+                self._insert(row[0], row)
+        elif record.get('op') == 'remove':
+            for key in self.names.pop(record['name'], ()):
+                self.rows.pop(key, None)
+    
+    def max_id(self):
+        
+        """
+        Returns the largest numeric id, or 0 if there is none.
+        """
+        
+        return max((int(row[0]) for row in self.rows.values() if row[0].isdigit()), default=0)
+
+
+def _source_signature(file_path):
+    
+    """
+    Returns the size, modification time and SHA-256 digest of a file.
+    
+    Parameters:
+        file_path (str): The path to the file.
+        
+    Returns:
+        tuple: (size, mtime_ns, digest), or None if the file cannot be read.
+    """
+    
+    try:
+        info = os.stat(file_path)
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return info.st_size, info.st_mtime_ns, digest.digest()
+
+
+def _file_state(file_path):
+    
     """
+    Returns the modification time and size of a file, the cheap check Pokedex.reload polls.
+    
+    Parameters:
+        file_path (str): The path to the file.
+    
+    Returns:
+        tuple: (mtime_ns, size), or None if the file cannot be read.
+    """
+    
+    try:
+        info = os.stat(file_path)
+    except OSError:
+        return None
+    return info.st_mtime_ns, info.st_size
+
+
+def _same_pokemon(first, second):
+    
+    """
+    Tells whether two Pokemon objects hold the same record.
+    
+    Parameters:
+        first (Pokemon): The first Pokemon.
+        second (Pokemon): The second Pokemon.
+    
+    Returns:
+        bool: True if the ids, names, types and stats are all equal.
+    """
+    
+    return (first.id == second.id and first.name == second.name and first.type == second.type
+            and all(getattr(first, stat) == getattr(second, stat) for stat in STATS))
+
+
+def _uint32_array(buffer):
+    
+    """
+    Reads little-endian unsigned 32-bit integers from a buffer into an array.
+    """
+    
+    values = array.array('I')
+    values.frombytes(buffer)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values
+
+
+def write_snapshot(pokemon, file_path, source=None, aggregates=None):
+    
+    """
+    Writes a binary snapshot of a list of Pokemon next to their JSON file.
+    
+    The snapshot holds fixed-width records for the stats, a table of the distinct
+    names and types that the records point into, and the indexes a Pokedex builds
+    from the Pokemon: the sorted order of every stat, the Pokemon of every name and
+    type key and the statistics of every type (see TypeAggregate). It is written to a
+    temporary file and renamed into place, so a reader never sees a partial snapshot.
+    
+    Parameters:
+        pokemon (list): The Pokemon loaded from the JSON file.
+        file_path (str): The path to the JSON file.
+        source (tuple, optional): The signature of the JSON file the Pokemon were read
+            from, as returned by _source_signature. It is computed if not given.
+        aggregates (dict, optional): The TypeAggregate of each case-folded type of the
+            Pokemon. They are computed if not given.
+            
+    Returns:
+        bool: True if the snapshot was written.
+    """
+    
+    source = source or _source_signature(file_path)
+    if source is None:
+        return False
+    if aggregates is None:
+        aggregates = _aggregate_types(pokemon)
+    
+    strings = {}
+    def intern(value):
+        # The string table is NUL-separated
+        if not isinstance(value, str) or '\0' in value:
+            raise TypeError(f"Cannot store {value!r} in the string table")
+        return strings.setdefault(value, len(strings) + _FIRST_STRING)
+    
+    def name_number(pkmn, lang):
+        if lang not in pkmn.name:
+            return _ABSENT_NAME
+        value = pkmn.name[lang]
+        return _NULL_NAME if value is None else intern(value)
+    
+    records = bytearray()
+    type_refs = array.array('I')
+    groups = array.array('I')
+    values = array.array('q')
+    try:
+        for pkmn in pokemon:
+            records += _SNAPSHOT_RECORD.pack(pkmn.id, *(getattr(pkmn, stat) for stat in STATS),
+                                             *(name_number(pkmn, lang) for lang in NAME_LANGUAGES),
+                                             len(type_refs), len(pkmn.type))
+            type_refs.extend(intern(p_type) for p_type in pkmn.type)
+        for keys_of in (_name_keys, lambda pkmn: dict.fromkeys(p_type.casefold() for p_type in pkmn.type)):
+            _write_groups(groups, pokemon, keys_of, intern)
+        for aggregate in aggregates.values():
+            values.extend((intern(aggregate.name), aggregate.count))
+            for stat in STATS + ('total',):
+                histogram = aggregate.histograms[stat]
+                values.extend((aggregate.sums[stat], len(histogram)))
+                for value in sorted(histogram):
+                    values.extend((value, histogram[value]))
+    except (struct.error, TypeError, OverflowError):
+        # Ids, stats, names or types that do not fit the records; keep using the JSON file
+        return False
+    
+    table = '\0'.join(strings).encode('utf-8')
+    orders = array.array('I')
+    for stat in STATS:
+        orders.extend(sorted(range(len(pokemon)), key=lambda i: (getattr(pokemon[i], stat), pokemon[i].id)))
+    if sys.byteorder != 'little':
+        for numbers in (type_refs, orders, groups, values):
+            numbers.byteswap()
+    
+    size, mtime_ns, digest = source
+    snapshot_path = file_path + SNAPSHOT_SUFFIX
+    temp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(_SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, size, mtime_ns, digest,
+                                          len(pokemon), len(strings), len(table), len(type_refs), len(groups),
+                                          len(values)))
+            f.write(table)
+            f.write(records)
+            f.write(type_refs.tobytes())
+            f.write(orders.tobytes())
+            f.write(groups.tobytes())
+            f.write(values.tobytes())
+        os.replace(temp_path, snapshot_path)
+        if _instrumentation is not None:
+            _record_bytes('load', written=_file_size(snapshot_path))
+    except OSError:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return False
+    return True
+
+
+def _write_groups(numbers, pokemon, keys_of, intern):
+    
+    """
+    Appends an index from keys to the positions of the Pokemon that have them to a snapshot section.
+    
+    The section holds the number of keys, then their string numbers, then how many
+    Pokemon have each key, then the positions of those Pokemon, key after key.
+    
+    Parameters:
+        numbers (array): The section to append to.
+        pokemon (list): The Pokemon.
+        keys_of (callable): Returns the keys of a Pokemon, each once.
+        intern (callable): Returns the string number of a key.
+        
+    Returns:
+        None
+    """
+    
+    positions = {}
+    for position, pkmn in enumerate(pokemon):
+        for key in keys_of(pkmn):
+            positions.setdefault(key, []).append(position)
+    numbers.append(len(positions))
+    numbers.extend(map(intern, positions))
+    numbers.extend(map(len, positions.values()))
+    for holders in positions.values():
+        numbers.extend(holders)
+
+
+def _read_groups(numbers, start, strings, pokemon):
+    
+    """
+    Reads an index written by _write_groups.
+    
+    Parameters:
+        numbers (array): The section holding the index.
+        start (int): Where the index starts in the section.
+        strings (list): The string table of the snapshot, by string number.
+        pokemon (list): The Pokemon, by position.
+        
+    Returns:
+        tuple: (index, end), where index maps each key to the list of Pokemon that have
+            it and end is where the next index starts.
+            
+    Raises:
+        IndexError: If the section is truncated.
+    """
+    
+    count = numbers[start]
+    keys = map(strings.__getitem__, numbers[start + 1:start + 1 + count])
+    sizes = numbers[start + 1 + count:start + 1 + 2 * count]
+    position = start + 1 + 2 * count
+    if len(sizes) != count:
+        raise IndexError("Truncated index")
+    total = sum(sizes)
+    holders = list(map(pokemon.__getitem__, numbers[position:position + total]))
+    if len(holders) != total:
+        raise IndexError("Truncated index")
+    if total == count:
+        # Every key belongs to one Pokemon, the usual case for names
+        return dict(zip(keys, ([pkmn] for pkmn in holders))), position + total
+    index = {}
+    offset = 0
+    for key, size in zip(keys, sizes):
+        index[key] = holders[offset:offset + size]
+        offset += size
+    return index, position + total
+
+
+def _read_aggregates(values, strings):
+    
+    """
+    Rebuilds the TypeAggregate objects stored in a snapshot.
+    
+    Parameters:
+        values (array): The aggregate section of the snapshot.
+        strings (list): The string table of the snapshot, by string number.
+        
+    Returns:
+        dict: Maps each case-folded type to its TypeAggregate.
+        
+    Raises:
+        IndexError: If the section is truncated.
+    """
+    
+    aggregates = {}
+    position = 0
+    while position < len(values):
+        aggregate = TypeAggregate(strings[values[position]])
+        aggregate.count = values[position + 1]
+        position += 2
+        for stat in STATS + ('total',):
+            aggregate.sums[stat] = values[position]
+            length = values[position + 1]
+            pairs = values[position + 2:position + 2 + 2 * length]
+            if len(pairs) != 2 * length:
+                raise IndexError("Truncated aggregate")
+            aggregate.histograms[stat] = dict(zip(pairs[::2], pairs[1::2]))
+            aggregate._distinct[stat] = list(pairs[::2])
+            position += 2 + 2 * length
+        aggregates[aggregate.name.casefold()] = aggregate
+    return aggregates
+
+
+def load_snapshot(file_path):
+    
+    """
+    Loads the Pokemon from the snapshot next to a JSON file, if the snapshot is up to date.
+    
+    The snapshot is memory-mapped. It is used when the size and modification time of
+    the JSON file match the ones it was written for; when only the modification time
+    differs, the SHA-256 digest of the JSON file decides. A snapshot that is truncated
+    or otherwise malformed is ignored.
+    
+    Parameters:
+        file_path (str): The path to the JSON file.
+        
+    Returns:
+        tuple: (pokemon, indexes), where indexes holds the arguments of
+            Pokedex._build_indexes read from the snapshot. None if there is no usable snapshot.
+    """
+    
+    snapshot_path = file_path + SNAPSHOT_SUFFIX
+    try:
+        info = os.stat(file_path)
+        with open(snapshot_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if len(data) < _SNAPSHOT_HEADER.size:
+                return None
+            (magic, version, size, mtime_ns, digest, count, string_count, table_size, type_ref_count,
+             group_count, value_count) = _SNAPSHOT_HEADER.unpack_from(data)
+            if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION or size != info.st_size:
+                return None
+            records_start = _SNAPSHOT_HEADER.size + table_size
+            type_refs_start = records_start + _SNAPSHOT_RECORD.size * count
+            orders_start = type_refs_start + 4 * type_ref_count
+            groups_start = orders_start + 4 * count * len(STATS)
+            values_start = groups_start + 4 * group_count
+            if len(data) != values_start + 8 * value_count:
+                return None
+            if mtime_ns != info.st_mtime_ns:
+                source = _source_signature(file_path)
+                if source is None or source[2] != digest:
+                    return None
+            
+            table = data[_SNAPSHOT_HEADER.size:records_start].decode('utf-8')
+            strings = [None, None] + (table.split('\0') if string_count else [])
+            if len(strings) != string_count + _FIRST_STRING:
+                return None
+            fields = array.array('i')
+            fields.frombytes(data[records_start:type_refs_start])
+            type_refs = _uint32_array(data[type_refs_start:orders_start])
+            orders = _uint32_array(data[orders_start:groups_start])
+            groups = _uint32_array(data[groups_start:values_start])
+            values = array.array('q')
+            values.frombytes(data[values_start:])
+            if sys.byteorder != 'little':
+                fields.byteswap()
+                values.byteswap()
+        
+        pokemon = []
+        new = Pokemon.__new__
+        name = strings.__getitem__
+        width = _SNAPSHOT_RECORD.size // fields.itemsize
+        for (pkmn_id, hp, attack, defense, sp_attack, sp_defense, speed,
+             *numbers, start, type_count) in zip(*(fields[i::width] for i in range(width))):
+            pkmn = new(Pokemon)
+            pkmn.id, pkmn.hp, pkmn.attack, pkmn.defense = pkmn_id, hp, attack, defense
+            pkmn.sp_attack, pkmn.sp_defense, pkmn.speed = sp_attack, sp_defense, speed
+            if min(numbers) >= _FIRST_STRING:
+                pkmn.name = dict(zip(NAME_LANGUAGES, map(name, numbers)))
+            else:
+                pkmn.name = {lang: strings[number] for lang, number in zip(NAME_LANGUAGES, numbers)
+                             if number != _ABSENT_NAME}
+            pkmn.type = [strings[number] for number in type_refs[start:start + type_count]]
+            pokemon.append(pkmn)
+        name_index, end = _read_groups(groups, 0, strings, pokemon)
+        type_members, end = _read_groups(groups, end, strings, pokemon)
+        aggregates = _read_aggregates(values, strings)
+    except (OSError, ValueError, struct.error, UnicodeDecodeError, IndexError, TypeError, AttributeError):
+        return None
+    if end != len(groups) or (orders and max(orders) >= count):
+        return None
+    stat_orders = {stat: orders[i * count:(i + 1) * count] for i, stat in enumerate(STATS)}
+    return pokemon, {'stat_orders': stat_orders, 'aggregates': aggregates, 'name_index': name_index,
+                     'type_members': type_members}
+
+
+def _trigrams(key):
+    
+    """
+    Returns the set of three-character substrings of a name, padded so that short names
+    and the start and end of a name also produce trigrams.
+    """
+    
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _edit_distance(first, second, max_distance):
+    
+    """
+    Returns the Levenshtein distance between two strings, or max_distance + 1 as soon as
+    the distance is known to be larger than max_distance.
+    
+    Only the cells within max_distance of the diagonal are computed, since any path
+    through the others costs more than max_distance.
+    """
+    
+    if abs(len(first) - len(second)) > max_distance:
+        return max_distance + 1
+    over = max_distance + 1
+    previous = [j if j <= max_distance else over for j in range(len(second) + 1)]
+    for i, char1 in enumerate(first, 1):
+        low = max(1, i - max_distance)
+        high = min(len(second), i + max_distance)
+        current = [over] * (len(second) + 1)
+        current[0] = i if i <= max_distance else over
+        best = current[0]
+        for j in range(low, high + 1):
+            cost = previous[j - 1] + (char1 != second[j - 1])
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if current[j - 1] + 1 < cost:
+                cost = current[j - 1] + 1
+            current[j] = cost
+            if cost < best:
+                best = cost
+        if best > max_distance:
+            return over
+        previous = current
+    return min(previous[-1], over)
+
+
+# Most names whose edit distance NameSearchIndex.fuzzy checks, by most shared trigrams
+FUZZY_CANDIDATES = 64
+
+
+class NameSearchIndex:
+    
+    """
+    Prefix and fuzzy search over case-folded names.
+    
+    Names are kept in a trie for prefix search and in a trigram index that finds the
+    candidates for fuzzy search, whose edit distance is then checked.
+    
+    Attributes:
+        trie (dict): Nested dictionaries keyed by character; the '' key marks the end of a name.
+        trigrams (dict): Maps each trigram to a dictionary from name length to the set of
+            names of that length containing it.
+        gram_counts (dict): The number of distinct trigrams of each name.
+    """
+    
+    def __init__(self, keys=()):
+        
+        """
+        Builds the index from an iterable of case-folded names.
+        """
+        
+        self.trie = {}
+        self.trigrams = {}
+        self.gram_counts = {}
+        for key in keys:
+            self.add(key)
+    
+    def add(self, key):
+        
+        """
+        Adds a case-folded name to the trie and the trigram index.
+        """
+        
+        node = self.trie
+        for char in key:
+            node = node.setdefault(char, {})
+        node[''] = True
+        grams = _trigrams(key)
+        self.gram_counts[key] = len(grams)
+        for gram in grams:
+            self.trigrams.setdefault(gram, {}).setdefault(len(key), set()).add(key)
+    
+    def remove(self, key):
+        
+        """
+        Removes a case-folded name, pruning the trie nodes that are no longer used.
+        """
+        
+        path = [self.trie]
+        for char in key:
+            node = path[-1].get(char)
+            if node is None:
+                return
+            path.append(node)
+        path[-1].pop('', None)
+        for depth in range(len(key), 0, -1):
+            if path[depth]:
+                break
+            path[depth - 1].pop(key[depth - 1])
+        self.gram_counts.pop(key, None)
+        for gram in _trigrams(key):
+            lengths = self.trigrams.get(gram)
+            keys = lengths.get(len(key)) if lengths is not None else None
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del lengths[len(key)]
+                    if not lengths:
+                        del self.trigrams[gram]
+    
+    def prefix(self, prefix, limit):
+        
+        """
+        Returns names starting with a prefix, shortest first.
+        
+        The trie below the prefix is walked one level at a time and the walk stops at the
+        first level by which `limit` names have been found, so short prefixes stay cheap.
+        
+        Parameters:
+            prefix (str): The case-folded prefix.
+            limit (int): The number of names wanted.
+            
+        Returns:
+            list: The matching names, by length and then alphabetically.
+        """
+        
+        node = self.trie
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return []
+        found = []
+        level = [(prefix, node)]
+        while level and len(found) < limit:
+            found.extend(sorted(key for key, node in level if '' in node))
+            level = [(key + char, child) for key, node in level for char, child in node.items() if char]
+        return found
+    
+    def fuzzy(self, query, max_distance, max_candidates=FUZZY_CANDIDATES):
+        
+        """
+        Returns names within an edit distance of a query.
+        
+        Only names whose length is within max_distance of the query are considered.
+        Each edit changes at most three trigrams, so a match shares at least
+        max(its trigrams, the query's trigrams) - 3 * max_distance of them, and so at
+        least one of the 3 * max_distance + 1 rarest trigrams of the query. Candidates
+        are collected from those, rarest first, until 16 * max_candidates are found;
+        the edit distance is then checked for the max_candidates candidates sharing
+        the most trigrams. When very many names are alike, the caps bound the work at
+        the cost of possibly missing some matches.
+        
+        Parameters:
+            query (str): The case-folded query.
+            max_distance (int): The largest edit distance accepted.
+            max_candidates (int, optional): The most names whose edit distance is checked.
+            
+        Returns:
+            list: (name, distance, shared trigrams) tuples.
+        """
+        
+        grams = _trigrams(query)
+        lengths = range(max(len(query) - max_distance, 0), len(query) + max_distance + 1)
+        postings = []
+        for gram in sorted(grams):
+            by_length = self.trigrams.get(gram, {})
+            sets = [by_length[length] for length in lengths if length in by_length]
+            postings.append((sum(map(len, sets)), sets))
+        postings.sort(key=lambda posting: posting[0])
+        
+        slack = 3 * max_distance
+        candidates = set()
+        for _, sets in postings[:slack + 1]:
+            if len(candidates) >= 16 * max_candidates:
+                break
+            for keys in sets:
+                candidates.update(keys)
+        shared = Counter()
+        for _, sets in postings:
+            for keys in sets:
+                shared.update(candidates & keys)
+        
+        gram_counts = self.gram_counts
+        scored = [(count, key) for key, count in shared.items()
+                  if count >= max(len(grams), gram_counts[key]) - slack]
+        if len(scored) > max_candidates:
+            scored = heapq.nlargest(max_candidates, scored)
+        matches = []
+        for count, key in scored:
+            distance = _edit_distance(query, key, max_distance)
+            if distance <= max_distance:
+                matches.append((key, distance, count))
+        return matches
+
+
+RENDER_MANIFEST = '.render-manifest.json'
+
+# Bump when the look of the charts changes, so render_many draws them again
+RENDER_VERSION = 1
+
+CHART_LABELS = ["base/HP", "base/Attack", "base/Defense", "base/Sp. Attack", "base/Sp. Defense", "base/Speed"]
+
+
+def _draw_stat_chart(ax, title, values):
+    
+    """
+    Draws the bar chart of a Pokemon's base stats on a matplotlib Axes.
+    
+    Parameters:
+        ax (matplotlib.axes.Axes): The axes to draw on.
+        title (str): The chart title, usually the English name.
+        values (list): The six stats, in the order of STATS.
+        
+    Returns:
+        None
+    """
+    
+    ax.bar(CHART_LABELS, values)
+    ax.set_xlabel("Attribute")
+    ax.set_ylabel("Value")
+    ax.set_title(title)
+    for i, v in enumerate(values):
+        ax.text(i, v+1, str(v), ha='center', fontsize=10)
+
+
+def _render_chart(task):
+    
+    """
+    Draws one stat chart to a file with the Agg canvas, without going through pyplot.
+    
+    Parameters:
+        task (tuple): The title, the six stats and the output path.
+        
+    Returns:
+        str: The output path.
+    """
+    
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    
+    title, values, path = task
+    figure = Figure(figsize=(12, 7))
+    FigureCanvasAgg(figure)
+    _draw_stat_chart(figure.subplots(), title, values)
+    figure.savefig(path)
+    return path
+
+
+class TypeAggregate:
+    
+    """
+    Running statistics of the Pokemon of one type, updated one Pokemon at a time.
+    
+    Counts and sums give the means. For every stat and for the base stat total, a count
+    of each distinct value and a sorted list of the distinct values give the minimum,
+    the maximum and the distribution without looking at the Pokemon again.
+    
+    Attributes:
+        name (str): The type name.
+        count (int): The number of Pokemon of this type.
+        sums (dict): The sum of each stat in STATS.
+        histograms (dict): For each stat, and for 'total', a dictionary from value to count.
+    """
+    
+    def __init__(self, name):
+        
+        """
+        Creates an empty aggregate for a type.
+        """
+        
+        self.name = name
+        self.count = 0
+        self.sums = {stat: 0 for stat in STATS + ('total',)}
+        self.histograms = {stat: {} for stat in STATS + ('total',)}
+        self._distinct = {stat: [] for stat in STATS + ('total',)}
+    
+    def _values(self, pkmn):
+        values = {stat: getattr(pkmn, stat) for stat in STATS}
+        values['total'] = sum(values.values())
+        return values
+    
+    def add(self, pkmn):
+        
+        """
+        Adds a Pokemon to the statistics.
+        """
+        
+        self.count += 1
+        for stat, value in self._values(pkmn).items():
+            self.sums[stat] += value
+            histogram = self.histograms[stat]
+            if value not in histogram:
+                bisect.insort(self._distinct[stat], value)
+            histogram[value] = histogram.get(value, 0) + 1
+    
+    def add_many(self, pokemon):
+        
+        """
+        Adds several Pokemon to the statistics at once; faster than add for a whole Pokedex.
+        """
+        
+        columns = {stat: [getattr(pkmn, stat) for pkmn in pokemon] for stat in STATS}
+        columns['total'] = list(map(sum, zip(*columns.values())))
+        self.count += len(pokemon)
+        for stat, values in columns.items():
+            self.sums[stat] += sum(values)
+            histogram = self.histograms[stat]
+            for value, count in Counter(values).items():
+                histogram[value] = histogram.get(value, 0) + count
+            self._distinct[stat] = sorted(histogram)
+    
+    def remove(self, pkmn):
+        
+        """
+        Removes a Pokemon that was added before from the statistics.
+        """
+        
+        self.count -= 1
+        for stat, value in self._values(pkmn).items():
+            self.sums[stat] -= value
+            histogram = self.histograms[stat]
+            histogram[value] -= 1
+            if not histogram[value]:
+                del histogram[value]
+                distinct = self._distinct[stat]
+                del distinct[bisect.bisect_left(distinct, value)]
+    
+    def summary(self):
+        
+        """
+        Returns the count and the mean, minimum and maximum of each stat and of the base stat total.
+        
+        Returns:
+            dict: 'type', 'count', and for each stat in STATS and 'total' a dictionary with
+                'mean', 'min' and 'max' (None when the type has no Pokemon).
+        """
+        
+        result = {'type': self.name, 'count': self.count}
+        for stat in STATS + ('total',):
+            distinct = self._distinct[stat]
+            result[stat] = {
+                'mean': self.sums[stat] / self.count if self.count else None,
+                'min': distinct[0] if distinct else None,
+                'max': distinct[-1] if distinct else None
+            }
+        return result
+    
+    def distribution(self, stat='total'):
+        
+        """
+        Returns how many Pokemon of the type have each value of a stat.
+        
+        Parameters:
+            stat (str, optional): One of the names in STATS, or 'total' for the base stat total.
+            
+        Returns:
+            list: (value, count) tuples in increasing order of value.
+        """
+        
+        return [(value, self.histograms[stat][value]) for value in self._distinct[stat]]
+
+
+def _aggregate_types(pokemon):
+    
+    """
+    Computes the TypeAggregate of every type of a list of Pokemon.
+    
+    Parameters:
+        pokemon (list): The Pokemon.
+        
+    Returns:
+        dict: Maps each case-folded type to its TypeAggregate, named after the
+            first spelling of the type met.
+    """
+    
+    members = {}
+    for pkmn in pokemon:
+        for p_type in pkmn.type:
+            members.setdefault(p_type.casefold(), (p_type, []))[1].append(pkmn)
+    aggregates = {}
+    for key, (p_type, group) in members.items():
+        aggregates[key] = TypeAggregate(p_type)
+        aggregates[key].add_many(group)
+    return aggregates
+
+
+class ReadWriteLock:
+    
+    """
+    A lock that lets any number of readers in at once, or one writer alone.
+    
+    Waiting writers go ahead of new readers so a steady stream of queries cannot starve
+    them. A thread that already holds the lock, for reading or for writing, can take the
+    read side again without waiting, so locked methods may call each other.
+    """
+    
+    def __init__(self):
+        
+        """
+        Creates an unlocked lock.
+        """
+        
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None
+        self._writers_waiting = 0
+        self._local = threading.local()
+    
+    @contextmanager
+    def read(self):
+        
+        """
+        Holds the lock for reading for the duration of a with block.
+        """
+        
+        depth = getattr(self._local, 'depth', 0)
+        if depth or self._writer == threading.get_ident():
+            self._local.depth = depth + 1
+            try:
+                yield
+            finally:
+                self._local.depth = depth
+            return
+        with self._condition:
+            while self._writer is not None or self._writers_waiting:
+                self._condition.wait()
+            self._readers += 1
+        self._local.depth = 1
+        try:
+            yield
+        finally:
+            self._local.depth = 0
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+    
+    @contextmanager
+    def write(self):
+        
+        """
+        Holds the lock for writing for the duration of a with block.
+        """
+        
+        with self._condition:
+            self._writers_waiting += 1
+            while self._writer is not None or self._readers:
+                self._condition.wait()
+            self._writers_waiting -= 1
+            self._writer = threading.get_ident()
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writer = None
+                self._condition.notify_all()
+
+
+def _read_locked(method):
+    
+    """
+    Runs a Pokedex method while holding the Pokedex lock for reading.
+    """
+    
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock.read():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+_MISSING = object()
+
+
+class QueryCache:
+    
+    """
+    A bounded least-recently-used cache of query results.
+    
+    Each entry remembers the generation of the Pokedex it was computed from; once an add
+    or remove moves the Pokedex to a new generation, older entries count as misses and
+    are dropped. Entries can also expire after a time to live.
+    
+    Attributes:
+        maxsize (int): The largest number of entries; 0 disables the cache.
+        ttl (float): Seconds an entry stays valid, or None for no expiry.
+        hits (int): Lookups answered from the cache.
+        misses (int): Lookups that had to be computed.
+        evictions (int): Entries dropped because the cache was full.
+        invalidations (int): Entries dropped because the data changed or they expired.
+    """
+    
+    def __init__(self, maxsize=1024, ttl=None):
+        
+        """
+        Creates an empty cache.
+        """
+        
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key, generation):
+        
+        """
+        Returns the cached value of a key, or _MISSING if there is no valid entry.
+        """
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry_generation, expires, value = entry
+                if entry_generation == generation and (expires is None or time.monotonic() < expires):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.invalidations += 1
+            self.misses += 1
+            return _MISSING
+    
+    def put(self, key, generation, value):
+        
+        """
+        Stores a value, evicting the least recently used entry when the cache is full.
+        """
+        
+        if self.maxsize <= 0:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries[key] = (generation, expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        
+        """
+        Drops every entry.
+        """
+        
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+    
+    def stats(self):
+        
+        """
+        Returns the hit, miss, eviction and invalidation counts and the current size.
+        """
+        
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else None,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
+
+
+_QUERY_TERM = re.compile(r'^(\w+)\s*(>=|<=|\^=|=|>|<|:)\s*(.*)$', re.DOTALL)
+
+# Fields a query can sort by besides the stats
+SORT_FIELDS = ('id', 'name')
+
+
+class QueryPredicate:
+    
+    """
+    One condition of a composite query (see parse_query).
+    
+    Each predicate can estimate how many Pokemon it matches from an index, list those
+    Pokemon from the index, or test a single Pokemon, so the planner in Pokedex.query
+    can start from the most selective predicate and filter with the others.
+    
+    Attributes:
+        kind (str): 'type', 'stat', 'name' or 'prefix'.
+        field (str): The stat in STATS for 'stat' predicates, otherwise the kind.
+        value: The case-folded types (a tuple, any of which matches) for 'type', the
+            (minimum, maximum) bounds for 'stat', and the case-folded name or prefix
+            for 'name' and 'prefix'.
+    """
+    
+    def __init__(self, kind, field, value):
+        
+        """
+        Creates a predicate.
+        """
+        
+        self.kind = kind
+        self.field = field
+        self.value = value
+    
+    def __str__(self):
+        if self.kind == 'type':
+            return 'type:' + ','.join(self.value)
+        if self.kind == 'name':
+            return f'name:{self.value}'
+        if self.kind == 'prefix':
+            return f'name^={self.value}'
+        low, high = self.value
+        if low == high:
+            return f'{self.field}={low}'
+        if high is None:
+            return f'{self.field}>={low}'
+        if low is None:
+            return f'{self.field}<={high}'
+        return f'{self.field}:{low}..{high}'
+    
+    def estimate(self, pokedex, cap=None):
+        
+        """
+        Estimates the number of Pokemon matching the predicate from the indexes.
+        
+        Parameters:
+            pokedex (Pokedex): The Pokedex whose indexes are used.
+            cap (int, optional): Prefix estimates stop counting once they pass this.
+            
+        Returns:
+            int: The estimate; exact except for types given as alternatives, where it
+                is the sum of the type counts, and capped prefix counts.
+        """
+        
+        if self.kind == 'type':
+            aggregates = pokedex._aggregates
+            return sum(aggregates[t].count for t in self.value if t in aggregates)
+        if self.kind == 'stat':
+            if pokedex._columns is not None:
+                return int(pokedex._columns.stat_mask(self.field, *self.value).sum())
+            start, end = pokedex._stat_range(self.field, *self.value)
+            return end - start
+        if self.kind == 'name':
+            return len(pokedex._name_index.get(self.value, ()))
+        keys = pokedex._name_search_index().prefix(self.value, cap if cap is not None else float('inf'))
+        return sum(len(pokedex._name_index.get(key, ())) for key in keys)
+    
+    def candidate_ids(self, pokedex):
+        
+        """
+        Lists the ids of the Pokemon matching the predicate using the indexes.
+        
+        Parameters:
+            pokedex (Pokedex): The Pokedex whose indexes are used.
+            
+        Returns:
+            iterable: The matching ids, each once.
+        """
+        
+        if self.kind == 'type':
+            return pokedex._match_types(list(self.value), 'or')
+        if self.kind == 'stat':
+            if pokedex._columns is not None:
+                columns = pokedex._columns
+                return columns.ids[columns.stat_mask(self.field, *self.value)].tolist()
+            start, end = pokedex._stat_range(self.field, *self.value)
+            return [pkmn_id for _, pkmn_id in pokedex._stat_index[self.field][start:end]]
+        if self.kind == 'name':
+            return {pkmn.id for pkmn in pokedex._name_index.get(self.value, ())}
+        keys = pokedex._name_search_index().prefix(self.value, float('inf'))
+        return {pkmn.id for key in keys for pkmn in pokedex._name_index[key]}
+    
+    def matches(self, pkmn):
+        
+        """
+        Tests one Pokemon against the predicate.
+        """
+        
+        if self.kind == 'type':
+            return any(p_type.casefold() in self.value for p_type in pkmn.type)
+        if self.kind == 'stat':
+            low, high = self.value
+            value = getattr(pkmn, self.field)
+            return (low is None or value >= low) and (high is None or value <= high)
+        if self.kind == 'name':
+            return self.value in _name_keys(pkmn)
+        return any(key.startswith(self.value) for key in _name_keys(pkmn))
+
+
+def _query_int(text, term):
+    
+    """
+    Parses an integer in a query term, naming the term when it is not one.
+    """
+    
+    try:
+        return int(text)
+    except ValueError:
+        raise ValueError(f"Expected a number in query term: {term}") from None
+
+
+def parse_query(expression):
+    
+    """
+    Parses a composite query such as 'type:Dragon speed>=100 attack:90..130 name^=Gar'.
+    
+    Terms are separated by spaces and all of them must hold. Values with spaces can
+    be quoted, as in name:"Mr. Mime".
+        type:Fire           has the type; type:Water,Ice has either type
+        speed>=100          a stat compared with >=, <=, >, < or =
+        attack:90..130      a stat within a range; either end can be left out
+        name:Pikachu        has the name in some language, in any case
+        name^=Gar           has a name in some language starting with the prefix
+        sort:-speed         sort by a stat, id or name; a leading - sorts descending
+        limit:10 offset:20  page through the results
+    
+    Parameters:
+        expression (str): The query.
+        
+    Returns:
+        tuple: (predicates, options), a list of QueryPredicate and a dict with the
+            'sort', 'limit' and 'offset' terms that were given.
+        
+    Raises:
+        ValueError: If a term is malformed or names an unknown field.
+    """
+    
+    import shlex
+    
+    predicates = []
+    options = {}
+    for term in shlex.split(expression):
+        match = _QUERY_TERM.match(term)
+        if match is None or not match.group(3):
+            raise ValueError(f"Malformed query term: {term}")
+        field, op, value = match.group(1).lower(), match.group(2), match.group(3).strip()
+        if field in ('sort', 'limit', 'offset'):
+            if op != ':':
+                raise ValueError(f"Malformed query term: {term}")
+            options[field] = value if field == 'sort' else _query_int(value, term)
+        elif field == 'type':
+            if op not in (':', '='):
+                raise ValueError(f"Malformed query term: {term}")
+            types = tuple(t.strip().casefold() for t in value.split(',') if t.strip())
+            predicates.append(QueryPredicate('type', 'type', types))
+        elif field == 'name':
+            if op not in (':', '=', '^='):
+                raise ValueError(f"Malformed query term: {term}")
+            kind = 'prefix' if op == '^=' else 'name'
+            predicates.append(QueryPredicate(kind, kind, value.casefold()))
+        else:
+            stat = _stat_attr(field)
+            if op == '^=':
+                raise ValueError(f"Malformed query term: {term}")
+            if op == ':' and '..' in value:
+                low, high = value.split('..', 1)
+                bounds = (_query_int(low, term) if low else None, _query_int(high, term) if high else None)
+            else:
+                number = _query_int(value, term)
+                bounds = {
+                    ':': (number, number),
+                    '=': (number, number),
+                    '>=': (number, None),
+                    '>': (number + 1, None),
+                    '<=': (None, number),
+                    '<': (None, number - 1)
+                }[op]
+            predicates.append(QueryPredicate('stat', stat, bounds))
+    return predicates, options
+
+
+def _sort_key(sort):
+    
+    """
+    Returns the key function of a sort term such as '-speed' or 'name'.
+    
+    Ties are always broken by increasing id.
+    
+    Parameters:
+        sort (str): A stat, 'id' or 'name', optionally preceded by '-' for descending.
+        
+    Returns:
+        tuple: (key, reverse, stat), where stat is the stat in STATS sorted by, or None.
+        
+    Raises:
+        ValueError: If the field is unknown.
+    """
+    
+    reverse = sort.startswith('-')
+    field = sort.lstrip('+-').strip().lower()
+    if field == 'id':
+        return (lambda pkmn: pkmn.id), reverse, None
+    if field == 'name':
+        if reverse:
+            return (lambda pkmn: (pkmn.name['english'].casefold(), -pkmn.id)), True, None
+        return (lambda pkmn: (pkmn.name['english'].casefold(), pkmn.id)), False, None
+    stat = _stat_attr(field)
+    if reverse:
+        return (lambda pkmn: (getattr(pkmn, stat), -pkmn.id)), True, stat
+    return (lambda pkmn: (getattr(pkmn, stat), pkmn.id)), False, stat
+
+
+def _sort_description(sort):
+    
+    """
+    Describes a sort term for Pokedex.explain, e.g. 'speed descending' for '-speed'.
+    """
+    
+    field = sort.lstrip('+-').strip().lower()
+    field = field if field in SORT_FIELDS else _stat_attr(field)
+    return f"{field} descending" if sort.startswith('-') else field
+
+
+# Number of ids a stream takes from the id index each time it holds the read lock
+STREAM_CHUNK = 1024
+
+
+def _encode_cursor(query, last_id):
+    
+    """
+    Encodes the position of a stream as an opaque cursor token.
+    
+    Parameters:
+        query (list): The normalized query the stream answers.
+        last_id (int): The id of the last Pokemon returned.
+        
+    Returns:
+        str: A URL-safe token.
+    """
+    
+    payload = json.dumps({'query': query, 'after': last_id}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+def _decode_cursor(token, query):
+    
+    """
+    Decodes a cursor token and checks that it was issued for the same query.
+    
+    Parameters:
+        token (str): A token from _encode_cursor, or None to start from the beginning.
+        query (list): The normalized query being resumed.
+        
+    Returns:
+        int: The id after which the stream resumes, or None.
+        
+    Raises:
+        ValueError: If the token is malformed or belongs to another query.
+    """
+    
+    if token is None:
+        return None
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+        query_of_token, last_id = payload['query'], int(payload['after'])
+    except (ValueError, TypeError, KeyError, AttributeError):
+        raise ValueError("Invalid cursor") from None
+    if query_of_token != query:
+        raise ValueError("The cursor belongs to another query")
+    return last_id
+
+
+def reservoir_sample(iterable, k, rng=None):
+    
+    """
+    Draws k items uniformly at random from an iterable of unknown length in O(k) memory.
+    
+    Parameters:
+        iterable (iterable): The items to sample from; it is consumed once.
+        k (int): The sample size.
+        rng (random.Random, optional): The source of randomness; the random module by default.
+        
+    Returns:
+        list: min(k, number of items) items, in random order.
+    """
+    
+    rng = rng or random
+    reservoir = []
+    for seen, item in enumerate(iterable):
+        if seen < k:
+            reservoir.append(item)
+        else:
+            slot = rng.randrange(seen + 1)
+            if slot < k:
+                reservoir[slot] = item
+    rng.shuffle(reservoir)
+    return reservoir
+
+
+# Largest number of changes times number of Pokemon a reload applies to the live
+# indexes one by one, under the write lock: each change shifts the sorted stat
+# indexes. Past it, new indexes are built beside the live ones and swapped in.
+RELOAD_INCREMENTAL_WORK = 10 ** 8
+
+# Rows per record batch, and so per Parquet row group, that to_parquet and to_feather write
+EXPORT_CHUNK = 65536
+
+# The stat columns of CSV_COLUMNS, in the order of STATS
+_STAT_COLUMNS = CSV_COLUMNS[-len(STATS):]
+
+# The attributes _build_indexes sets, swapped in together by a rebuilding reload
+_INDEX_ATTRIBUTES = ('_by_id', '_name_index', '_type_index', '_type_names', '_stat_index', '_columns',
+                     '_knn_cache', '_name_search', '_aggregates', '_sorted_ids')
+
+
+class Pokedex:
+    
+    """
+    A class representing a collection of Pokemon.
+
+    A Pokedex can be queried from many threads while others add and remove Pokemon.
+    Queries hold a shared lock and mutations hold it alone while they update memory, so
+    a query sees every index either before or after a change. self.pokemon is replaced
+    rather than changed in place, so code iterating it keeps a consistent snapshot.
+
+    Attributes:
+        pokemon (list): A list of Pokemon objects.
+        columnar (bool): Whether stat and type searches run on NumPy columns.
+        file_path (str): The JSON file the Pokemon were loaded from.
+
+    Methods:
+        __init__(self, file_path):
+            Initializes a Pokedex object with the data obtained from the JSON file.
+
+        search_by_name(self, name):
+            Searches for a Pokemon by name.
+
+        search_by_type(self, p_type, limit):
+            Searches for Pokemon by type.
+
+        search_by_stats(self, stat_name, stat_min, stat_max):
+            Returns a random Pokemon whose stat value for the specified stat name is within the given range.
+
+        compare_pokemon(self, pokemon1, pokemon2):
+            Compares two Pokemon based on their stats.
+
+        pokemon_visualize(self, name):
+            Visualizes the base attributes of a given Pokémon using a bar chart.
+
+        render_many(self, pokemon, out_dir, fmt, processes):
+            Writes the stat charts of several Pokemon to image files.
+
+        add_pokemon(self, poke_info):
+            Adds a new Pokemon to the Pokedex with the provided information.
+
+        reload(self, force):
+            Applies the changes of the JSON file to the loaded Pokemon and indexes.
+
+        to_dataframe(self, columns):
+            Returns the loaded Pokemon as a pandas DataFrame.
+    """
+    
+    # Number of journal records after which add_pokemon/remove_pokemon fold the
+    # journal back into the CSV file in the background
+    journal_threshold = 1000
+    
+    def __init__(self, file_path, columnar=False, snapshot=False, csv_path='pokedex.csv',
+                 cache_size=1024, cache_ttl=None):
+        
+        """
+        Initializes a Pokedex object with the data obtained from the JSON file.
+        
+        Parameters:
+            file_path (str): The path to the JSON file containing the Pokemon data.
+            columnar (bool, optional): If True, keep the stats and types in NumPy
+                arrays (see StatColumns) and answer stat and type searches with
+                vectorized masks instead of the type and stat indexes. The Pokemon
+                objects, the name index and the type aggregates are still built, so
+                this saves the stat and type indexes, not the per-Pokemon objects.
+            snapshot (bool, optional): If True, load the data from the binary snapshot
+                next to the JSON file when it is up to date, and write a new snapshot
+                after parsing the JSON file when it is not.
+            csv_path (str, optional): The CSV file that add_pokemon and remove_pokemon
+                change. Changes are recorded in a journal next to it first.
+            cache_size (int, optional): The number of query results to cache (see
+                QueryCache); 0 disables the cache.
+            cache_ttl (float, optional): Seconds a cached result stays valid. By default
+                results stay valid until an add or remove changes the Pokedex.
+            
+        Returns:
+            None
+        
+        Primary Author:
+            Samson Mulugeta
+        
+        Technique Demonstrated: 
+            with statements   
+            
+        """
+        
+        self.columnar = columnar
+        self.csv_path = csv_path
+        self._journal_lock = threading.Lock()
+        self._compaction_lock = threading.Lock()
+        self._journal_length = None
+        self._next_csv_id = None
+        self._compaction = None
+        self._added = {}
+        self._removed = []
+        self._query_cache = QueryCache(cache_size, cache_ttl)
+        self._lock = ReadWriteLock()
+        self.file_path = file_path
+        self._file_state = _file_state(file_path)
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        with _gc_paused():
+            loaded = load_snapshot(file_path) if snapshot else None
+            if loaded is not None:
+                if _instrumentation is not None:
+                    _record_bytes('load', read=_file_size(file_path + SNAPSHOT_SUFFIX))
+                self.pokemon, indexes = loaded
+                self._build_indexes(**indexes)
+                return
+            
+            source = _source_signature(file_path) if snapshot else None
+            self.pokemon = list(iter_pokemon(file_path))
+            if _instrumentation is not None:
+                _record_bytes('load', read=_file_size(file_path))
+            self._build_indexes()
+        if snapshot and _source_signature(file_path) == source:
+            write_snapshot(self.pokemon, file_path, source, self._aggregates)
+
+    def _build_indexes(self, stat_orders=None, aggregates=None, name_index=None, type_members=None):
+        
+        """
+        Builds every lookup index from scratch from self.pokemon.
+        
+        Parameters:
+            stat_orders (dict, optional): For each stat, the positions in self.pokemon
+                in sorted stat order, as stored in a snapshot. The stat indexes are
+                sorted here when it is not given.
+            aggregates (dict, optional): The TypeAggregate of each case-folded type, as
+                stored in a snapshot. They are computed here when not given.
+            name_index (dict, optional): The name index, as read from a snapshot.
+            type_members (dict, optional): The Pokemon of each case-folded type, as
+                read from a snapshot, which the type index is made from.
+            
+        Returns:
+            None
+        """
+        
+        self._by_id = {}
+        self._name_index = {}
+        self._type_index = {}
+        self._type_names = {}
+        self._stat_index = {stat: [] for stat in STATS}
+        self._columns = None
+        self._generation = 0
+        self._knn_cache = None
+        self._query_cache.clear()
+        self._name_search = None
+        self._aggregates = aggregates if aggregates is not None else _aggregate_types(self.pokemon)
+        self._by_id = by_id = {pkmn.id: pkmn for pkmn in self.pokemon}
+        if name_index is not None:
+            self._name_index = name_index
+        else:
+            for pkmn in self.pokemon:
+                for key in _name_keys(pkmn):
+                    self._name_index.setdefault(key, []).append(pkmn)
+        self._sorted_ids = array.array('q', sorted(by_id))
+        if self.columnar:
+            self._columns = StatColumns(self.pokemon)
+            return
+        if type_members is not None:
+            for key, members in type_members.items():
+                self._type_index[key] = {pkmn.id for pkmn in members}
+                self._type_names[key] = next(p_type for p_type in members[0].type if p_type.casefold() == key)
+        else:
+            for pkmn in self.pokemon:
+                for p_type in pkmn.type:
+                    key = p_type.casefold()
+                    self._type_index.setdefault(key, set()).add(pkmn.id)
+                    self._type_names.setdefault(key, p_type)
+        ids = [pkmn.id for pkmn in self.pokemon]
+        for stat in STATS:
+            values = [getattr(pkmn, stat) for pkmn in self.pokemon]
+            if stat_orders is None:
+                self._stat_index[stat] = sorted(zip(values, ids))
+            else:
+                order = stat_orders[stat]
+                self._stat_index[stat] = list(zip(map(values.__getitem__, order), map(ids.__getitem__, order)))
+
+    def _index_pokemon(self, pkmn):
+        
+        """
+        Adds a Pokemon to the lookup indexes.
+        
+        Every name of the Pokemon (English, Japanese, Chinese and French) is
+        case-folded and mapped to the Pokemon, so a lookup in any language is
+        a single dictionary access. Each type is mapped to the set of ids of
+        the Pokemon that have it, and each stat keeps a list of (value, id)
+        pairs in sorted order for range queries. In columnar mode the stats
+        and types go into the NumPy columns instead.
+        
+        Parameters:
+            pkmn (Pokemon): The Pokemon to index.
+            
+        Returns:
+            None
+        """
+        
+        self._generation += 1
+        if pkmn.id not in self._by_id:
+            bisect.insort(self._sorted_ids, pkmn.id)
+        self._by_id[pkmn.id] = pkmn
+        for key in _name_keys(pkmn):
+            if self._name_search is not None and key not in self._name_index:
+                self._name_search.add(key)
+            self._name_index.setdefault(key, []).append(pkmn)
+        for p_type in pkmn.type:
+            key = p_type.casefold()
+            if key not in self._aggregates:
+                self._aggregates[key] = TypeAggregate(p_type)
+            self._aggregates[key].add(pkmn)
+        if self.columnar:
+            if self._columns is not None:
+                self._columns.append(pkmn)
+            return
+        for p_type in pkmn.type:
+            key = p_type.casefold()
+            self._type_index.setdefault(key, set()).add(pkmn.id)
+            self._type_names.setdefault(key, p_type)
+        for stat in STATS:
+            bisect.insort(self._stat_index[stat], (getattr(pkmn, stat), pkmn.id))
+
+    def _unindex_pokemon(self, pkmn):
+        
+        """
+        Removes a Pokemon from the lookup indexes.
+        
+        Parameters:
+            pkmn (Pokemon): The Pokemon to remove.
+            
+        Returns:
+            None
+        """
+        
+        self._generation += 1
+        for key in _name_keys(pkmn):
+            matches = self._name_index.get(key, [])
+            if pkmn in matches:
+                matches.remove(pkmn)
+            if not matches:
+                self._name_index.pop(key, None)
+                if self._name_search is not None:
+                    self._name_search.remove(key)
+        if self._by_id.get(pkmn.id) is pkmn:
+            del self._by_id[pkmn.id]
+            del self._sorted_ids[bisect.bisect_left(self._sorted_ids, pkmn.id)]
+        for p_type in pkmn.type:
+            aggregate = self._aggregates.get(p_type.casefold())
+            if aggregate is not None:
+                aggregate.remove(pkmn)
+                if not aggregate.count:
+                    del self._aggregates[p_type.casefold()]
+        if self.columnar:
+            self._columns.remove(pkmn.id)
+            return
+        for p_type in pkmn.type:
+            key = p_type.casefold()
+            ids = self._type_index.get(key, set())
+            ids.discard(pkmn.id)
+            if not ids:
+                self._type_index.pop(key, None)
+                self._type_names.pop(key, None)
+        for stat in STATS:
+            entries = self._stat_index[stat]
+            entry = (getattr(pkmn, stat), pkmn.id)
+            position = bisect.bisect_left(entries, entry)
+            if position < len(entries) and entries[position] == entry:
+                del entries[position]
+
+    def _lookup_name(self, name):
+        
+        """
+        Finds a Pokemon by a name in any language using the name index.
+        
+        Different Pokemon can share a name across languages, so a Pokemon whose
+        English name matches wins over one that only matches in another language.
+        
+        Parameters:
+            name (str): The name to look up, in any language and any case.
+            
+        Returns:
+            (Pokemon) The matching Pokemon, otherwise None.
+        """
+        
+        key = name.casefold()
+        matches = self._name_index.get(key)
+        if not matches:
+            return None
+        return next((pkmn for pkmn in matches if pkmn.name['english'].casefold() == key), matches[0])
+        
+    @_read_locked
+    def search_by_name(self, name):
+        """
+        Searches for a Pokemon by name.
+
+        Parameters:
+            name (str): The name of the Pokemon to search for, in English, Japanese,
+                Chinese or French. The search is case-insensitive.
+
+        Returns:
+            (Pokemon) The Pokemon object if found, otherwise None.
+            
+        Primary Author:
+            Samson Mulugeta
+        
+        Technique Demonstrated: 
+            Conditional expressions 
+           
+        """
+
+        return self._lookup_name(name)
+    
+    def _name_search_index(self):
+        
+        """
+        Returns the prefix and fuzzy name index, building it the first time it is needed.
+        """
+        
+        if self._name_search is None:
+            self._name_search = NameSearchIndex(self._name_index)
+        return self._name_search
+    
+    def _is_english_key(self, key):
+        
+        """
+        Returns True if a case-folded name is the English name of some Pokemon.
+        """
+        
+        return any(pkmn.name['english'].casefold() == key for pkmn in self._name_index.get(key, ()))
+    
+    def _pokemon_for_keys(self, keys, limit):
+        
+        """
+        Returns the Pokemon for a ranked list of name keys, without duplicates.
+        """
+        
+        results = []
+        seen = set()
+        for key in keys:
+            for pkmn in sorted(self._name_index.get(key, ()), key=lambda pkmn: pkmn.name['english'].casefold() != key):
+                if pkmn.id not in seen:
+                    seen.add(pkmn.id)
+                    results.append(pkmn)
+                    if len(results) == limit:
+                        return results
+        return results
+    
+    @_read_locked
+    def search_by_prefix(self, prefix, limit=10):
+        
+        """
+        Returns the Pokemon with a name, in any language, that starts with a prefix.
+        
+        Parameters:
+            prefix (str): The start of the name, in any case.
+            limit (int, optional): The maximum number of Pokemon to return.
+            
+        Returns:
+            list: Up to `limit` Pokemon. An exact match comes first, then English names,
+                then shorter names.
+        """
+        
+        key = prefix.strip().casefold()
+        if not key:
+            return []
+        keys = self._name_search_index().prefix(key, limit)
+        keys.sort(key=lambda match: (match != key, not self._is_english_key(match), len(match), match))
+        return self._pokemon_for_keys(keys, limit)
+    
+    @_read_locked
+    def search_fuzzy(self, name, limit=10, max_distance=None):
+        
+        """
+        Returns the Pokemon whose name, in any language, is within a few typos of a name.
+        
+        Parameters:
+            name (str): The name to look for, in any case.
+            limit (int, optional): The maximum number of Pokemon to return.
+            max_distance (int, optional): The largest edit distance accepted. By default
+                1 for names of up to four characters and 2 for longer ones.
+            
+        Returns:
+            list: Up to `limit` (Pokemon, distance) tuples, closest first.
+        """
+        
+        key = name.strip().casefold()
+        if not key:
+            return []
+        if max_distance is None:
+            max_distance = 1 if len(key) <= 4 else 2
+        matches = self._name_search_index().fuzzy(key, max_distance)
+        matches.sort(key=lambda match: (match[1], -match[2], not self._is_english_key(match[0]), len(match[0]), match[0]))
+        pokemon = self._pokemon_for_keys([match[0] for match in matches], limit)
+        best = {}
+        for match_key, distance, _ in matches:
+            for pkmn in self._name_index.get(match_key, ()):
+                best.setdefault(pkmn.id, distance)
+        return [(pkmn, best[pkmn.id]) for pkmn in pokemon]
+    
+    @_read_locked
+    def search_by_type(self, p_type, num_results=None, operator='and'):
+        """Return a list of Pokemon with a certain type.
+
+        Args:
+            p_type (str or list): The type of Pokemon to search for. Several types can
+                be given as a list, or as a string such as "Fire AND Flying" or
+                "Water OR Ice".
+            num_results (int, optional): The maximum number of results to return.
+                If not specified, return all matching Pokemon.
+            operator (str, optional): 'and' to require every type, 'or' to accept any
+                of them, when the types are given as a list.
+
+        Returns:
+            list: A list of Pokemon objects that have the specified type.
+                If `num_results` is specified, return at most `num_results` Pokemon
+                chosen at random, otherwise all of them ordered by id.
+                If no Pokemon match the type, return an empty list.
+        
+        Raises:
+            ValueError: If the operator is not 'and' or 'or', or a string query mixes both.
+        
+        Primary Author:
+            Samson Mulugeta
+            
+        Technique Demonstrated: 
+            comprehensions or generator expressions 
+            
+        """
+        matching_ids = self._match_types(p_type, operator)
+        if num_results is None:
+            return [self._by_id[pkmn_id] for pkmn_id in matching_ids]
+        sample = random.sample(range(len(matching_ids)), min(num_results, len(matching_ids)))
+        return [self._by_id[matching_ids[i]] for i in sample]
+
+    def _match_types(self, p_type, operator='and'):
+        
+        """
+        Answers a type query from the type index, or from the columns in columnar mode.
+        
+        The set of matches is cached, so a repeated query only pays for sampling.
+        
+        Parameters:
+            p_type (str or list): A type, a list of types, or a string joining types
+                with AND or OR.
+            operator (str): 'and' or 'or', used when p_type is a list.
+            
+        Returns:
+            tuple: The ids of the matching Pokemon in increasing order.
+        
+        Raises:
+            ValueError: If the operator is not 'and' or 'or', or a string query mixes both.
+        """
+        
+        types, operator = _parse_type_query(p_type, operator)
+        key = ('type', operator, tuple(sorted({t.strip().casefold() for t in types})))
+        matching_ids = self._query_cache.get(key, self._generation)
+        if matching_ids is not _MISSING:
+            return matching_ids
+        
+        if self._columns is not None:
+            columns = self._columns
+            matching_ids = tuple(sorted(columns.ids[columns.type_mask(types, operator)].tolist()))
+        else:
+            id_sets = [self._type_index.get(t.strip().casefold(), set()) for t in types]
+            if not id_sets:
+                matching_ids = ()
+            elif operator == 'or':
+                matching_ids = tuple(sorted(set().union(*id_sets)))
+            else:
+                id_sets.sort(key=len)
+                matching_ids = tuple(sorted(id_sets[0].intersection(*id_sets[1:])))
+        self._query_cache.put(key, self._generation, matching_ids)
+        return matching_ids
+    
+    @_read_locked
+    def search_by_stats(self, stat_name, stat_min, stat_max, quiet=False):
+        
+        """
+        Returns a random Pokemon whose stat value for the specified stat name is within the given range.
+        
+        Parameters:
+            stat_name (str): the name of the stat to search by, e.g. 'attack', 'defense', etc.
+            stat_min (int): the minimum value for the stat
+            stat_max (int): the maximum value for the stat
+            quiet (bool): If True, do not print a message when nothing is found.
+        
+        Returns:
+            the Pokemon object with the highest value of the stat within the given range.
+            Returns None if no Pokemon are found that meet the criteria.
+            
+        Primary Author:
+            Kyle Doung
+        
+        Technique Demonstrated: 
+            Optional parameters and/or keyword arguments
+              
+        """
+        
+        pkmn = self._best_in_range(_stat_attr(stat_name), stat_min, stat_max)
+        if pkmn is None and not quiet:
+            print("No Pokemon found.")
+        return pkmn
+    
+    @_read_locked
+    def _best_in_range(self, stat, stat_min, stat_max):
+        
+        """
+        Finds the Pokemon with the highest value of a stat within a range, without printing.
+        
+        Parameters:
+            stat (str): One of the names in STATS.
+            stat_min (int): The minimum value for the stat.
+            stat_max (int): The maximum value for the stat.
+            
+        Returns:
+            (Pokemon) The Pokemon with the highest value in range, otherwise None.
+        """
+        
+        key = ('stats', stat, stat_min, stat_max)
+        best_id = self._query_cache.get(key, self._generation)
+        if best_id is _MISSING:
+            best = self._compute_best_in_range(stat, stat_min, stat_max)
+            best_id = best.id if best is not None else None
+            self._query_cache.put(key, self._generation, best_id)
+        return self._by_id[best_id] if best_id is not None else None
+    
+    def _compute_best_in_range(self, stat, stat_min, stat_max):
+        
+        """
+        Does the work of _best_in_range without the cache.
+        """
+        
+        if self._columns is not None:
+            return self._max_in_columns(stat, stat_min, stat_max)
+        
+        # Find the slice of the sorted stat index that meets the criteria
+        entries = self._stat_index[stat]
+        start, end = self._stat_range(stat, stat_min, stat_max)
+        if start >= end:
+            return None
+        
+        # The highest stat value is at the end of the slice; ties go to the lowest id
+        best_value = entries[end - 1][0]
+        return self._by_id[entries[bisect.bisect_left(entries, (best_value,), start, end)][1]]
+    
+    def _max_in_columns(self, stat, stat_min, stat_max):
+        
+        """
+        Columnar version of search_by_stats: a vectorized mask over one stat column.
+        
+        Parameters:
+            stat (str): One of the names in STATS.
+            stat_min (int): The minimum value for the stat.
+            stat_max (int): The maximum value for the stat.
+            
+        Returns:
+            (Pokemon) The Pokemon with the highest value in range, otherwise None.
+        """
+        
+        columns = self._columns
+        rows = columns.stat_mask(stat, stat_min, stat_max).nonzero()[0]
+        if not len(rows):
+            return None
+        values = columns.stats[rows, STATS.index(stat)]
+        best_rows = rows[values == values.max()]
+        return self._by_id[int(columns.ids[best_rows].min())]
+    
+    def _stat_range(self, stat, stat_min=None, stat_max=None):
+        
+        """
+        Finds the entries of a stat index within a range using two binary searches.
+        
+        Parameters:
+            stat (str): One of the names in STATS.
+            stat_min (int, optional): The minimum value, or None for no minimum.
+            stat_max (int, optional): The maximum value, or None for no maximum.
+            
+        Returns:
+            tuple: The start and end positions of the matching slice of self._stat_index[stat];
+                start equals end when nothing matches, including when stat_min > stat_max.
+        """
+        
+        entries = self._stat_index[stat]
+        start = 0 if stat_min is None else bisect.bisect_left(entries, (stat_min,))
+        end = len(entries) if stat_max is None else bisect.bisect_left(entries, (stat_max + 1,))
+        return start, max(start, end)
+    
+    def _stream(self, matches, after=None):
+        
+        """
+        Yields the Pokemon passing a test in increasing id order, in constant memory.
+        
+        The id index is read STREAM_CHUNK ids at a time, each time under the read lock,
+        and the next chunk starts after the last id seen. The lock is never held while
+        the caller consumes the stream, and Pokemon added or removed in the meantime are
+        seen or skipped according to their id.
+        
+        Parameters:
+            matches (callable): Returns True for the Pokemon to yield.
+            after (int, optional): Start after this id instead of at the beginning.
+            
+        Yields:
+            Pokemon: The matching Pokemon.
+        """
+        
+        while True:
+            with self._lock.read():
+                ids = self._sorted_ids
+                start = 0 if after is None else bisect.bisect_right(ids, after)
+                chunk = [self._by_id[ids[i]] for i in range(start, min(start + STREAM_CHUNK, len(ids)))]
+            if not chunk:
+                return
+            for pkmn in chunk:
+                if matches(pkmn):
+                    yield pkmn
+            after = chunk[-1].id
+    
+    def _type_stream(self, p_type, operator):
+        
+        """
+        Returns the normalized form of a type query and the test of one Pokemon against it.
+        """
+        
+        types, operator = _parse_type_query(p_type, operator)
+        keys = frozenset(t.strip().casefold() for t in types)
+        
+        if not keys:
+            def matches(pkmn):
+                return False
+        elif operator == 'or' or len(keys) == 1:
+            def matches(pkmn):
+                for p_type in pkmn.type:
+                    if p_type.casefold() in keys:
+                        return True
+                return False
+        else:
+            def matches(pkmn):
+                return keys.issubset([p_type.casefold() for p_type in pkmn.type])
+        
+        return ['type', operator, sorted(keys)], matches
+    
+    def _stats_stream(self, stat_name, stat_min, stat_max):
+        
+        """
+        Returns the normalized form of a stat range query and the test of one Pokemon against it.
+        """
+        
+        stat = _stat_attr(stat_name)
+        
+        def matches(pkmn):
+            value = getattr(pkmn, stat)
+            return (stat_min is None or value >= stat_min) and (stat_max is None or value <= stat_max)
+        
+        return ['stats', stat, stat_min, stat_max], matches
+    
+    def _page(self, query, matches, page_size, cursor):
+        
+        """
+        Returns one page of a stream and the cursor of the next page.
+        """
+        
+        if page_size < 1:
+            raise ValueError("page_size must be positive")
+        page = []
+        for pkmn in self._stream(matches, _decode_cursor(cursor, query)):
+            page.append(pkmn)
+            if len(page) == page_size:
+                return page, _encode_cursor(query, pkmn.id)
+        return page, None
+    
+    def iter_by_type(self, p_type, operator='and', cursor=None):
+        
+        """
+        Yields every Pokemon with a certain type in increasing id order, in constant memory.
+        
+        Parameters:
+            p_type (str or list): A type, a list of types, or a string such as
+                "Fire AND Flying" or "Water OR Ice".
+            operator (str, optional): 'and' or 'or', used when p_type is a list.
+            cursor (str, optional): A cursor from page_by_type to resume after.
+            
+        Returns:
+            generator: The matching Pokemon.
+            
+        Raises:
+            ValueError: If the query or the cursor is malformed.
+        """
+        
+        query, matches = self._type_stream(p_type, operator)
+        return self._stream(matches, _decode_cursor(cursor, query))
+    
+    def iter_by_stats(self, stat_name, stat_min, stat_max, cursor=None):
+        
+        """
+        Yields every Pokemon whose stat is within a range in increasing id order, in constant memory.
+        
+        Parameters:
+            stat_name (str): The name of the stat, e.g. 'attack' or 'Sp. Defense'.
+            stat_min (int): The minimum value for the stat, or None.
+            stat_max (int): The maximum value for the stat, or None.
+            cursor (str, optional): A cursor from page_by_stats to resume after.
+            
+        Returns:
+            generator: The matching Pokemon.
+            
+        Raises:
+            ValueError: If the stat or the cursor is malformed.
+        """
+        
+        query, matches = self._stats_stream(stat_name, stat_min, stat_max)
+        return self._stream(matches, _decode_cursor(cursor, query))
+    
+    def page_by_type(self, p_type, page_size, operator='and', cursor=None):
+        
+        """
+        Returns one page of the Pokemon with a certain type, in increasing id order.
+        
+        The cursor records the id of the last Pokemon of the page, so pages stay
+        consistent when Pokemon are added or removed between calls.
+        
+        Parameters:
+            p_type (str or list): As for iter_by_type.
+            page_size (int): The number of Pokemon per page.
+            operator (str, optional): As for iter_by_type.
+            cursor (str, optional): The cursor returned with the previous page.
+            
+        Returns:
+            tuple: (page, cursor), where cursor is None after the last page.
+            
+        Raises:
+            ValueError: If the query or the cursor is malformed.
+        """
+        
+        query, matches = self._type_stream(p_type, operator)
+        return self._page(query, matches, page_size, cursor)
+    
+    def page_by_stats(self, stat_name, stat_min, stat_max, page_size, cursor=None):
+        
+        """
+        Returns one page of the Pokemon whose stat is within a range, in increasing id order.
+        
+        Parameters:
+            stat_name (str): As for iter_by_stats.
+            stat_min (int): As for iter_by_stats.
+            stat_max (int): As for iter_by_stats.
+            page_size (int): The number of Pokemon per page.
+            cursor (str, optional): The cursor returned with the previous page.
+            
+        Returns:
+            tuple: (page, cursor), where cursor is None after the last page.
+            
+        Raises:
+            ValueError: If the stat or the cursor is malformed.
+        """
+        
+        query, matches = self._stats_stream(stat_name, stat_min, stat_max)
+        return self._page(query, matches, page_size, cursor)
+    
+    def sample_by_type(self, p_type, k, operator='and', rng=None):
+        
+        """
+        Draws k Pokemon with a certain type at random, with reservoir sampling over
+        iter_by_type, so memory is O(k) however many Pokemon match.
+        
+        Parameters:
+            p_type (str or list): As for iter_by_type.
+            k (int): The number of Pokemon to draw.
+            operator (str, optional): As for iter_by_type.
+            rng (random.Random, optional): The source of randomness.
+            
+        Returns:
+            list: min(k, matches) Pokemon in random order.
+        """
+        
+        return reservoir_sample(self.iter_by_type(p_type, operator), k, rng)
+    
+    def sample_by_stats(self, stat_name, stat_min, stat_max, k, rng=None):
+        
+        """
+        Draws k Pokemon whose stat is within a range at random, with reservoir sampling
+        over iter_by_stats.
+        
+        Parameters:
+            stat_name (str): As for iter_by_stats.
+            stat_min (int): As for iter_by_stats.
+            stat_max (int): As for iter_by_stats.
+            k (int): The number of Pokemon to draw.
+            rng (random.Random, optional): The source of randomness.
+            
+        Returns:
+            list: min(k, matches) Pokemon in random order.
+        """
+        
+        return reservoir_sample(self.iter_by_stats(stat_name, stat_min, stat_max), k, rng)
+    
+    @_read_locked
+    def search_by_stat_ranges(self, ranges):
+        
+        """
+        Returns every Pokemon whose stats are all within the given ranges.
+        
+        The candidates come from the index of the most selective stat and are then
+        checked against the other ranges, so no full scan is needed.
+        
+        Parameters:
+            ranges (dict): Maps a stat name to a (minimum, maximum) tuple. Either bound
+                may be None, e.g. {'speed': (100, 150), 'attack': (120, None)}.
+        
+        Returns:
+            list: The matching Pokemon ordered by id. An empty list if none match.
+        
+        Raises:
+            ValueError: If a stat name is not known.
+        """
+        
+        bounds = {}
+        for stat_name, (stat_min, stat_max) in ranges.items():
+            stat = _stat_attr(stat_name)
+            low, high = bounds.get(stat, (None, None))
+            if stat_min is not None:
+                low = stat_min if low is None else max(low, stat_min)
+            if stat_max is not None:
+                high = stat_max if high is None else min(high, stat_max)
+            bounds[stat] = (low, high)
+        if not bounds:
+            return sorted(self.pokemon, key=lambda pkmn: pkmn.id)
+        
+        key = ('ranges', tuple(sorted(bounds.items())))
+        matching_ids = self._query_cache.get(key, self._generation)
+        if matching_ids is _MISSING:
+            matching_ids = tuple(pkmn.id for pkmn in self._compute_stat_ranges(bounds))
+            self._query_cache.put(key, self._generation, matching_ids)
+        return [self._by_id[pkmn_id] for pkmn_id in matching_ids]
+    
+    def _compute_stat_ranges(self, bounds):
+        
+        """
+        Does the work of search_by_stat_ranges without the cache.
+        
+        Parameters:
+            bounds (dict): Maps each stat in STATS to a (minimum, maximum) tuple.
+            
+        Returns:
+            list: The matching Pokemon ordered by id.
+        """
+        
+        if self._columns is not None:
+            columns = self._columns
+            mask = columns.ids >= 0
+            for stat, (low, high) in bounds.items():
+                mask &= columns.stat_mask(stat, low, high)
+            return [self._by_id[pkmn_id] for pkmn_id in sorted(columns.ids[mask].tolist())]
+        
+        slices = {stat: self._stat_range(stat, *bound) for stat, bound in bounds.items()}
+        driver = min(slices, key=lambda stat: slices[stat][1] - slices[stat][0])
+        start, end = slices.pop(driver)
+        others = [(stat, bounds[stat]) for stat in slices]
+        
+        matching_pokemon = []
+        for _, pkmn_id in self._stat_index[driver][start:end]:
+            pkmn = self._by_id[pkmn_id]
+            if all((low is None or getattr(pkmn, stat) >= low) and (high is None or getattr(pkmn, stat) <= high)
+                   for stat, (low, high) in others):
+                matching_pokemon.append(pkmn)
+        return sorted(matching_pokemon, key=lambda pkmn: pkmn.id)
+    
+    def _plan_query(self, predicates, sort_stat=None, wanted=None):
+        
+        """
+        Chooses how to run a composite query.
+        
+        Every predicate is estimated from its index and the most selective one lists the
+        candidates, which are then filtered with the others. Prefix predicates are
+        estimated last and only counted up to the best estimate so far, since walking a
+        large part of the name trie is the one estimate that is not cheap; before the
+        trie has been built they are only used as filters.
+        
+        When the results are sorted by a stat and limited, walking that stat's index in
+        order and stopping after enough matches can beat the most selective predicate.
+        Assuming the predicates are independent, the walk visits about
+        wanted * len(self.pokemon) / (expected matches) entries; it is chosen when that
+        is fewer than the candidates of the most selective predicate.
+        
+        Parameters:
+            predicates (list): The QueryPredicate objects of the query.
+            sort_stat (str, optional): The stat in STATS the results are sorted by.
+            wanted (int, optional): offset + limit, when the query has a limit.
+            
+        Returns:
+            tuple: (access, steps). access is ('scan', None), ('index', predicate) or
+                ('walk', estimated entries visited); steps are (estimate, predicate)
+                tuples from the most to the least selective.
+        """
+        
+        total = len(self.pokemon)
+        steps = [(predicate.estimate(self), predicate) for predicate in predicates if predicate.kind != 'prefix']
+        for predicate in predicates:
+            if predicate.kind != 'prefix':
+                continue
+            if self._name_search is None:
+                steps.append((total, predicate))
+            else:
+                cap = min((estimate for estimate, _ in steps), default=None)
+                steps.append((predicate.estimate(self, None if cap is None else cap + 1), predicate))
+        steps.sort(key=lambda step: step[0])
+        
+        indexed = [step for step in steps if step[1].kind != 'prefix' or self._name_search is not None]
+        access = ('index', indexed[0][1]) if indexed else ('scan', None)
+        candidates = indexed[0][0] if indexed else total
+        if sort_stat is not None and wanted is not None and self._columns is None:
+            expected = float(total)
+            for estimate, _ in steps:
+                expected *= estimate / total if total else 0
+            walked = total if expected < 1 else min(total, round(wanted * total / expected))
+            if walked < candidates:
+                access = ('walk', walked)
+        if access[0] == 'index':
+            steps.sort(key=lambda step: step[1] is not access[1])
+        return access, steps
+    
+    def _walk_stat_index(self, stat, reverse, wanted, filters):
+        
+        """
+        Walks a stat index in order and collects the first Pokemon passing the filters.
+        
+        Ties are broken by increasing id, so a descending walk goes through the values
+        from the highest down but through each group of equal values by increasing id.
+        
+        Parameters:
+            stat (str): One of the names in STATS.
+            reverse (bool): True to walk from the highest value.
+            wanted (int): The number of matches needed.
+            filters (list): The QueryPredicate objects every match must pass.
+            
+        Returns:
+            list: At most `wanted` matches, in walk order.
+        """
+        
+        entries = self._stat_index[stat]
+        
+        def descending():
+            end = len(entries)
+            while end:
+                start = bisect.bisect_left(entries, (entries[end - 1][0],), 0, end)
+                yield from range(start, end)
+                end = start
+        
+        positions = descending() if reverse else range(len(entries))
+        matches = []
+        for i in positions:
+            pkmn = self._by_id[entries[i][1]]
+            if all(predicate.matches(pkmn) for predicate in filters):
+                matches.append(pkmn)
+                if len(matches) == wanted:
+                    break
+        return matches
+    
+    def _query_options(self, expression, sort, limit, offset):
+        
+        """
+        Parses a query and merges the sort, limit and offset given as arguments, which
+        win over the ones in the expression.
+        """
+        
+        predicates, options = parse_query(expression)
+        sort = sort if sort is not None else options.get('sort', 'id')
+        limit = limit if limit is not None else options.get('limit')
+        offset = offset if offset is not None else options.get('offset', 0)
+        if (limit is not None and limit < 0) or offset < 0:
+            raise ValueError("limit and offset cannot be negative")
+        return predicates, sort, limit, offset
+    
+    @_read_locked
+    def query(self, expression, sort=None, limit=None, offset=None):
+        
+        """
+        Runs a composite query such as 'type:Dragon speed>=100 attack:90..130 name^=Gar'.
+        
+        The syntax is described in parse_query and the choice of index in _plan_query:
+        the chosen index lists the candidates and only those are tested against the other
+        predicates. With a limit, only the top offset + limit results are kept while sorting.
+        
+        Parameters:
+            expression (str): The query.
+            sort (str, optional): A stat, 'id' or 'name', with a leading '-' for
+                descending order; overrides a sort: term. Results are in id order by default.
+            limit (int, optional): The largest number of results; overrides a limit: term.
+            offset (int, optional): The number of results to skip; overrides an offset: term.
+            
+        Returns:
+            list: The matching Pokemon.
+            
+        Raises:
+            ValueError: If the query is malformed.
+        """
+        
+        predicates, sort, limit, offset = self._query_options(expression, sort, limit, offset)
+        key, reverse, sort_stat = _sort_key(sort)
+        wanted = offset + limit if limit is not None else None
+        access, steps = self._plan_query(predicates, sort_stat, wanted)
+        if access[0] == 'walk':
+            matches = self._walk_stat_index(sort_stat, reverse, wanted, [predicate for _, predicate in steps])
+        else:
+            if access[0] == 'index':
+                candidates = (self._by_id[pkmn_id] for pkmn_id in access[1].candidate_ids(self))
+                filters = [predicate for _, predicate in steps[1:]]
+            else:
+                candidates = self.pokemon
+                filters = [predicate for _, predicate in steps]
+            matches = [pkmn for pkmn in candidates if all(predicate.matches(pkmn) for predicate in filters)]
+        if limit is None:
+            return sorted(matches, key=key, reverse=reverse)[offset:]
+        top = heapq.nlargest if reverse else heapq.nsmallest
+        return top(wanted, matches, key=key)[offset:]
+    
+    @_read_locked
+    def explain(self, expression, sort=None, limit=None, offset=None):
+        
+        """
+        Describes how query would run a composite query, without running it.
+        
+        Parameters:
+            expression (str): The query.
+            sort (str, optional): As for query.
+            limit (int, optional): As for query.
+            offset (int, optional): As for query.
+            
+        Returns:
+            str: One line per step, with the estimated number of Pokemon.
+            
+        Raises:
+            ValueError: If the query is malformed.
+        """
+        
+        predicates, sort, limit, offset = self._query_options(expression, sort, limit, offset)
+        _, reverse, sort_stat = _sort_key(sort)
+        wanted = offset + limit if limit is not None else None
+        access, steps = self._plan_query(predicates, sort_stat, wanted)
+        sources = {
+            'type': 'type index' if self._columns is None else 'type columns',
+            'stat': 'stat index' if self._columns is None else 'stat columns',
+            'name': 'name index',
+            'prefix': 'name trie'
+        }
+        lines = []
+        if access[0] == 'walk':
+            lines.append(f"walk {sort_stat} index {'descending' if reverse else 'ascending'} "
+                         f"until {wanted} matches, est. {access[1]} rows")
+        elif access[0] == 'scan':
+            lines.append(f"scan all {len(self.pokemon)} Pokemon")
+        filters = steps[1:] if access[0] == 'index' else steps
+        if access[0] == 'index':
+            estimate, predicate = steps[0]
+            lines.append(f"lookup {str(predicate):<24} via {sources[predicate.kind]:<12}  est. {estimate} rows")
+        for estimate, predicate in filters:
+            lines.append(f"filter {str(predicate):<24} {'':<17} est. {estimate} rows")
+        if limit is None:
+            lines.append(f"sort by {_sort_description(sort)}, offset {offset}")
+        else:
+            lines.append(f"top {wanted} by {_sort_description(sort)}, offset {offset}, limit {limit}")
+        return '\n'.join(lines)
+    
+    def compare_pokemon(self, pokemon1, pokemon2):
+        
+        """
+        Compares two Pokemon based on their stats.
+        
+        Parameters:
+            pokemon1 (Pokemon): The first Pokemon to compare.
+            pokemon2 (Pokemon): The second Pokemon to compare.
+            
+        Returns:
+            None
+            
+        Primary Author:
+            Samson Mulugeta
+            
+        Technique Demonstrated: 
+            F-strings containing expressions      
+            
+        """
+        
+        comparison = self.compare_stats(pokemon1, pokemon2)
+        name1, name2 = comparison['first'], comparison['second']
+        print(f"Comparing {name1} and {name2}...\n")
+        for stat, result in comparison['stats'].items():
+            value1, value2 = result['first'], result['second']
+            if result['winner'] == 'first':
+                print(f"{name1} has higher {stat}: {value1} vs {value2}")
+            elif result['winner'] == 'second':
+                print(f"{name2} has higher {stat}: {value2} vs {value1}")
+            else:
+                print(f"{name1} and {name2} have the same {stat}: {value1}")
+    
+    def compare_stats(self, pokemon1, pokemon2):
+        
+        """
+        Compares two Pokemon stat by stat and returns the result.
+        
+        Parameters:
+            pokemon1 (Pokemon): The first Pokemon to compare.
+            pokemon2 (Pokemon): The second Pokemon to compare.
+            
+        Returns:
+            dict: The English names under 'first' and 'second'; under 'stats', for each
+                stat, both values, the delta (first minus second) and the winner
+                ('first', 'second' or 'tie'); and the number of stats the first Pokemon
+                'wins', 'losses' and 'ties'.
+        """
+        
+        stats = {}
+        tally = {'first': 0, 'second': 0, 'tie': 0}
+        for stat in STATS:
+            value1, value2 = getattr(pokemon1, stat), getattr(pokemon2, stat)
+            winner = 'first' if value1 > value2 else 'second' if value1 < value2 else 'tie'
+            tally[winner] += 1
+            stats[stat] = {'first': value1, 'second': value2, 'delta': value1 - value2, 'winner': winner}
+        return {
+            'first': pokemon1.name['english'],
+            'second': pokemon2.name['english'],
+            'stats': stats,
+            'wins': tally['first'],
+            'losses': tally['second'],
+            'ties': tally['tie']
+        }
+    
+    def _stat_matrix(self, roster=None):
+        
+        """
+        Returns the stats of a roster as a NumPy matrix, one row per Pokemon.
+        
+        Parameters:
+            roster (list, optional): The Pokemon to include. The whole Pokedex, in the
+                order of self.pokemon, when not given.
+            
+        Returns:
+            tuple: The ids of the rows (list) and the int16 matrix with one column per stat in STATS.
+        """
+        
+        import numpy as np
+        
+        if roster is None and self._columns is not None:
+            return self._columns.ids.tolist(), self._columns.stats
+        roster = self.pokemon if roster is None else roster
+        stats = np.array([[getattr(pkmn, stat) for stat in STATS] for pkmn in roster], dtype=np.int16)
+        return [pkmn.id for pkmn in roster], stats.reshape(len(roster), len(STATS))
+    
+    @_read_locked
+    def comparison_matrix(self, roster1=None, roster2=None):
+        
+        """
+        Compares every Pokemon of one roster with every Pokemon of another in one vectorized pass.
+        
+        Parameters:
+            roster1 (list, optional): The Pokemon for the rows. The whole Pokedex when not given.
+            roster2 (list, optional): The Pokemon for the columns. The same as roster1 when not given.
+            
+        Returns:
+            dict: 'first_ids' and 'second_ids' (the ids of the rows and columns);
+                'deltas', an array of shape (rows, columns, 6) with the stat differences
+                (row minus column) in the order of STATS; and 'wins', 'losses' and 'ties',
+                arrays of shape (rows, columns) counting the stats the row Pokemon wins,
+                loses and ties against the column Pokemon.
+        """
+        
+        import numpy as np
+        
+        first_ids, first_stats = self._stat_matrix(roster1)
+        if roster2 is None and roster1 is not None:
+            second_ids, second_stats = first_ids, first_stats
+        else:
+            second_ids, second_stats = self._stat_matrix(roster2)
+        deltas = first_stats[:, None, :].astype(np.int32) - second_stats[None, :, :]
+        wins = (deltas > 0).sum(axis=2, dtype=np.int8)
+        losses = (deltas < 0).sum(axis=2, dtype=np.int8)
+        return {
+            'first_ids': first_ids,
+            'second_ids': second_ids,
+            'deltas': deltas,
+            'wins': wins,
+            'losses': losses,
+            'ties': len(STATS) - wins - losses
+        }
+                
+    def _knn_data(self):
+        
+        """
+        Returns the stats of the whole Pokedex prepared for nearest-neighbour queries.
+        
+        The result is cached until the next add or remove changes the Pokedex.
+        
+        Returns:
+            tuple: The ids (int array), the stats (float32 matrix, one column per stat
+                in STATS) and the standard deviation of each stat, used to normalize.
+        """
+        
+        import numpy as np
+        
+        if self._knn_cache is None or self._knn_cache[0] != self._generation:
+            ids, stats = self._stat_matrix()
+            stats = stats.astype(np.float32)
+            scale = stats.std(axis=0) if len(stats) else np.ones(len(STATS), dtype=np.float32)
+            scale[scale == 0] = 1
+            self._knn_cache = (self._generation, np.asarray(ids), stats, scale)
+        return self._knn_cache[1:]
+    
+    @_read_locked
+    def nearest_pokemon_many(self, targets, k=5, metric='euclidean', p_type=None, block_size=256):
+        
+        """
+        Finds, for each target, the k Pokemon whose six base stats are closest to it.
+        
+        Distances are computed for a block of targets against every candidate at once,
+        using |a - b|^2 = |a|^2 - 2ab + |b|^2, so memory stays bounded by block_size
+        times the number of candidates.
+        
+        Parameters:
+            targets (list): The Pokemon to find neighbours for.
+            k (int, optional): The number of neighbours per target.
+            metric (str, optional): 'euclidean' for raw stat distance, or 'normalized'
+                to divide each stat by its standard deviation across the Pokedex first.
+            p_type (str or list, optional): Only consider Pokemon matching this type
+                query (see search_by_type).
+            block_size (int, optional): The number of targets per block.
+            
+        Returns:
+            list: For each target, a list of up to k (Pokemon, distance) tuples, closest
+                first. A target is never its own neighbour.
+        
+        Raises:
+            ValueError: If the metric is not 'euclidean' or 'normalized'.
+        """
+        
+        import numpy as np
+        
+        if metric not in ('euclidean', 'normalized'):
+            raise ValueError(f"Unknown metric: {metric}")
+        ids, stats, scale = self._knn_data()
+        if p_type is not None:
+            keep = np.isin(ids, list(self._match_types(p_type)))
+            ids, stats = ids[keep], stats[keep]
+        if metric == 'normalized':
+            stats = stats / scale
+        squared_norms = (stats * stats).sum(axis=1)
+        
+        results = []
+        for start in range(0, len(targets), block_size):
+            block = targets[start:start + block_size]
+            points = np.array([[getattr(pkmn, stat) for stat in STATS] for pkmn in block], dtype=np.float32)
+            points = points.reshape(len(block), len(STATS))
+            if metric == 'normalized':
+                points = points / scale
+            distances = (points * points).sum(axis=1)[:, None] - 2 * points @ stats.T + squared_norms[None, :]
+            np.maximum(distances, 0, out=distances)
+            distances[ids[None, :] == np.array([pkmn.id for pkmn in block])[:, None]] = np.inf
+            
+            count = min(k, len(ids))
+            if count <= 0:
+                results.extend([] for _ in block)
+                continue
+            nearest = np.argpartition(distances, count - 1, axis=1)[:, :count]
+            for row, columns in enumerate(nearest):
+                columns = columns[np.argsort(distances[row, columns], kind='stable')]
+                results.append([(self._by_id[int(ids[column])], float(np.sqrt(distances[row, column])))
+                                for column in columns if np.isfinite(distances[row, column])])
+        return results
+    
+    def nearest_pokemon(self, pokemon, k=5, metric='euclidean', p_type=None):
+        
+        """
+        Finds the k Pokemon whose six base stats are closest to those of a given Pokemon.
+        
+        Parameters:
+            pokemon (Pokemon): The Pokemon to find replacements for.
+            k (int, optional): The number of neighbours.
+            metric (str, optional): 'euclidean' or 'normalized' (see nearest_pokemon_many).
+            p_type (str or list, optional): Only consider Pokemon matching this type query.
+            
+        Returns:
+            list: Up to k (Pokemon, distance) tuples, closest first.
+        """
+        
+        return self.nearest_pokemon_many([pokemon], k, metric, p_type)[0]
+    
+    def pokemon_visualize(pokedex, name):
+        
+        """
+        Visualizes the base attributes of a given Pokémon using a bar chart.
+        
+        Parameters:
+            name (str): The name of the Pokémon to visualize.
+        
+        Returns:
+            None
+        
+        Raises:
+            None
+            
+            
+        Primary Author:
+            Peter Zheng
+        
+        Technique Demonstrated: 
+            visualizing data with pyplot or seaborn
+
+        """
+        
+        import matplotlib.pyplot as plt
+        
+        pokemon = pokedex.search_by_name(name)
+        if not pokemon:
+            print('Pokemon not found.')
+            return
+        figure, ax = plt.subplots(figsize=(12, 7))
+        _draw_stat_chart(ax, pokemon.name["english"], [getattr(pokemon, stat) for stat in STATS])
+        plt.show()
+    
+    def render_many(self, pokemon, out_dir, fmt='png', processes=None):
+        
+        """
+        Writes the stat chart of several Pokemon to image files without opening a window.
+        
+        Charts are drawn with the Agg backend from the in-memory stats, in a pool of
+        worker processes. A manifest in out_dir remembers what each file was drawn from,
+        and charts whose data has not changed since the last render are skipped.
+        
+        Parameters:
+            pokemon (list): The Pokemon to draw, as Pokemon objects or names.
+            out_dir (str): The directory to write to. It is created if needed.
+            fmt (str, optional): The image format, e.g. 'png' or 'svg'.
+            processes (int, optional): The number of worker processes. The default is
+                the number of CPUs; 1 draws in the current process.
+            
+        Returns:
+            dict: The paths that were 'rendered' and the paths that were 'skipped'.
+        
+        Raises:
+            ValueError: If a name does not match any Pokemon.
+        """
+        
+        os.makedirs(out_dir, exist_ok=True)
+        manifest_path = os.path.join(out_dir, RENDER_MANIFEST)
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {}
+        
+        tasks = []
+        skipped = []
+        for pkmn in pokemon:
+            if isinstance(pkmn, str):
+                found = self.search_by_name(pkmn)
+                if found is None:
+                    raise ValueError(f"Pokemon not found: {pkmn}")
+                pkmn = found
+            title = pkmn.name['english']
+            values = [getattr(pkmn, stat) for stat in STATS]
+            filename = f"{pkmn.id:04d}-{re.sub(r'[^A-Za-z0-9]+', '-', title).strip('-') or 'pokemon'}.{fmt}"
+            path = os.path.join(out_dir, filename)
+            digest = hashlib.sha256(json.dumps([RENDER_VERSION, title, values, fmt]).encode('utf-8')).hexdigest()
+            if manifest.get(filename) == digest and os.path.exists(path):
+                skipped.append(path)
+            else:
+                tasks.append((title, values, path))
+                manifest[filename] = digest
+        
+        if processes == 1 or len(tasks) <= 1:
+            for task in tasks:
+                _render_chart(task)
+        elif tasks:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(processes) as pool:
+                list(pool.map(_render_chart, tasks, chunksize=max(1, len(tasks) // (4 * (processes or os.cpu_count() or 1)))))
+        
+        temp_path = f"{manifest_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=0, sort_keys=True)
+        os.replace(temp_path, manifest_path)
+        if _instrumentation is not None:
+            _record_bytes('render_many', written=sum(_file_size(task[2]) for task in tasks))
+        return {'rendered': [task[2] for task in tasks], 'skipped': skipped}
+    
+    def render_all(self, out_dir, fmt='png', processes=None):
+        
+        """
+        Writes the stat chart of every Pokemon in the Pokedex to image files (see render_many).
+        
+        Parameters:
+            out_dir (str): The directory to write to.
+            fmt (str, optional): The image format, e.g. 'png' or 'svg'.
+            processes (int, optional): The number of worker processes.
+            
+        Returns:
+            dict: The paths that were 'rendered' and the paths that were 'skipped'.
+        """
+        
+        return self.render_many(self.pokemon, out_dir, fmt, processes)
+    
+    def _export_source(self, columns):
+        
+        """
+        Collects what the columnar exports are built from. The caller must hold the read lock.
+        
+        Parameters:
+            columns (list): Column names from CSV_COLUMNS, or None for all of them.
+        
+        Returns:
+            tuple: (columns, store, rows), where store is a StatColumns holding the ids,
+                stats and type codes and rows lists the Pokemon of its rows, or is None
+                when no name column is wanted. Neither changes with the Pokedex.
+        
+        Raises:
+            ValueError: If a column is not in CSV_COLUMNS or is given twice.
+        """
+        
+        columns = list(CSV_COLUMNS) if columns is None else list(columns)
+        unknown = [column for column in columns if column not in CSV_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)} (expected some of {', '.join(CSV_COLUMNS)})")
+        if len(set(columns)) != len(columns):
+            raise ValueError("Each column can be exported only once")
+        if not self.columnar:
+            return columns, StatColumns(self.pokemon), self.pokemon
+        store = self._columns.copy()
+        rows = None
+        if any(column.startswith('name/') for column in columns):
+            rows = [self._by_id[pkmn_id] for pkmn_id in store.ids.tolist()]
+        return columns, store, rows
+    
+    @staticmethod
+    def _arrow_batch(pa, columns, store, rows, dictionary, start, stop):
+        
+        """
+        Builds an Arrow record batch from rows start to stop of the columns of _export_source.
+        
+        Ids and stats are wrapped from the NumPy arrays of store, and types are dictionary
+        arrays over the type codes, so only the names are copied out of Python objects.
+        """
+        
+        arrays = []
+        for column in columns:
+            if column == 'id':
+                arrays.append(pa.array(store.ids[start:stop]))
+            elif column.startswith('name/'):
+                language = column[len('name/'):]
+                arrays.append(pa.array([pkmn.name.get(language) for pkmn in rows[start:stop]], type=pa.string()))
+            elif column.startswith('type/'):
+                codes = store.types[start:stop, int(column[len('type/'):])]
+                arrays.append(pa.DictionaryArray.from_arrays(pa.array(codes, mask=codes < 0), dictionary))
+            else:
+                arrays.append(pa.array(store.stats[start:stop, _STAT_COLUMNS.index(column)]))
+        return pa.RecordBatch.from_arrays(arrays, names=columns)
+    
+    @_read_locked
+    def to_dataframe(self, columns=None):
+        
+        """
+        Returns the loaded Pokemon as a pandas DataFrame, without a round trip through a file.
+        
+        The columns are named and ordered as in pokedex.csv (see CSV_COLUMNS). Ids are
+        int32, stats int16 and types categorical, with NaN for a missing second type.
+        The numeric columns are copied once from the Pokedex (see StatColumns.copy),
+        and the stats form one block over that copy, so the frame does not change
+        when Pokemon are added or removed later.
+        
+        Parameters:
+            columns (list, optional): The columns to include, by default all of them.
+        
+        Returns:
+            pandas.DataFrame: One row per Pokemon, in the order of self.pokemon (in
+                columnar mode, in the row order of the columns).
+        
+        Raises:
+            ValueError: If a column is not in CSV_COLUMNS or is given twice.
+        """
+        
+        import pandas as pd
+        columns, store, rows = self._export_source(columns)
+        positions = [_STAT_COLUMNS.index(column) for column in columns if column in _STAT_COLUMNS]
+        stats = store.stats if positions == list(range(len(STATS))) else store.stats[:, positions]
+        frame = pd.DataFrame(stats, columns=[_STAT_COLUMNS[i] for i in positions], copy=False)
+        for position, column in enumerate(columns):
+            if column == 'id':
+                values = store.ids
+            elif column.startswith('name/'):
+                language = column[len('name/'):]
+                values = [pkmn.name.get(language) for pkmn in rows]
+            elif column.startswith('type/'):
+                values = pd.Categorical.from_codes(store.types[:, int(column[len('type/'):])], store.type_names)
+            else:
+                continue
+            frame.insert(position, column, values)
+        return frame
+    
+    @_read_locked
+    def to_arrow(self, columns=None):
+        
+        """
+        Returns the loaded Pokemon as a pyarrow Table, without a round trip through a file.
+        
+        The columns are those of to_dataframe. Ids and stats are wrapped from the
+        same one-time copy of the numeric columns where their layout allows it, and
+        types are dictionary encoded.
+        
+        Parameters:
+            columns (list, optional): The columns to include, by default all of them.
+        
+        Returns:
+            pyarrow.Table: One row per Pokemon, in the order of to_dataframe.
+        
+        Raises:
+            ValueError: If a column is not in CSV_COLUMNS or is given twice.
+        """
+        
+        import pyarrow as pa
+        columns, store, rows = self._export_source(columns)
+        dictionary = pa.array(store.type_names, type=pa.string())
+        return pa.Table.from_batches([self._arrow_batch(pa, columns, store, rows, dictionary, 0, store.size)])
+    
+    def _write_batches(self, path, columns, chunk_size, open_writer):
+        
+        """
+        Writes the Pokemon to a file chunk_size rows at a time with a pyarrow writer.
+        
+        The file is written next to path and moved over it once complete. It holds
+        the Pokemon as they were when the call started: the columns are copied under
+        the read lock, and adds and removes do not wait for the file to be written.
+        
+        Parameters:
+            path (str): The file to write.
+            columns (list): The columns to include, or None for all of them.
+            chunk_size (int): The number of rows per record batch.
+            open_writer (callable): Opens a writer given a path and an Arrow schema.
+        
+        Returns:
+            None
+        """
+        
+        import pyarrow as pa
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with self._lock.read():
+                columns, store, rows = self._export_source(columns)
+            dictionary = pa.array(store.type_names, type=pa.string())
+            schema = self._arrow_batch(pa, columns, store, rows, dictionary, 0, 0).schema
+            with open_writer(temp_path, schema) as writer:
+                for start in range(0, store.size, chunk_size):
+                    writer.write_batch(self._arrow_batch(pa, columns, store, rows, dictionary,
+                                                         start, start + chunk_size))
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        if _instrumentation is not None:
+            _record_bytes('export', written=_file_size(path))
+    
+    def to_parquet(self, path, columns=None, chunk_size=EXPORT_CHUNK, compression='snappy'):
+        
+        """
+        Writes the Pokemon to a Parquet file, one row group per chunk_size rows.
+        
+        Parameters:
+            path (str): The file to write.
+            columns (list, optional): The columns to include (see to_dataframe), by
+                default all of them.
+            chunk_size (int, optional): The number of rows converted and written at a time.
+            compression (str, optional): The Parquet compression codec, or None.
+        
+        Returns:
+            None
+        
+        Raises:
+            ValueError: If a column is not in CSV_COLUMNS is given twice, or chunk_size
+                is below 1.
+        """
+        
+        import pyarrow.parquet as pq
+        self._write_batches(path, columns, chunk_size,
+                            lambda target, schema: pq.ParquetWriter(target, schema, compression=compression))
+    
+    def to_feather(self, path, columns=None, chunk_size=EXPORT_CHUNK, compression='lz4'):
+        
+        """
+        Writes the Pokemon to a Feather (Arrow IPC) file, one record batch per chunk_size rows.
+        
+        Parameters:
+            path (str): The file to write.
+            columns (list, optional): The columns to include (see to_dataframe), by
+                default all of them.
+            chunk_size (int, optional): The number of rows converted and written at a time.
+            compression (str, optional): 'lz4', 'zstd' or None.
+        
+        Returns:
+            None
+        
+        Raises:
+            ValueError: If a column is not in CSV_COLUMNS is given twice, or chunk_size
+                is below 1.
+        """
+        
+        import pyarrow as pa
+        options = pa.ipc.IpcWriteOptions(compression=compression)
+        self._write_batches(path, columns, chunk_size,
+                            lambda target, schema: pa.ipc.new_file(target, schema, options=options))
+    
+    def add_pokemon(self, poke_info):
+        
+        """
+            Add a new Pokemon to the pokedex.csv file.
+            
+            The row is appended to the journal next to the CSV file and folded into
+            the file later by compact_journal.
+
+            Parameters:
+                poke_info (list): A list containing the following Pokemon information in the specified order:
+
+            Returns:
+                None
+                
+            Primary Author:
+                Peter Zheng
+                
+            Techniques Demonstrated:
+                Sequence unpacking
+                
+            """
+        # The journal and the CSV file always hold every column; the caller's list
+        # is filled in place because it reads the assigned id from poke_info[0]
+        poke_info[:] = _complete_csv_row(poke_info)
+        data = _csv_row_to_data(poke_info)
+        # The journal lock is held through the in-memory update, so changes reach
+        # memory in the order they were written to the journal
+        with self._journal_lock:
+            self._load_journal_state()
+            id = self._next_csv_id
+            poke_info[0] = str(id)
+            self._append_journal({'op': 'add', 'row': list(poke_info)})
+            self._next_csv_id += 1
+            data['id'] = id
+            pkmn = Pokemon(data)
+            with self._lock.write():
+                self._added[pkmn.id] = pkmn
+                self.pokemon = self.pokemon + [pkmn]
+                self._index_pokemon(pkmn)
+  
+    def remove_pokemon(self, pkm):
+        
+        """
+        Remove a Pokemon from the pokedex.csv file.
+        
+        The removal is appended to the journal next to the CSV file and applied to
+        the file later by compact_journal.
+
+        Parameters:
+            pkm (str): The name of the Pokemon to be removed.
+
+        Returns:
+            None
+                      
+        Primary Author:
+            Peter Zheng
+            
+        """
+        
+        with self._journal_lock:
+            self._load_journal_state()
+            self._append_journal({'op': 'remove', 'name': pkm})
+            with self._lock.write():
+                self._removed.append(pkm)
+                removed = [pkmn for pkmn in self._name_index.get(pkm.casefold(), []) if pkmn.name['english'] == pkm]
+                if not removed:
+                    return
+                removed_ids = set(map(id, removed))
+                self.pokemon = [pkmn for pkmn in self.pokemon if id(pkmn) not in removed_ids]
+                for pkmn in removed:
+                    if self._added.get(pkmn.id) is pkmn:
+                        del self._added[pkmn.id]
+                    self._unindex_pokemon(pkmn)
+
+    def _journal_paths(self):
+        
+        """
+        Returns the paths of the journal and of the journal being compacted.
+        """
+        
+        journal_path = self.csv_path + '.journal'
+        return journal_path, journal_path + '.compacting'
+
+    def _load_journal_state(self):
+        
+        """
+        Reads the next CSV id and the journal length once, the first time they are needed.
+        
+        The caller must hold self._journal_lock.
+        
+        Returns:
+            None
+        """
+        
+        if self._next_csv_id is not None:
+            return
+        header, rows = _read_csv_rows(self.csv_path)
+        if _instrumentation is not None:
+            _record_bytes('journal', read=_file_size(self.csv_path) + sum(map(_file_size, self._journal_paths())))
+        table = _JournalTable(rows)
+        journal_length = 0
+        for path in reversed(self._journal_paths()):
+            for record in _read_journal(path):
+                table.apply(record)
+                journal_length += 1
+        # The CSV file may not hold every loaded Pokemon, so new ids must not reuse theirs either
+        self._next_csv_id = max(table.max_id(), max(self._by_id, default=0)) + 1
+        self._journal_length = journal_length
+
+    def _append_journal(self, record):
+        
+        """
+        Appends one record to the journal and starts a background compaction when the
+        journal has grown past journal_threshold.
+        
+        The caller must hold self._journal_lock.
+        
+        Parameters:
+            record (dict): The change to record.
+            
+        Returns:
+            None
+        """
+        
+        journal_path, _ = self._journal_paths()
+        with open(journal_path, 'a', encoding='utf-8') as journal:
+            line = json.dumps(record, ensure_ascii=False) + '\n'
+            journal.write(line)
+            journal.flush()
+            os.fsync(journal.fileno())
+        if _instrumentation is not None:
+            _record_bytes('journal', written=len(line.encode('utf-8')))
+        self._journal_length += 1
+        if self._journal_length >= self.journal_threshold and not (self._compaction and self._compaction.is_alive()):
+            self._compaction = threading.Thread(target=self.compact_journal, daemon=True)
+            self._compaction.start()
+
+    def compact_journal(self):
+        
+        """
+        Folds the journal of added and removed Pokemon back into the CSV file.
+        
+        The journal is first renamed so that new changes go to a fresh journal, without
+        waiting, while the CSV file is rewritten. The new CSV file is written to a temporary file and renamed
+        into place, so a crash at any point leaves either the old or the new file, and the
+        renamed journal is replayed by the next compaction.
+        
+        Returns:
+            None
+        """
+        
+        journal_path, compacting_path = self._journal_paths()
+        with self._compaction_lock:
+            with self._journal_lock:
+                if os.path.exists(journal_path):
+                    if os.path.exists(compacting_path):
+                        # A previous compaction did not finish; keep its records in order
+                        with open(compacting_path, 'a', encoding='utf-8') as target, \
+                                open(journal_path, 'r', encoding='utf-8') as source:
+                            target.write(source.read())
+                        os.remove(journal_path)
+                    else:
+                        os.replace(journal_path, compacting_path)
+                if self._journal_length is not None:
+                    self._journal_length = 0
+            if not os.path.exists(compacting_path):
+                return
+            
+            header, rows = _read_csv_rows(self.csv_path)
+            if _instrumentation is not None:
+                _record_bytes('compact_journal', read=_file_size(self.csv_path) + _file_size(compacting_path))
+            table = _JournalTable(rows)
+            for record in _read_journal(compacting_path):
+                table.apply(record)
+            temp_path = f"{self.csv_path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8', newline='') as csvfile:
+                writer = csv.writer(csvfile)
+                writer.writerow(header or CSV_COLUMNS)
+                writer.writerows(table.rows.values())
+                csvfile.flush()
+                os.fsync(csvfile.fileno())
+            os.replace(temp_path, self.csv_path)
+            if _instrumentation is not None:
+                _record_bytes('compact_journal', written=_file_size(self.csv_path))
+            os.remove(compacting_path)
+
+    @_read_locked
+    def type_summary(self, p_type):
+        
+        """
+        Returns the count and the mean, minimum and maximum of each stat for one type.
+        
+        The numbers come from running statistics kept up to date by add_pokemon and
+        remove_pokemon, so no Pokemon are scanned.
+        
+        Parameters:
+            p_type (str): The type, in any case.
+            
+        Returns:
+            dict: The summary described in TypeAggregate.summary, or None if no Pokemon has the type.
+        """
+        
+        aggregate = self._aggregates.get(p_type.strip().casefold())
+        return aggregate.summary() if aggregate else None
+    
+    @_read_locked
+    def type_summaries(self):
+        
+        """
+        Returns the summary of every type, ordered by type name.
+        
+        Returns:
+            list: One summary per type (see type_summary).
+        """
+        
+        return [aggregate.summary() for aggregate in sorted(self._aggregates.values(), key=lambda a: a.name)]
     
-    def __init__(self, file_path):
+    @_read_locked
+    def type_distribution(self, p_type, stat='total'):
         
         """
-        Initializes a Pokedex object with the data obtained from the JSON file.
+        Returns the distribution of a stat, or of the base stat total, among the Pokemon of a type.
         
         Parameters:
-            file_path (str): The path to the JSON file containing the Pokemon data.
+            p_type (str): The type, in any case.
+            stat (str, optional): A stat name, or 'total' for the base stat total.
             
         Returns:
-            None
-        
-        Primary Author:
-            Samson Mulugeta
-        
-        Technique Demonstrated: 
-            with statements   
-            
+            list: (value, count) tuples in increasing order of value; empty if no Pokemon has the type.
         """
         
-        with open(file_path, 'r', encoding='utf-8') as f:
-            pokemon_data = json.load(f)
-        self.pokemon = [Pokemon(data) for data in pokemon_data]
+        aggregate = self._aggregates.get(p_type.strip().casefold())
+        if aggregate is None:
+            return []
+        return aggregate.distribution(stat if stat == 'total' else _stat_attr(stat))
+    
+    def cache_stats(self):
         
-    def search_by_name(self, name):
         """
-        Searches for a Pokemon by name.
-
-        Parameters:
-            name (str): The name of the Pokemon to search for.
-
-        Returns:
-            (Pokemon) The Pokemon object if found, otherwise None.
-            
-        Primary Author:
-            Samson Mulugeta
+        Returns the hit, miss, eviction and invalidation counts of the query result cache.
         
-        Technique Demonstrated: 
-            Conditional expressions 
-           
+        Returns:
+            dict: See QueryCache.stats.
         """
-
-        return next((pkmn for pkmn in self.pokemon if pkmn.name['english'].lower() == name.lower()), None)
+        
+        return self._query_cache.stats()
     
-    def search_by_type(self, p_type, num_results=None):
-        """Return a list of Pokemon with a certain type.
-
-        Args:
-            p_type (str): The type of Pokemon to search for.
-            num_results (int, optional): The maximum number of results to return.
-                If not specified, return all matching Pokemon.
-
-        Returns:
-            list: A list of Pokemon objects that have the specified type.
-                If `num_results` is specified, return at most `num_results` Pokemon.
-                If no Pokemon match the type, return an empty list.
+    def clear_cache(self):
         
-        Primary Author:
-            Samson Mulugeta
-            
-        Technique Demonstrated: 
-            comprehensions or generator expressions 
-            
         """
-        matching_pokemon = [pkmn for pkmn in self.pokemon if p_type.lower() in [t.lower() for t in pkmn.type]]
-        matching_pokemon = random.sample(matching_pokemon, min(num_results, len(matching_pokemon)))
-        return matching_pokemon
+        Drops every cached query result.
+        
+        Returns:
+            None
+        """
+        
+        self._query_cache.clear()
     
-    def search_by_stats(self, stat_name, stat_min, stat_max):
+    def reload(self, force=False):
         
         """
-        Returns a random Pokemon whose stat value for the specified stat name is within the given range.
+        Applies the changes of the JSON file to the loaded Pokemon and indexes.
+        
+        The file is parsed and compared with the loaded Pokemon by id while queries
+        keep running on the current state. Only the inserted, updated and deleted
+        Pokemon then go through the indexes, under the write lock, so a query sees
+        the old or the new file but never a mix. When so many Pokemon changed that
+        this would hold the lock long (see RELOAD_INCREMENTAL_WORK), new indexes are
+        built beside the live ones instead and swapped in. The Pokemon added with
+        add_pokemon are not in the JSON file, so they are kept on top of it, and the
+        removes made since the last reload are applied to it (see _replay_changes).
+        After that the file decides, so a later edit can bring a removed name back.
         
         Parameters:
-            stat_name (str): the name of the stat to search by, e.g. 'attack', 'defense', etc.
-            stat_min (int): the minimum value for the stat
-            stat_max (int): the maximum value for the stat
+            force (bool, optional): Reload even if the modification time and size of
+                the file are unchanged.
         
         Returns:
-            a random Pokemon object whose stat value for the specified stat name is within the given range.
-            Returns None if no Pokemon are found that meet the criteria.
-            
-        Primary Author:
-            Kyle Doung
-        
-        Technique Demonstrated: 
-            Optional parameters and/or keyword arguments
-              
+            dict: The 'inserted', 'updated' and 'deleted' counts and whether the
+                indexes were 'rebuilt', or None if the file is unchanged.
         """
         
-        # Find all Pokemon that meet the criteria
-        matching_pokemon = [pkmn for pkmn in self.pokemon if stat_min <= getattr(pkmn, stat_name.lower()) <= stat_max]
-        
-        if not matching_pokemon:
-            print("No Pokemon found.")
-            return None
-        
-        # Return the Pokemon with the highest stat value for the specified stat name
-        return max(matching_pokemon, key=lambda pkmn: getattr(pkmn, stat_name.lower()))
+        with self._reload_lock:
+            state = _file_state(self.file_path)
+            if not force and state == self._file_state:
+                return None
+            parsed = list(iter_pokemon(self.file_path))
+            if _instrumentation is not None:
+                _record_bytes('load', read=_file_size(self.file_path))
+            while True:
+                with self._lock.read():
+                    current = self.pokemon
+                    by_id = self._by_id
+                    seen = len(self._removed)
+                    target = self._replay_changes(parsed)
+                    target_ids = {pkmn.id for pkmn in target}
+                    pokemon, inserted, updated = [], [], []
+                    for pkmn in target:
+                        old = by_id.get(pkmn.id)
+                        if old is None:
+                            inserted.append(pkmn)
+                        elif _same_pokemon(old, pkmn):
+                            pkmn = old
+                        else:
+                            updated.append((old, pkmn))
+                        pokemon.append(pkmn)
+                    deleted = [pkmn for pkmn_id, pkmn in by_id.items() if pkmn_id not in target_ids]
+                    unique = len(target_ids) == len(target) and len(by_id) == len(current)
+                changes = len(inserted) + len(updated) + len(deleted)
+                rebuild = changes * len(pokemon) > RELOAD_INCREMENTAL_WORK or not unique
+                if rebuild:
+                    shadow = object.__new__(Pokedex)
+                    shadow.columnar = self.columnar
+                    shadow._query_cache = QueryCache(0)
+                    shadow.pokemon = pokemon
+                    shadow._build_indexes()
+                # The journal lock keeps the next CSV id still while it is raised past the new ids
+                with self._journal_lock, self._lock.write():
+                    # An add or remove ran since the comparison: compare again
+                    if self.pokemon is not current or len(self._removed) != seen:
+                        continue
+                    if rebuild:
+                        generation = self._generation
+                        for name in _INDEX_ATTRIBUTES:
+                            setattr(self, name, getattr(shadow, name))
+                        self._generation = generation + 1
+                        self._query_cache.clear()
+                    elif changes:
+                        for old in deleted + [old for old, _ in updated]:
+                            self._unindex_pokemon(old)
+                        for new in inserted + [new for _, new in updated]:
+                            self._index_pokemon(new)
+                    self.pokemon = pokemon
+                    self._file_state = state
+                    del self._removed[:seen]
+                    if self._next_csv_id is not None:
+                        self._next_csv_id = max(self._next_csv_id, max(self._by_id, default=0) + 1)
+                break
+        return {'inserted': len(inserted), 'updated': len(updated), 'deleted': len(deleted), 'rebuilt': rebuild}
     
-    def compare_pokemon(self, pokemon1, pokemon2):
+    def _replay_changes(self, parsed):
         
         """
-        Compares two Pokemon based on their stats.
+        Applies the Pokemon added since the Pokedex was created and the removes made since
+        the last reload to freshly parsed Pokemon.
+        
+        The caller must hold the read or write lock.
         
         Parameters:
-            pokemon1 (Pokemon): The first Pokemon to compare.
-            pokemon2 (Pokemon): The second Pokemon to compare.
-            
+            parsed (list): The Pokemon of the JSON file.
+        
         Returns:
-            None
-            
-        Primary Author:
-            Samson Mulugeta
-            
-        Technique Demonstrated: 
-            F-strings containing expressions      
-            
+            list: The parsed Pokemon without the removed names, followed by the added
+                Pokemon that are still loaded. An added Pokemon replaces a parsed one
+                with the same id.
         """
         
-        print(f"Comparing {pokemon1.name['english']} and {pokemon2.name['english']}...\n")
-        stats_to_compare = ['hp', 'attack', 'defense', 'sp_attack', 'sp_defense', 'speed']
-        for stat in stats_to_compare:
-            if getattr(pokemon1, stat) > getattr(pokemon2, stat):
-                print(f"{pokemon1.name['english']} has higher {stat}: {getattr(pokemon1, stat)} vs {getattr(pokemon2, stat)}")
-            elif getattr(pokemon1, stat) < getattr(pokemon2, stat):
-                print(f"{pokemon2.name['english']} has higher {stat}: {getattr(pokemon2, stat)} vs {getattr(pokemon1, stat)}")
-            else:
-                print(f"{pokemon1.name['english']} and {pokemon2.name['english']} have the same {stat}: {getattr(pokemon1, stat)}")
-                
-    def pokemon_visualize(pokedex, name):
+        if not self._added and not self._removed:
+            return parsed
+        removed_names = set(self._removed)
+        kept = [pkmn for pkmn in parsed if pkmn.name['english'] not in removed_names and pkmn.id not in self._added]
+        return kept + list(self._added.values())
+    
+    def watch(self, interval=1.0):
         
         """
-        Visualizes the base attributes of a given Pokémon using a bar chart.
+        Starts a background thread that reloads the JSON file whenever it changes.
+        
+        The thread polls the modification time and size of the file every interval
+        seconds and calls reload when either differs. A file that cannot be parsed,
+        for instance because it is still being written, is reported on stderr once
+        and tried again when it changes; the Pokedex keeps its current state meanwhile.
         
         Parameters:
-            name (str): The name of the Pokémon to visualize.
+            interval (float, optional): Seconds between two polls.
         
         Returns:
             None
-        
-        Raises:
-            None
-            
-            
-        Primary Author:
-            Peter Zheng
-        
-        Technique Demonstrated: 
-            visualizing data with pyplot or seaborn
-
         """
         
-        pokedex_df = pd.read_csv("pokedex.csv")
-        pokemon = pokedex.search_by_name(name)
-        if not pokemon:
-            print('Pokemon not found.')
-            return
-        pokemon_df = pokedex_df.loc[pokedex_df["name/english"] == name]
-        cols = ["base/HP", "base/Attack", "base/Defense", "base/Sp. Attack", "base/Sp. Defense", "base/Speed"]
-        attribute_values = pokemon_df[cols].values[0].tolist()
-        figure, ax = plt.subplots(figsize=(12, 7))
-        ax.bar(cols, attribute_values)
-        ax.set_xlabel("Attribute")
-        ax.set_ylabel("Value")
-        ax.set_title(pokemon.name["english"])
-        for i, v in enumerate(attribute_values):
-            ax.text(i, v+1, str(v), ha='center', fontsize=10)
-        plt.show()
+        self.stop_watching()
+        stop = threading.Event()
         
-    def add_pokemon(self, poke_info):
+        def poll():
+            failed = None
+            while not stop.wait(interval):
+                state = _file_state(self.file_path)
+                if state == failed:
+                    continue
+                try:
+                    self.reload()
+                except (OSError, ValueError, KeyError, TypeError) as error:
+                    failed = state
+                    print(f"Could not reload {self.file_path}: {error}", file=sys.stderr)
         
-        """
-            Add a new Pokemon to the pokedex.csv file.
-
-            Parameters:
-                poke_info (list): A list containing the following Pokemon information in the specified order:
-
-            Returns:
-                None
-                
-            Primary Author:
-                Peter Zheng
-                
-            Techniques Demonstrated:
-                Sequence unpacking
-                
-            """
-        with open('pokedex.csv', 'a+', encoding="utf-8", newline='') as csvfile:
-            csvfile.seek(0)
-            reader = csv.reader(csvfile)
-            writer = csv.writer(csvfile)
-            last_row = None
-            for row in reader:
-                last_row = row
-            if last_row is None:
-                id = 1
-            else:
-                id = int(last_row[0]) + 1
-            poke_info[0] = str(id)
-            writer.writerow(poke_info)
-  
-    def remove_pokemon(self, pkm):
+        thread = threading.Thread(target=poll, daemon=True)
+        self._watcher = (thread, stop)
+        thread.start()
+    
+    def stop_watching(self):
         
         """
-        Remove a Pokemon from the pokedex.csv file.
-
-        Parameters:
-            pkm (str): The name of the Pokemon to be removed.
-
+        Stops the thread started by watch, if any, and waits for it to finish.
+        
         Returns:
             None
-                      
-        Primary Author:
-            Peter Zheng
-            
         """
         
-        df = pd.read_csv("pokedex.csv")
-        df = df[df["name/english"] != pkm]
-        df.to_csv("pokedex.csv", index=False)
-
+        if self._watcher is None:
+            return
+        thread, stop = self._watcher
+        self._watcher = None
+        stop.set()
+        thread.join()
+    
+    @_read_locked
     def get_all_types(self):
         
         """
@@ -321,10 +3998,9 @@ class Pokedex:
             
         """
         
-        all_types = set()
-        for pkmn in self.pokemon:
-            all_types.update(pkmn.type)
-        return sorted(all_types)
+        if self._columns is not None:
+            return sorted(self._columns.present_types())
+        return sorted(self._type_names.values())
     
     def print_all_types(self):
         
@@ -339,17 +4015,15 @@ class Pokedex:
             
         """
         
-        all_types = set()
-        for pkmn in self.pokemon:
-            all_types |= set(pkmn.type)
-        print('All types:', ', '.join(sorted(all_types)))
+        print('All types:', ', '.join(self.get_all_types()))
             
+    @_read_locked
     def get_pokemon_name(self, name):
         """
-        Searches for a Pokemon by its English name in the `self.pokemon` list and returns its name in English, Japanese, Chinese, and French.
+        Searches for a Pokemon by name in the name index and returns its name in English, Japanese, Chinese, and French.
 
         Args:
-        - name (str): The English name of the Pokemon to search for.
+        - name (str): The name of the Pokemon to search for, in any of the four languages.
 
         Returns:
         - (dict) A dictionary containing the name of the Pokemon in English, Japanese, Chinese, and French, if the Pokemon is found.
@@ -359,23 +4033,360 @@ class Pokedex:
             Samson Mulugeta
         
         """
-        for pokemon in self.pokemon:
-            if pokemon.name['english'].lower() == name.lower():
-                return {
-                    'english': pokemon.name['english'],
-                    'japanese': pokemon.name['japanese'],
-                    'chinese': pokemon.name['chinese'],
-                    'french': pokemon.name['french']
+        key = ('translate', name.casefold())
+        pkmn_id = self._query_cache.get(key, self._generation)
+        if pkmn_id is _MISSING:
+            pokemon = self._lookup_name(name)
+            pkmn_id = pokemon.id if pokemon is not None else None
+            self._query_cache.put(key, self._generation, pkmn_id)
+        if pkmn_id is None:
+            return None
+        pokemon = self._by_id[pkmn_id]
+        return {
+            'english': pokemon.name['english'],
+            'japanese': pokemon.name.get('japanese', ''),
+            'chinese': pokemon.name.get('chinese', ''),
+            'french': pokemon.name.get('french', '')
+        }
+
+class Instrumentation:
+    
+    """
+    Per-operation call counts, latency histograms and file traffic of the Pokedex.
+    
+    Latencies are counted in power-of-two buckets of microseconds, so recording a call
+    is a dictionary update whatever the number of calls.
+    
+    Attributes:
+        operations (dict): For each operation, its 'calls', 'total_ns', 'max_ns',
+            'histogram', 'bytes_read' and 'bytes_written'.
+    """
+    
+    def __init__(self):
+        
+        """
+        Creates empty statistics.
+        """
+        
+        self.operations = {}
+        self._lock = threading.Lock()
+    
+    def _operation(self, name):
+        operation = self.operations.get(name)
+        if operation is None:
+            operation = {'calls': 0, 'total_ns': 0, 'max_ns': 0, 'histogram': {}, 'bytes_read': 0, 'bytes_written': 0}
+            self.operations[name] = operation
+        return operation
+    
+    def record_call(self, name, elapsed_ns):
+        
+        """
+        Records one call of an operation and how long it took.
+        """
+        
+        bucket = 1 << max(0, (elapsed_ns // 1000).bit_length())
+        with self._lock:
+            operation = self._operation(name)
+            operation['calls'] += 1
+            operation['total_ns'] += elapsed_ns
+            operation['max_ns'] = max(operation['max_ns'], elapsed_ns)
+            operation['histogram'][bucket] = operation['histogram'].get(bucket, 0) + 1
+    
+    def record_bytes(self, name, read=0, written=0):
+        
+        """
+        Records bytes read from and written to files by an operation.
+        """
+        
+        with self._lock:
+            operation = self._operation(name)
+            operation['bytes_read'] += read
+            operation['bytes_written'] += written
+    
+    def report(self):
+        
+        """
+        Returns the statistics in a form that can be encoded as JSON.
+        
+        Returns:
+            dict: For each operation, the call count, total and mean time in milliseconds
+                and microseconds, the slowest call, the bytes read and written, and the
+                histogram as a mapping from an upper bound such as "<=64us" to a count.
+        """
+        
+        with self._lock:
+            report = {}
+            for name, operation in sorted(self.operations.items()):
+                calls = operation['calls']
+                report[name] = {
+                    'calls': calls,
+                    'total_ms': operation['total_ns'] / 1e6,
+                    'mean_us': operation['total_ns'] / calls / 1e3 if calls else None,
+                    'max_us': operation['max_ns'] / 1e3,
+                    'bytes_read': operation['bytes_read'],
+                    'bytes_written': operation['bytes_written'],
+                    'histogram': {f"<={bucket}us": count for bucket, count in sorted(operation['histogram'].items())}
                 }
+            return report
+
+
+_instrumentation = None
+
+
+def _record_bytes(name, read=0, written=0):
+    
+    """
+    Records file traffic for an operation when instrumentation is enabled.
+    """
+    
+    if _instrumentation is not None:
+        _instrumentation.record_bytes(name, read, written)
+
+
+def _file_size(path):
+    
+    """
+    Returns the size of a file, or 0 if it does not exist.
+    """
+    
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _timed(name, method):
+    
+    """
+    Wraps a method so that every call is recorded under an operation name.
+    """
+    
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter_ns()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            if _instrumentation is not None:
+                _instrumentation.record_call(name, time.perf_counter_ns() - start)
+    wrapper._instrumented = method
+    return wrapper
+
+
+def enable_instrumentation():
+    
+    """
+    Starts recording call counts, latencies and file traffic of every public Pokedex method.
+    
+    The methods are wrapped only while instrumentation is enabled, so it costs nothing
+    when it is off. Loading a Pokedex is recorded as 'load'.
+    
+    Returns:
+        Instrumentation: The object collecting the statistics.
+    """
+    
+    global _instrumentation
+    if _instrumentation is None:
+        _instrumentation = Instrumentation()
+        for name, method in list(vars(Pokedex).items()):
+            if callable(method) and (name == '__init__' or not name.startswith('_')):
+                setattr(Pokedex, name, _timed('load' if name == '__init__' else name, method))
+    return _instrumentation
+
+
+def disable_instrumentation():
+    
+    """
+    Stops recording and removes the wrappers added by enable_instrumentation.
+    
+    Returns:
+        dict: The final report (see Instrumentation.report), or None if it was not enabled.
+    """
+    
+    global _instrumentation
+    if _instrumentation is None:
         return None
+    for name, method in list(vars(Pokedex).items()):
+        if hasattr(method, '_instrumented'):
+            setattr(Pokedex, name, method._instrumented)
+    report = _instrumentation.report()
+    _instrumentation = None
+    return report
+
+
+def instrumentation_report():
+    
+    """
+    Returns the statistics recorded so far, or None if instrumentation is not enabled.
+    """
+    
+    return _instrumentation.report() if _instrumentation is not None else None
+
+
+_STRING = ((str,), "a string")
+_OPTIONAL_STRING = ((str, type(None)), "a string or null")
+_OPTIONAL_INTEGER = ((int, type(None)), "an integer or null")
+_OPTIONAL_NUMBER = ((int, float, type(None)), "a number or null")
+
+# The JSON types execute_query accepts for each field of a query
+_QUERY_FIELDS = {
+    'op': _STRING, 'name': _STRING, 'type': _STRING, 'operator': _STRING, 'stat': _STRING,
+    'first': _STRING, 'second': _STRING, 'query': _STRING, 'sort': _OPTIONAL_STRING,
+    'cursor': _OPTIONAL_STRING, 'row': ((list,), "a list"), 'size': ((int,), "an integer"),
+    'limit': _OPTIONAL_INTEGER, 'offset': _OPTIONAL_INTEGER, 'min': _OPTIONAL_NUMBER, 'max': _OPTIONAL_NUMBER
+}
+
+
+def _check_query_fields(query):
+    
+    """
+    Checks the JSON type of every known field of a query.
+    
+    Parameters:
+        query (dict): The query.
+        
+    Returns:
+        None
+        
+    Raises:
+        TypeError: If a field has the wrong type; booleans are not accepted as numbers.
+    """
+    
+    for field, value in query.items():
+        if field not in _QUERY_FIELDS:
+            continue
+        types, description = _QUERY_FIELDS[field]
+        if isinstance(value, bool) or not isinstance(value, types):
+            raise TypeError(f"Field '{field}' must be {description}")
+
+
+def execute_query(pokedex, query):
+    
+    """
+    Runs one query against a Pokedex and returns a result that can be encoded as JSON.
+    
+    The operations mirror the menu options: 'name', 'type', 'stats', 'compare',
+    'translate', 'add' and 'remove', plus 'query' and 'explain' for composite queries
+    (see Pokedex.query), and 'page' to page through all the Pokemon with a type or a
+    stat in a range (see Pokedex.page_by_type and page_by_stats). For example:
+        {"op": "name", "name": "Pikachu"}
+        {"op": "type", "type": "Fire AND Flying", "limit": 5}
+        {"op": "stats", "stat": "speed", "min": 100, "max": 150}
+        {"op": "compare", "first": "Pikachu", "second": "Raichu"}
+        {"op": "translate", "name": "Pikachu"}
+        {"op": "add", "row": ["", "Name", "", "", "", "Fire", "", 1, 2, 3, 4, 5, 6]}
+        {"op": "remove", "name": "Name"}
+        {"op": "query", "query": "type:Dragon speed>=100", "sort": "-speed", "limit": 5}
+        {"op": "page", "type": "Fire", "size": 20, "cursor": null}
+        {"op": "page", "stat": "speed", "min": 100, "max": null, "size": 20}
+    
+    Parameters:
+        pokedex (Pokedex): The Pokedex to query.
+        query (dict): The query, with an 'op' key and the arguments of the operation.
+        
+    Returns:
+        dict: {"ok": true, "result": ...} on success, or {"ok": false, "error": ...}
+            when the query is malformed, has a field of the wrong type, or fails.
+    """
+    
+    try:
+        _check_query_fields(query)
+        op = query['op']
+        if op == 'name':
+            pkmn = pokedex.search_by_name(query['name'])
+            result = pkmn.to_dict() if pkmn else None
+        elif op == 'type':
+            matches = pokedex.search_by_type(query['type'], query.get('limit'), query.get('operator', 'and'))
+            result = [pkmn.to_dict() for pkmn in matches]
+        elif op == 'stats':
+            pkmn = pokedex.search_by_stats(query['stat'], query['min'], query['max'], quiet=True)
+            result = pkmn.to_dict() if pkmn else None
+        elif op == 'compare':
+            first = pokedex.search_by_name(query['first'])
+            second = pokedex.search_by_name(query['second'])
+            if first is None or second is None:
+                missing = query['first'] if first is None else query['second']
+                return {'ok': False, 'error': f"Pokemon not found: {missing}"}
+            result = pokedex.compare_stats(first, second)
+        elif op == 'translate':
+            result = pokedex.get_pokemon_name(query['name'])
+        elif op == 'add':
+            row = [str(value) for value in query['row']]
+            pokedex.add_pokemon(row)
+            result = {'id': int(row[0])}
+        elif op == 'remove':
+            pokedex.remove_pokemon(query['name'])
+            result = None
+        elif op == 'page':
+            if 'type' in query:
+                page, cursor = pokedex.page_by_type(query['type'], query['size'], query.get('operator', 'and'),
+                                                    query.get('cursor'))
+            else:
+                page, cursor = pokedex.page_by_stats(query['stat'], query.get('min'), query.get('max'), query['size'],
+                                                     query.get('cursor'))
+            result = {'pokemon': [pkmn.to_dict() for pkmn in page], 'cursor': cursor}
+        elif op in ('query', 'explain'):
+            arguments = (query['query'], query.get('sort'), query.get('limit'), query.get('offset'))
+            if op == 'explain':
+                result = pokedex.explain(*arguments)
+            else:
+                result = [pkmn.to_dict() for pkmn in pokedex.query(*arguments)]
+        else:
+            return {'ok': False, 'error': f"Unknown op: {op}"}
+    except KeyError as error:
+        return {'ok': False, 'error': f"Missing field: {error.args[0]}"}
+    except (ValueError, TypeError) as error:
+        return {'ok': False, 'error': str(error)}
+    return {'ok': True, 'result': result}
+
+
+def run_batch(pokedex, infile, outfile):
+    
+    """
+    Runs one JSON query per input line and writes one JSON result per output line.
+    
+    Results are written in input order through the buffered output file. Blank lines
+    are skipped and lines that are not valid JSON get an error result.
+    
+    Parameters:
+        pokedex (Pokedex): The Pokedex to query.
+        infile (file): The queries, one JSON object per line (see execute_query).
+        outfile (file): Where the results are written.
+        
+    Returns:
+        int: The number of queries that failed.
+    """
+    
+    failures = 0
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+    for line in infile:
+        if not line.strip():
+            continue
+        try:
+            query = json.loads(line)
+        except json.JSONDecodeError as error:
+            result = {'ok': False, 'error': f"Invalid JSON: {error}"}
+        else:
+            if isinstance(query, dict):
+                result = execute_query(pokedex, query)
+            else:
+                result = {'ok': False, 'error': "Each query must be a JSON object"}
+        failures += not result['ok']
+        outfile.write(encode(result))
+        outfile.write('\n')
+    outfile.flush()
+    return failures
+
 
-def main(filename):
+def main(filename, snapshot=False):
     
     """
     Main function for the Pokemon search program.
 
     Parameters:
         filename (str): The name of the JSON file containing the Pokemon data.
+        snapshot (bool, optional): Whether to load from and keep a binary snapshot
+            next to the JSON file.
 
     Returns:
         None
@@ -391,7 +4402,7 @@ def main(filename):
     """
     
     # Create a Pokedex object
-    pokedex = Pokedex(filename)
+    pokedex = Pokedex(filename, snapshot=snapshot)
 
     # Prompt the user to search for a Pokemon by various criteria
     while True:
@@ -425,6 +4436,9 @@ def main(filename):
                 print(f'Speed: {pokemon.speed}')
             else:
                 print('Pokemon not found.')
+                suggestions = pokedex.search_fuzzy(search_name, 3)
+                if suggestions:
+                    print('Did you mean:', ', '.join(pkmn.name['english'] for pkmn, _ in suggestions))
         elif search_type == '2':
             # Search by type code
             search_type = input('Enter a type: ')
@@ -470,7 +4484,10 @@ def main(filename):
         elif search_type == '6':
             search_name3 = input('Enter pokemon attributes begin with: (id,name/english,name other language optional \n (japanese,chinese,french),type/0,type/1,base/HP,base/Attack,base/Defense,base/Sp. Attack,base/Sp. \n Defense,base/Speed) ')
             poke_info = search_name3.split(",")
-            pokedex.add_pokemon(poke_info)
+            try:
+                pokedex.add_pokemon(poke_info)
+            except ValueError as error:
+                print(f'Pokemon not added: {error}')
         elif search_type == '7':
             search_name4 = input('Enter pokemon name for delection: ')
             pokedex.remove_pokemon(search_name4)
@@ -505,8 +4522,53 @@ def parse_args(arglist):
     """
     parser = ArgumentParser()
     parser.add_argument("file", help="file of Pokemon")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="cache the parsed file in a binary snapshot next to it")
+    parser.add_argument("--profile-json", metavar="PATH",
+                        help="record call counts, latencies and file traffic of every Pokedex "
+                             "operation and write them to this JSON file on exit")
+    parser.add_argument("--cprofile", metavar="PATH",
+                        help="profile the whole session with cProfile and write the stats to this file")
+    parser.add_argument("--batch", metavar="QUERIES",
+                        help="answer the JSON queries in this file ('-' for stdin), one per line, "
+                             "and write one JSON result per line to stdout")
+    parser.add_argument("--export", metavar="PATH",
+                        help="write the Pokemon to this Parquet file (.parquet) or Feather file "
+                             "(any other name) and exit")
+    parser.add_argument("--columns", metavar="NAMES",
+                        help="comma-separated pokedex.csv columns to export, by default all of them")
     return parser.parse_args(arglist)
     
 if __name__ == "__main__":
     args = parse_args(sys.argv[1:])
-    main(args.file)
+    if args.profile_json:
+        enable_instrumentation()
+    profiler = None
+    if args.cprofile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        if args.batch:
+            pokedex = Pokedex(args.file, snapshot=args.snapshot)
+            if args.batch == '-':
+                run_batch(pokedex, sys.stdin, sys.stdout)
+            else:
+                with open(args.batch, 'r', encoding='utf-8') as queries:
+                    run_batch(pokedex, queries, sys.stdout)
+        elif args.export:
+            pokedex = Pokedex(args.file, snapshot=args.snapshot)
+            columns = args.columns.split(',') if args.columns else None
+            if args.export.endswith('.parquet'):
+                pokedex.to_parquet(args.export, columns)
+            else:
+                pokedex.to_feather(args.export, columns)
+        else:
+            main(args.file, snapshot=args.snapshot)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.cprofile)
+        if args.profile_json:
+            with open(args.profile_json, 'w', encoding='utf-8') as f:
+                json.dump(disable_instrumentation(), f, indent=2)
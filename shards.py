@@ -0,0 +1,457 @@
+import bisect
+import multiprocessing
+import random
+from multiprocessing import shared_memory
+
+from pokemon import NAME_LANGUAGES, STATS, Pokemon, _parse_type_query, _stat_attr, iter_pokemon
+
+# Base stat keys of the JSON layout, in the order of STATS
+BASE_KEYS = ('HP', 'Attack', 'Defense', 'Sp. Attack', 'Sp. Defense', 'Speed')
+
+# Separator between the names of one Pokemon in the shared name table
+NAME_SEPARATOR = '\x1f'
+
+
+def _create_block(np, array):
+
+    """
+    Copies an array into a new shared memory block.
+
+    Parameters:
+        np (module): NumPy.
+        array (ndarray): The array to copy.
+
+    Returns:
+        tuple: (SharedMemory, view, description): the block, a NumPy view on it, and the
+            (name, dtype, shape) description a worker needs to attach to it.
+    """
+
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    view = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+    view[...] = array
+    return block, view, (block.name, array.dtype.str, array.shape)
+
+
+def _attach_blocks(np, layout):
+
+    """
+    Attaches to the shared memory blocks described by a layout.
+
+    Parameters:
+        np (module): NumPy.
+        layout (dict): Maps each array name to its (name, dtype, shape) description.
+
+    Returns:
+        tuple: (blocks, arrays), the SharedMemory objects to close later and the
+            NumPy views on them, both keyed by array name.
+    """
+
+    blocks = {}
+    arrays = {}
+    for key, (name, dtype, shape) in layout.items():
+        blocks[key] = shared_memory.SharedMemory(name=name)
+        arrays[key] = np.ndarray(shape, dtype=dtype, buffer=blocks[key].buf)
+    return blocks, arrays
+
+
+def _names_at(arrays, row):
+
+    """
+    Returns the names of the Pokemon in one row of the shared arrays, by language.
+    """
+
+    offsets = arrays['name_offsets']
+    raw = arrays['names'][offsets[row]:offsets[row + 1]].tobytes().decode('utf-8')
+    return dict(zip(NAME_LANGUAGES, raw.split(NAME_SEPARATOR)))
+
+
+def _type_mask(np, types, codes, operator):
+
+    """
+    Returns a boolean mask of the rows of a type code array matching a type query.
+
+    Parameters:
+        np (module): NumPy.
+        types (ndarray): Two type codes per row; -1 when there is no second type.
+        codes (list): The code of each queried type; -1 for a type nobody has.
+        operator (str): 'and' or 'or'.
+
+    Returns:
+        ndarray: One boolean per row.
+    """
+
+    masks = [(types == code).any(axis=1) if code >= 0 else np.zeros(len(types), dtype=bool) for code in codes]
+    if not masks:
+        return np.zeros(len(types), dtype=bool)
+    if operator == 'or':
+        return np.logical_or.reduce(masks)
+    return np.logical_and.reduce(masks)
+
+
+def _shard_worker(connection, layout, index, shard_count, partition):
+
+    """
+    Answers the queries of one shard until it receives None.
+
+    The worker attaches to the shared arrays, keeps views on the rows of its shard and
+    builds a name index for them. Only small requests and results cross the pipe. Each
+    answer is (True, result), or (False, exception) when the request failed, so a bad
+    request does not stop the worker.
+
+    Parameters:
+        connection (multiprocessing.connection.Connection): The worker end of the pipe.
+        layout (dict): The description of the shared arrays (see ShardedPokedex).
+        index (int): The number of this shard.
+        shard_count (int): The number of shards.
+        partition (str): 'range' for contiguous id ranges, 'hash' for ids modulo shard_count.
+
+    Returns:
+        None
+    """
+
+    import numpy as np
+
+    blocks, arrays = _attach_blocks(np, layout)
+    count = len(arrays['ids'])
+    if partition == 'range':
+        start, end = count * index // shard_count, count * (index + 1) // shard_count
+        rows = np.arange(start, end)
+        ids, stats, types = arrays['ids'][start:end], arrays['stats'][start:end], arrays['types'][start:end]
+    else:
+        rows = np.flatnonzero(arrays['ids'] % shard_count == index)
+        ids, stats, types = arrays['ids'][rows], arrays['stats'][rows], arrays['types'][rows]
+
+    # Per stat, the values in increasing order with ties in increasing id order, so a
+    # range query is two binary searches
+    sorted_stats = []
+    for column in range(len(STATS)):
+        order = np.lexsort((ids, stats[:, column]))
+        sorted_stats.append((stats[order, column], ids[order]))
+
+    names = {}
+    for row in rows.tolist():
+        pkmn_names = _names_at(arrays, row)
+        for key in {name.casefold() for name in pkmn_names.values() if name}:
+            names.setdefault(key, []).append((key == pkmn_names['english'].casefold(), row))
+
+    last_type_query = None
+    try:
+        while True:
+            request = connection.recv()
+            if request is None:
+                break
+            try:
+                kind = request[0]
+                if kind == 'name':
+                    result = names.get(request[1], [])
+                elif kind == 'stats':
+                    _, column, stat_min, stat_max = request
+                    values, value_ids = sorted_stats[column]
+                    start = 0 if stat_min is None else values.searchsorted(max(stat_min, -32768), 'left')
+                    end = len(values) if stat_max is None else values.searchsorted(min(stat_max, 32767), 'right')
+                    if start < end:
+                        best = values[end - 1]
+                        result = (int(best), int(value_ids[max(start, values.searchsorted(best, 'left'))]))
+                    else:
+                        result = None
+                else:
+                    _, codes, operator = request[:3]
+                    if last_type_query is None or last_type_query[0] != (codes, operator):
+                        last_type_query = ((codes, operator), rows[_type_mask(np, types, codes, operator)])
+                    matching_rows = last_type_query[1]
+                    if kind == 'type_count':
+                        result = len(matching_rows)
+                    elif kind == 'type_pick':
+                        result = matching_rows[request[3]].tolist()
+                    else:
+                        result = matching_rows.tolist()
+            except Exception as error:
+                connection.send((False, error))
+                continue
+            connection.send((True, result))
+    finally:
+        # Views on the blocks must be gone before the blocks can be closed
+        ids = stats = types = None
+        arrays.clear()
+        for block in blocks.values():
+            block.close()
+
+
+class ShardedPokedex:
+
+    """
+    A read-only Pokedex whose records are partitioned across worker processes.
+
+    The records are parsed once and copied into shared memory as NumPy arrays, sorted
+    by id: ids, stats, type codes and a UTF-8 table of the names. Each worker attaches
+    to the same memory and answers queries for its shard, either a contiguous id range
+    or the ids with a given remainder modulo the number of shards. Queries are sent to
+    every shard at once and the partial results are merged here, so no dataset is ever
+    pickled. Pokemon objects are only built for the results.
+
+    Use it as a context manager, or call close() to stop the workers and free the memory.
+
+    Attributes:
+        shard_count (int): The number of worker processes.
+        partition (str): 'range' or 'hash'.
+        type_names (list): The type name of each type code.
+    """
+
+    def __init__(self, file_path, shards=None, partition='range'):
+
+        """
+        Loads a pokedex file into shared memory and starts one worker per shard.
+
+        Parameters:
+            file_path (str): The path to the JSON file containing the Pokemon data.
+            shards (int, optional): The number of worker processes; one per CPU by default.
+            partition (str, optional): 'range' to give each shard a contiguous range of
+                ids, 'hash' to spread the ids modulo the number of shards.
+
+        Returns:
+            None
+
+        Raises:
+            ValueError: If the partition is neither 'range' nor 'hash'.
+        """
+
+        import numpy as np
+
+        if partition not in ('range', 'hash'):
+            raise ValueError(f"Unknown partition: {partition}")
+        self._np = np
+        self.partition = partition
+        self.shard_count = shards or multiprocessing.cpu_count()
+        self.type_names = []
+        self._type_codes = {}
+        self._blocks = []
+        self._workers = []
+        self._connections = []
+
+        ids = []
+        stats = []
+        types = []
+        names = bytearray()
+        name_offsets = [0]
+        for pkmn in iter_pokemon(file_path):
+            ids.append(pkmn.id)
+            stats.append([getattr(pkmn, stat) for stat in STATS])
+            codes = [self._type_code(p_type) for p_type in pkmn.type[:2]]
+            types.append(codes + [-1] * (2 - len(codes)))
+            names += NAME_SEPARATOR.join(pkmn.name.get(lang) or '' for lang in NAME_LANGUAGES).encode('utf-8')
+            name_offsets.append(len(names))
+
+        ids = np.array(ids, dtype=np.int32)
+        names = np.frombuffer(bytes(names), dtype=np.uint8)
+        name_offsets = np.array(name_offsets, dtype=np.int64)
+        order = np.argsort(ids, kind='stable')
+        if (order != np.arange(len(order))).any():
+            # Files are normally in id order already; only then is the name table rebuilt
+            starts, ends = name_offsets[:-1][order].tolist(), name_offsets[1:][order].tolist()
+            names = np.concatenate([names[start:end] for start, end in zip(starts, ends)])
+            name_offsets = np.concatenate(([0], np.cumsum(np.array(ends) - np.array(starts)))).astype(np.int64)
+        arrays = {
+            'ids': ids[order],
+            'stats': np.array(stats, dtype=np.int16).reshape(-1, len(STATS))[order],
+            'types': np.array(types, dtype=np.int8).reshape(-1, 2)[order],
+            'names': names,
+            'name_offsets': name_offsets
+        }
+        self._arrays = {}
+        layout = {}
+        try:
+            for key, array in arrays.items():
+                block, self._arrays[key], layout[key] = _create_block(np, array)
+                self._blocks.append(block)
+            for index in range(self.shard_count):
+                parent_end, worker_end = multiprocessing.Pipe()
+                worker = multiprocessing.Process(target=_shard_worker, daemon=True,
+                                                 args=(worker_end, layout, index, self.shard_count, partition))
+                worker.start()
+                worker_end.close()
+                self._workers.append(worker)
+                self._connections.append(parent_end)
+        except BaseException:
+            self.close()
+            raise
+        self._rows = {pkmn_id: row for row, pkmn_id in enumerate(self._arrays['ids'].tolist())}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def close(self):
+
+        """
+        Stops the workers and frees the shared memory.
+
+        Returns:
+            None
+        """
+
+        for connection in self._connections:
+            try:
+                connection.send(None)
+            except OSError:
+                pass
+            connection.close()
+        for worker in self._workers:
+            worker.join()
+        self._connections = []
+        self._workers = []
+        self._arrays = {}
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def _type_code(self, p_type):
+
+        """
+        Returns the code of a type, assigning the next free code to a new type.
+        """
+
+        key = p_type.casefold()
+        if key not in self._type_codes:
+            self._type_codes[key] = len(self.type_names)
+            self.type_names.append(p_type)
+        return self._type_codes[key]
+
+    def _scatter(self, requests):
+
+        """
+        Sends one request to each shard and gathers the results in shard order.
+
+        Parameters:
+            requests (list): One request per shard, or a single request for all shards.
+
+        Returns:
+            list: The result of each shard.
+
+        Raises:
+            Exception: The exception a shard raised while answering, once every shard
+                has answered so the pipes stay in step.
+        """
+
+        if not isinstance(requests, list):
+            requests = [requests] * self.shard_count
+        for connection, request in zip(self._connections, requests):
+            connection.send(request)
+        answers = [connection.recv() for connection in self._connections]
+        for ok, result in answers:
+            if not ok:
+                raise result
+        return [result for _, result in answers]
+
+    def _pokemon_at(self, row):
+
+        """
+        Builds the Pokemon in one row of the shared arrays.
+        """
+
+        arrays = self._arrays
+        return Pokemon({
+            'id': int(arrays['ids'][row]),
+            'name': _names_at(arrays, row),
+            'type': [self.type_names[code] for code in arrays['types'][row].tolist() if code >= 0],
+            'base': dict(zip(BASE_KEYS, arrays['stats'][row].tolist()))
+        })
+
+    def search_by_name(self, name):
+
+        """
+        Finds a Pokemon by a name in any language, asking every shard.
+
+        A Pokemon whose English name matches wins over one that only matches in another
+        language; among equal matches the lowest id wins.
+
+        Parameters:
+            name (str): The name to look up, in any language and any case.
+
+        Returns:
+            (Pokemon) The matching Pokemon, otherwise None.
+        """
+
+        matches = [match for result in self._scatter(('name', name.casefold())) for match in result]
+        if not matches:
+            return None
+        _, row = min(matches, key=lambda match: (not match[0], match[1]))
+        return self._pokemon_at(row)
+
+    def search_by_stats(self, stat_name, stat_min, stat_max):
+
+        """
+        Returns the Pokemon with the highest value of a stat within a range.
+
+        Each shard returns its own best (value, id) and the global best is the highest
+        value, with ties going to the lowest id as in Pokedex.search_by_stats.
+
+        Parameters:
+            stat_name (str): The name of the stat, e.g. 'attack' or 'Sp. Defense'.
+            stat_min (int): The minimum value for the stat, or None.
+            stat_max (int): The maximum value for the stat, or None.
+
+        Returns:
+            (Pokemon) The best Pokemon in range, otherwise None.
+
+        Raises:
+            ValueError: If the stat name is not known.
+        """
+
+        column = STATS.index(_stat_attr(stat_name))
+        bests = [best for best in self._scatter(('stats', column, stat_min, stat_max)) if best is not None]
+        if not bests:
+            return None
+        _, pkmn_id = max(bests, key=lambda best: (best[0], -best[1]))
+        return self._pokemon_at(self._rows[pkmn_id])
+
+    def search_by_type(self, p_type, num_results=None, operator='and'):
+
+        """
+        Returns the Pokemon with a certain type, asking every shard.
+
+        A sample is drawn uniformly from all the matches: each shard first reports how
+        many Pokemon it matches, the positions are sampled from the total, and each shard
+        then returns only the rows at its share of the positions.
+
+        Parameters:
+            p_type (str or list): A type, a list of types, or a string such as
+                "Fire AND Flying" or "Water OR Ice".
+            num_results (int, optional): The number of Pokemon to sample; all of them
+                ordered by id when not given.
+            operator (str, optional): 'and' or 'or', used when p_type is a list.
+
+        Returns:
+            list: The matching Pokemon.
+
+        Raises:
+            ValueError: If the operator is not 'and' or 'or', or a string query mixes both.
+        """
+
+        types, operator = _parse_type_query(p_type, operator)
+        codes = tuple(self._type_codes.get(t.strip().casefold(), -1) for t in types)
+        if num_results is None:
+            rows = sorted(row for result in self._scatter(('type_all', codes, operator)) for row in result)
+            return [self._pokemon_at(row) for row in rows]
+
+        counts = self._scatter(('type_count', codes, operator))
+        total = sum(counts)
+        sample = random.sample(range(total), min(num_results, total))
+        picks = [[] for _ in counts]
+        bounds = [0]
+        for count in counts:
+            bounds.append(bounds[-1] + count)
+        for position in sample:
+            shard = bisect.bisect_right(bounds, position) - 1
+            picks[shard].append(position - bounds[shard])
+        results = self._scatter([('type_pick', codes, operator, shard_picks) for shard_picks in picks])
+        rows = {}
+        for shard, shard_picks in enumerate(picks):
+            for position, row in zip(shard_picks, results[shard]):
+                rows[bounds[shard] + position] = row
+        return [self._pokemon_at(rows[position]) for position in sample]
@@ -0,0 +1,39 @@
+import json
+import os
+import subprocess
+import sys
+
+from benchmark import generate_synthetic, summarize, synthetic_paths
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_generate_synthetic_matches_schema(tmp_path):
+    json_path, csv_path = synthetic_paths(50, str(tmp_path))
+    names = generate_synthetic(50, json_path, csv_path)
+    with open(json_path, 'r', encoding='utf-8') as f:
+        records = json.load(f)
+    assert [record['name']['english'] for record in records] == names
+    assert [record['id'] for record in records] == list(range(1, 51))
+    with open(csv_path, 'r', encoding='utf-8') as f:
+        assert len(f.readlines()) == 51
+
+
+def test_summarize():
+    summary = summarize([1000 * i for i in range(1, 101)], total_s=0.5)
+    assert summary['ops'] == 100
+    assert summary['throughput_per_s'] == 200
+    assert summary['p50_us'] == 51 and summary['p99_us'] == 100 and summary['max_us'] == 100
+
+
+def test_measure_prints_only_json(tmp_path):
+    def run(*arguments):
+        return subprocess.run([sys.executable, os.path.join(HERE, 'benchmark.py'), *arguments, '--size', '5',
+                               '--dir', str(tmp_path)], cwd=HERE, capture_output=True, text=True, check=True).stdout
+
+    run('generate')
+    results = json.loads(run('measure', '--ops', '50'))
+    assert results['size'] == 5
+    assert results['search_by_stats']['ops'] == 50
+    assert results['peak_rss_kb'] > 0
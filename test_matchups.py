@@ -0,0 +1,47 @@
+import itertools
+import os
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from matchups import MatchupEngine
+from pokemon import Pokedex
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture(scope='module')
+def engine():
+    return MatchupEngine(Pokedex(os.path.join(HERE, 'pokedex.json')))
+
+
+def distinct_typings(pokedex, count):
+    pool = {}
+    for pkmn in pokedex.pokemon:
+        pool.setdefault(frozenset(pkmn.type), pkmn)
+    return list(pool.values())[:count]
+
+
+def team_value(engine, team):
+    return float(np.max([engine.scores(pkmn) for pkmn in team], axis=0).sum())
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 4])
+@pytest.mark.parametrize('processes', [1, 2])
+def test_build_team_matches_brute_force(engine, size, processes):
+    pool = distinct_typings(engine.pokedex, 12)
+    best = max(team_value(engine, team) for team in itertools.combinations(pool, size))
+    team = engine.build_team(size, pool=pool, processes=processes)
+    assert len(team) == size
+    assert len({pkmn.id for pkmn in team}) == size
+    assert all(pkmn in pool for pkmn in team)
+    assert team_value(engine, team) == pytest.approx(best)
+
+
+def test_build_team_prefers_stronger_representative(engine):
+    pool = [pkmn for pkmn in engine.pokedex.pokemon if pkmn.type == ['Water']][:5]
+    strongest = max(pool, key=lambda pkmn: (sum((pkmn.hp, pkmn.attack, pkmn.defense, pkmn.sp_attack,
+                                                 pkmn.sp_defense, pkmn.speed)), -pkmn.id))
+    assert engine.build_team(3, pool=pool, processes=1) == [strongest]
@@ -0,0 +1,68 @@
+import asyncio
+import json
+import os
+import shutil
+import time
+
+from pokedex_server import handle_client, runs_in_executor
+from pokemon import Pokedex
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def make_pokedex(tmp_path):
+    csv_path = tmp_path / 'pokedex.csv'
+    shutil.copy(os.path.join(HERE, 'pokedex.csv'), csv_path)
+    return Pokedex(os.path.join(HERE, 'pokedex.json'), csv_path=str(csv_path))
+
+
+async def ask(port, queries):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    results = []
+    for query in queries:
+        writer.write((json.dumps(query) + '\n').encode('utf-8'))
+        await writer.drain()
+        results.append(json.loads(await reader.readline()))
+    writer.close()
+    await writer.wait_closed()
+    return results
+
+
+def test_runs_in_executor():
+    assert runs_in_executor({'op': 'add', 'row': []})
+    assert runs_in_executor({'op': 'remove', 'name': 'Pikachu'})
+    assert runs_in_executor({'op': 'type', 'type': 'Fire'})
+    assert runs_in_executor({'op': 'query', 'query': 'type:Fire', 'limit': 1000})
+    assert runs_in_executor({'op': 'page', 'type': 'Fire', 'size': 5000})
+    assert not runs_in_executor({'op': 'type', 'type': 'Fire', 'limit': 5})
+    assert not runs_in_executor({'op': 'name', 'name': 'Pikachu'})
+    assert not runs_in_executor({'op': 'stats', 'stat': 'speed', 'min': 1, 'max': 2})
+
+
+def test_slow_mutation_does_not_block_other_clients(tmp_path):
+    pokedex = make_pokedex(tmp_path)
+    add_pokemon = pokedex.add_pokemon
+
+    def slow_add(row):
+        time.sleep(0.5)
+        add_pokemon(row)
+
+    pokedex.add_pokemon = slow_add
+
+    async def scenario():
+        server = await asyncio.start_server(lambda r, w: handle_client(pokedex, r, w), '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            row = ['', 'Zed', '', '', '', 'Fire', '', 1, 2, 3, 4, 5, 6]
+            add = asyncio.ensure_future(ask(port, [{'op': 'add', 'row': row}, {'op': 'name', 'name': 'Zed'}]))
+            await asyncio.sleep(0.1)
+            start = time.perf_counter()
+            lookup = await ask(port, [{'op': 'name', 'name': 'Pikachu'}])
+            lookup_time = time.perf_counter() - start
+            return await add, lookup, lookup_time
+
+    (added, found), (pikachu,), lookup_time = asyncio.run(scenario())
+    assert lookup_time < 0.3
+    assert pikachu['result']['name']['english'] == 'Pikachu'
+    assert added['ok'] and found['result']['name']['english'] == 'Zed'
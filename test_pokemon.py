@@ -0,0 +1,1044 @@
+import base64
+import collections
+import io
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import benchmark
+import pokemon
+from pokemon import (CSV_COLUMNS, NameSearchIndex, Pokedex, QueryCache, RENDER_MANIFEST, SNAPSHOT_SUFFIX, STATS,
+                     _JournalTable, _MISSING, _edit_distance, _iter_records, _read_csv_rows, _read_journal,
+                     disable_instrumentation, enable_instrumentation, execute_query, instrumentation_report,
+                     iter_pokemon, load_snapshot, reservoir_sample, run_batch)
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+JSON_PATH = os.path.join(HERE, 'pokedex.json')
+CSV_PATH = os.path.join(HERE, 'pokedex.csv')
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / 'pokedex.csv'
+    shutil.copy(CSV_PATH, path)
+    return str(path)
+
+
+@pytest.fixture(params=[False, True], ids=['indexed', 'columnar'])
+def pokedex(request, csv_path):
+    if request.param:
+        pytest.importorskip('numpy')
+    return Pokedex(JSON_PATH, columnar=request.param, csv_path=csv_path)
+
+
+def load_records():
+    with open(JSON_PATH, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def brute_force_ranges(pokedex, bounds):
+    return sorted((pkmn for pkmn in pokedex.pokemon
+                   if all((low is None or getattr(pkmn, stat) >= low) and (high is None or getattr(pkmn, stat) <= high)
+                          for stat, (low, high) in bounds.items())),
+                  key=lambda pkmn: pkmn.id)
+
+
+@pytest.mark.parametrize('stat_min, stat_max', [(100, 50), (101, 100), (256, 300), (-10, 0)])
+def test_search_by_stats_empty_range(pokedex, stat_min, stat_max):
+    assert pokedex.search_by_stats('speed', stat_min, stat_max) is None
+
+
+@pytest.mark.parametrize('stat_min, stat_max', [(100, 100), (50, 60), (0, 255), (150, 1000)])
+def test_search_by_stats_returns_best_in_range(pokedex, stat_min, stat_max):
+    found = pokedex.search_by_stats('speed', stat_min, stat_max)
+    in_range = [pkmn for pkmn in pokedex.pokemon if stat_min <= pkmn.speed <= stat_max]
+    best = max(pkmn.speed for pkmn in in_range)
+    assert found.speed == best
+    assert found.id == min(pkmn.id for pkmn in in_range if pkmn.speed == best)
+
+
+@pytest.mark.parametrize('ranges', [
+    {'speed': (100, 150), 'attack': (120, None)},
+    {'hp': (None, 30)},
+    {'speed': (100, 50)},
+    {'defense': (80, 120), 'Defense': (100, 200)},
+    {'sp_attack': (200, 100), 'attack': (None, None)},
+])
+def test_search_by_stat_ranges_matches_brute_force(pokedex, ranges):
+    bounds = {}
+    for name, (low, high) in ranges.items():
+        stat = name.lower()
+        old_low, old_high = bounds.get(stat, (None, None))
+        bounds[stat] = (max(filter(lambda v: v is not None, (low, old_low)), default=None),
+                        min(filter(lambda v: v is not None, (high, old_high)), default=None))
+    assert pokedex.search_by_stat_ranges(ranges) == brute_force_ranges(pokedex, bounds)
+
+
+def test_inverted_range_in_query(pokedex):
+    assert pokedex.query('speed>=100 speed<=50') == []
+    assert 'speed' in pokedex.explain('speed>=100 speed<=50')
+
+
+def test_unknown_stat(pokedex):
+    with pytest.raises(ValueError):
+        pokedex.search_by_stat_ranges({'luck': (1, 2)})
+
+
+def test_to_dataframe_matches_records(pokedex):
+    pytest.importorskip('pandas')
+    frame = pokedex.to_dataframe()
+    assert list(frame.columns) == CSV_COLUMNS
+    by_id = {record['id']: record for record in load_records()}
+    for row in frame.itertuples(index=False):
+        record = by_id[row[0]]
+        assert list(row[1:5]) == [record['name'][lang] for lang in ('english', 'japanese', 'chinese', 'french')]
+        types = [t for t in row[5:7] if isinstance(t, str)]
+        assert types == record['type']
+        assert list(row[7:]) == [record['base'][stat] for stat in
+                                 ('HP', 'Attack', 'Defense', 'Sp. Attack', 'Sp. Defense', 'Speed')]
+
+
+def test_exports_do_not_change_after_remove(pokedex):
+    pytest.importorskip('pandas')
+    pytest.importorskip('pyarrow')
+    frame = pokedex.to_dataframe()
+    table = pokedex.to_arrow()
+    expected = frame.copy()
+    expected_table = table.to_pylist()
+    pokedex.remove_pokemon('Bulbasaur')
+    assert frame.equals(expected)
+    assert table.to_pylist() == expected_table
+    assert frame.iloc[0]['name/english'] == 'Bulbasaur'
+    assert frame.iloc[0]['base/HP'] == 45
+
+
+def test_column_selection(pokedex):
+    pytest.importorskip('pandas')
+    frame = pokedex.to_dataframe(['base/Speed', 'name/english', 'id'])
+    assert list(frame.columns) == ['base/Speed', 'name/english', 'id']
+    assert len(frame) == len(pokedex.pokemon)
+    with pytest.raises(ValueError):
+        pokedex.to_dataframe(['nope'])
+    with pytest.raises(ValueError):
+        pokedex.to_dataframe(['id', 'id'])
+
+
+@pytest.mark.parametrize('method', ['to_parquet', 'to_feather'])
+def test_file_export_round_trip(pokedex, tmp_path, method):
+    pytest.importorskip('pyarrow')
+    import pyarrow.feather
+    import pyarrow.parquet
+    path = str(tmp_path / 'pokedex.out')
+    columns = ['id', 'type/0', 'type/1', 'base/Attack']
+    getattr(pokedex, method)(path, columns=columns, chunk_size=100)
+    read = pyarrow.parquet.read_table if method == 'to_parquet' else pyarrow.feather.read_table
+    assert read(path).to_pylist() == pokedex.to_arrow(columns).to_pylist()
+    if method == 'to_parquet':
+        assert pyarrow.parquet.ParquetFile(path).num_row_groups == -(-len(pokedex.pokemon) // 100)
+    assert sorted(os.listdir(tmp_path)) == ['pokedex.csv', 'pokedex.out']
+
+
+@pytest.mark.parametrize('query', [
+    {'op': 'name', 'name': 5},
+    {'op': 'stats', 'stat': 5, 'min': 1, 'max': 2},
+    {'op': 'stats', 'stat': 'speed', 'min': '1', 'max': 2},
+    {'op': 'type', 'type': ['Fire']},
+    {'op': 'type', 'type': 'Fire', 'limit': True},
+    {'op': 'compare', 'first': None, 'second': 'Pikachu'},
+    {'op': 'query', 'query': 'type:Fire', 'sort': 1},
+    {'op': 'page', 'stat': 'speed', 'size': '20'},
+    {'op': 'add', 'row': 'Bulbasaur'},
+    {'op': 7},
+])
+def test_execute_query_rejects_wrong_field_types(pokedex, query):
+    result = execute_query(pokedex, query)
+    assert result['ok'] is False
+    assert 'must be' in result['error']
+
+
+def test_batch_reports_each_bad_line(pokedex):
+    lines = [
+        '{"op": "name", "name": "Pikachu"}',
+        '{"op": "name", "name": 5}',
+        'not json',
+        '[1, 2]',
+        '',
+        '{"op": "stats", "stat": 5, "min": 1, "max": 2}',
+        '{"op": "stats", "stat": "speed"}',
+        '{"op": "fly"}',
+        '{"op": "stats", "stat": "speed", "min": 100, "max": 50}',
+    ]
+    out = io.StringIO()
+    failures = run_batch(pokedex, io.StringIO('\n'.join(lines) + '\n'), out)
+    results = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [result['ok'] for result in results] == [True, False, False, False, False, False, False, True]
+    assert failures == 6
+    assert results[0]['result']['name']['english'] == 'Pikachu'
+    assert results[5]['error'] == 'Missing field: min'
+    assert results[7]['result'] is None
+
+
+NEW_ROW = ['', 'Zed', 'ゼッド', '泽德', 'Zède', 'Fire', 'Ice', '50', '60', '70', '80', '90', '100']
+
+
+def disk_rows(csv_path):
+    _, rows = _read_csv_rows(csv_path)
+    table = _JournalTable(rows)
+    for path in (csv_path + '.journal.compacting', csv_path + '.journal'):
+        for record in _read_journal(path):
+            table.apply(record)
+    return list(table.rows.values())
+
+
+def memory_rows(pokedex):
+    return sorted((pkmn.id, pkmn.name['english']) for pkmn in pokedex.pokemon)
+
+
+def test_concurrent_add_and_remove_keep_disk_and_memory_in_step(pokedex, csv_path):
+    def add():
+        for _ in range(30):
+            pokedex.add_pokemon(list(NEW_ROW))
+
+    def remove():
+        for _ in range(30):
+            pokedex.remove_pokemon('Zed')
+
+    threads = [threading.Thread(target=add), threading.Thread(target=remove), threading.Thread(target=add)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert memory_rows(pokedex) == sorted((int(row[0]), row[1]) for row in disk_rows(csv_path))
+
+
+def test_concurrency_stress_finds_no_inconsistencies(capsys):
+    args = benchmark.parse_args(['concurrency', '--size', '500', '--readers', '4', '--seconds', '1'])
+    assert args.run(args) == 0
+    output = capsys.readouterr().out
+    assert 'ERROR' not in output
+    assert 'reads' in output and 'writes' in output
+
+
+def test_name_search_remove_matches_fresh_index():
+    keys = ['a', 'aa', 'aaa', 'ab', 'aab', 'abc', 'b', 'ba', 'pikachu', 'pichu', 'pi']
+    rng = random.Random(0)
+    for _ in range(50):
+        index = NameSearchIndex(keys)
+        removed = rng.sample(keys, rng.randint(1, len(keys)))
+        for key in removed:
+            index.remove(key)
+        fresh = NameSearchIndex([key for key in keys if key not in removed])
+        assert index.trie == fresh.trie
+        assert index.trigrams == fresh.trigrams
+        assert index.gram_counts == fresh.gram_counts
+
+
+def test_fuzzy_finds_every_close_name(pokedex):
+    index = pokedex._name_search_index()
+    names = sorted({pkmn.name['english'].casefold() for pkmn in pokedex.pokemon if len(pkmn.name['english']) >= 6})
+    rng = random.Random(0)
+    for name in rng.sample(names, 100):
+        position = rng.randrange(len(name))
+        query = name[:position] + 'x' + name[position + 1:]
+        expected = {key for key in pokedex._name_index if _edit_distance(query, key, 2) <= 2}
+        assert {match[0] for match in index.fuzzy(query, 2)} == expected
+
+
+def test_search_fuzzy_ranks_closest_first(pokedex):
+    results = pokedex.search_fuzzy('Pikachuu', limit=3)
+    assert results[0][0].name['english'] == 'Pikachu'
+    assert results[0][1] == 1
+    assert [distance for _, distance in results] == sorted(distance for _, distance in results)
+
+
+def test_journal_table_replays_in_order():
+    table = _JournalTable([['1', 'Bulbasaur'], ['2', 'Ivysaur'], ['2', 'Copy']])
+    for record in [{'op': 'add', 'row': ['3', 'Zed']}, {'op': 'remove', 'name': 'Zed'},
+                   {'op': 'add', 'row': ['4', 'Zed']}, {'op': 'add', 'row': ['1', 'Duplicate']},
+                   {'op': 'remove', 'name': 'Ivysaur'}, {'op': 'remove', 'name': 'Missing'}, {'op': 'noop'}]:
+        table.apply(record)
+    assert list(table.rows.values()) == [['1', 'Bulbasaur'], ['2', 'Copy'], ['4', 'Zed']]
+    assert table.max_id() == 4
+
+
+def test_journal_replay_and_compaction(pokedex, csv_path):
+    pokedex.add_pokemon(list(NEW_ROW))
+    pokedex.remove_pokemon('Pikachu')
+    pokedex.add_pokemon(list(NEW_ROW))
+    pokedex.remove_pokemon('Zed')
+    pokedex.add_pokemon(list(NEW_ROW))
+    assert os.path.exists(csv_path + '.journal')
+    expected = memory_rows(pokedex)
+    assert sorted((int(row[0]), row[1]) for row in disk_rows(csv_path)) == expected
+
+    # A new Pokedex replays the journal for its next id, then compaction folds it into the CSV
+    reopened = Pokedex(JSON_PATH, csv_path=csv_path)
+    reopened.add_pokemon(list(NEW_ROW))
+    assert max(pkmn.id for pkmn in reopened.pokemon) == max(pkmn_id for pkmn_id, _ in expected) + 1
+    reopened.compact_journal()
+    assert not os.path.exists(csv_path + '.journal')
+    _, rows = _read_csv_rows(csv_path)
+    assert sorted((int(row[0]), row[1]) for row in rows) == sorted(expected + [(max(expected)[0] + 1, 'Zed')])
+
+
+def test_new_ids_do_not_collide_with_loaded_pokemon(tmp_path):
+    csv_path = tmp_path / 'small.csv'
+    with open(CSV_PATH, 'r', encoding='utf-8') as f:
+        csv_path.write_text(''.join(f.readlines()[:4]), encoding='utf-8')
+    pokedex = Pokedex(JSON_PATH, csv_path=str(csv_path))
+    pokedex.add_pokemon(list(NEW_ROW))
+    assert pokedex.search_by_name('Zed').id == max(record['id'] for record in load_records()) + 1
+    assert pokedex.search_by_name('Bulbasaur').id == 1
+
+
+def write_records(path, records):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(records, f, ensure_ascii=False)
+
+
+def as_dicts(result):
+    if isinstance(result, list):
+        return [as_dicts(item) for item in result]
+    return result.to_dict() if hasattr(result, 'to_dict') else result
+
+
+def edited_records():
+    records = load_records()
+    records[0]['base']['Speed'] = 250
+    records[3]['type'] = ['Water']
+    del records[24]
+    records.append(dict(records[-1], id=5000, name=dict(records[-1]['name'], english='Newmon')))
+    return records
+
+
+@pytest.mark.parametrize('columnar', [False, True], ids=['indexed', 'columnar'])
+@pytest.mark.parametrize('work', [10 ** 8, 0], ids=['incremental', 'rebuilt'])
+def test_reload_matches_fresh_load(tmp_path, csv_path, monkeypatch, columnar, work):
+    if columnar:
+        pytest.importorskip('numpy')
+    monkeypatch.setattr('pokemon.RELOAD_INCREMENTAL_WORK', work)
+    json_path = str(tmp_path / 'pokedex.json')
+    shutil.copy(JSON_PATH, json_path)
+    pokedex = Pokedex(json_path, columnar=columnar, csv_path=csv_path)
+    assert pokedex.reload() is None
+    write_records(json_path, edited_records())
+    changes = pokedex.reload(force=True)
+    assert changes == {'inserted': 1, 'updated': 2, 'deleted': 1, 'rebuilt': not work}
+    fresh = Pokedex(json_path, columnar=columnar, csv_path=csv_path)
+    assert [pkmn.to_dict() for pkmn in pokedex.pokemon] == [pkmn.to_dict() for pkmn in fresh.pokemon]
+    for method, args in [('search_by_type', ('Water',)), ('search_by_stats', ('speed', 200, 255)),
+                         ('search_by_stat_ranges', ({'speed': (100, 255)},)), ('get_all_types', ())]:
+        assert as_dicts(getattr(pokedex, method)(*args)) == as_dicts(getattr(fresh, method)(*args))
+    assert pokedex.search_by_name('Pikachu') is None
+    assert pokedex.search_by_name('Newmon').id == 5000
+
+
+def test_reload_keeps_journaled_changes(tmp_path, csv_path):
+    json_path = str(tmp_path / 'pokedex.json')
+    shutil.copy(JSON_PATH, json_path)
+    pokedex = Pokedex(json_path, csv_path=csv_path)
+    pokedex.add_pokemon(list(NEW_ROW))
+    pokedex.remove_pokemon('Bulbasaur')
+    added = pokedex.search_by_name('Zed')
+    write_records(json_path, edited_records())
+    pokedex.reload(force=True)
+    assert pokedex.search_by_name('Zed') is added
+    assert pokedex.search_by_name('Bulbasaur') is None
+    assert pokedex.search_by_name('Newmon') is not None
+    pokedex.add_pokemon(list(NEW_ROW))
+    assert len({pkmn.id for pkmn in pokedex.pokemon}) == len(pokedex.pokemon)
+    assert max(pkmn.id for pkmn in pokedex.pokemon) == 5001
+
+
+def test_add_without_other_language_names(pokedex, csv_path):
+    row = [NEW_ROW[0], NEW_ROW[1]] + NEW_ROW[5:]
+    result = execute_query(pokedex, {'op': 'add', 'row': row})
+    added = pokedex.search_by_name('Zed')
+    assert result['result'] == {'id': added.id}
+    assert added.name == {'english': 'Zed', 'japanese': '', 'chinese': '', 'french': ''}
+    assert [record['row'] for record in _read_journal(csv_path + '.journal')] == [
+        [str(added.id), 'Zed', '', '', ''] + [str(value) for value in NEW_ROW[5:]]]
+    with pytest.raises(ValueError):
+        pokedex.add_pokemon(row[:-1])
+
+
+def names_of(pkmn):
+    return [name.casefold() for name in pkmn.name.values() if name]
+
+
+@pytest.mark.parametrize('expression, sort, limit, offset, predicate', [
+    ('type:Dragon', None, None, None, lambda p: 'Dragon' in p.type),
+    ('type:Water,Ice attack:90..130', None, None, None, lambda p: {'Water', 'Ice'} & set(p.type) and 90 <= p.attack <= 130),
+    ('speed>=100', '-speed', 5, None, lambda p: p.speed >= 100),
+    ('speed>100 type:Fire', '-speed', 3, 2, lambda p: p.speed > 100 and 'Fire' in p.type),
+    ('hp<30', 'name', None, None, lambda p: p.hp < 30),
+    ('speed=100', '-id', None, 1, lambda p: p.speed == 100),
+    ('defense:..50 sp_attack>=60', 'attack', 10, None, lambda p: p.defense <= 50 and p.sp_attack >= 60),
+    ('name^=Ch', '-name', None, None, lambda p: any(name.startswith('ch') for name in names_of(p))),
+    ('name:pikachu', None, None, None, lambda p: 'pikachu' in names_of(p)),
+    ('type:Grass hp>=60 speed<=80', 'hp', 4, 1, lambda p: 'Grass' in p.type and p.hp >= 60 and p.speed <= 80),
+])
+def test_query_matches_scan(pokedex, expression, sort, limit, offset, predicate):
+    from pokemon import _sort_key
+    key, reverse, _ = _sort_key(sort or 'id')
+    expected = sorted((pkmn for pkmn in pokedex.pokemon if predicate(pkmn)), key=key, reverse=reverse)
+    expected = expected[offset or 0:]
+    if limit is not None:
+        expected = expected[:limit]
+    assert expected
+    assert pokedex.query(expression, sort=sort, limit=limit, offset=offset) == expected
+
+
+def test_import_leaves_heavy_modules_unloaded():
+    code = "import sys, pokemon; print(sorted(m for m in ('pandas', 'matplotlib', 'numpy', 'pyarrow') if m in sys.modules))"
+    output = subprocess.run([sys.executable, '-c', code], cwd=HERE, capture_output=True, text=True, check=True).stdout
+    assert output.strip() == '[]'
+
+
+def test_add_with_int_stats(pokedex, csv_path):
+    pokedex.add_pokemon(['', 'Zed', '', '', '', 'Fire', '', 45, 49, 49, 65, 65, 45])
+    added = pokedex.search_by_name('Zed')
+    assert (added.hp, added.attack, added.speed) == (45, 49, 45)
+    pokedex.compact_journal()
+    _, rows = _read_csv_rows(csv_path)
+    assert rows[-1] == [str(added.id), 'Zed', '', '', '', 'Fire', '', '45', '49', '49', '65', '65', '45']
+
+
+@pytest.fixture
+def json_copy(tmp_path):
+    path = tmp_path / 'pokedex.json'
+    shutil.copy(JSON_PATH, path)
+    return str(path)
+
+
+def index_state(pokedex):
+    return ([pkmn.to_dict() for pkmn in pokedex.pokemon],
+            {key: [pkmn.id for pkmn in matches] for key, matches in pokedex._name_index.items()},
+            pokedex._type_index, pokedex._type_names, pokedex._stat_index, list(pokedex._sorted_ids),
+            pokedex.type_summaries(), [pokedex.type_distribution(p_type, 'speed') for p_type in pokedex.get_all_types()])
+
+
+@pytest.mark.parametrize('columnar', [False, True], ids=['indexed', 'columnar'])
+def test_snapshot_round_trip(json_copy, csv_path, columnar):
+    if columnar:
+        pytest.importorskip('numpy')
+    cold = Pokedex(json_copy, columnar=columnar, snapshot=True, csv_path=csv_path)
+    assert os.path.exists(json_copy + SNAPSHOT_SUFFIX)
+    assert load_snapshot(json_copy) is not None
+    warm = Pokedex(json_copy, columnar=columnar, snapshot=True, csv_path=csv_path)
+    assert index_state(warm) == index_state(cold) == index_state(Pokedex(json_copy, columnar=columnar, csv_path=csv_path))
+    assert warm.search_by_name('pikachu').name['english'] == 'Pikachu'
+    assert as_dicts(warm.search_by_stat_ranges({'speed': (100, 120)})) == as_dicts(cold.search_by_stat_ranges({'speed': (100, 120)}))
+
+
+def test_snapshot_rebuilt_when_source_changes(json_copy, csv_path):
+    Pokedex(json_copy, snapshot=True, csv_path=csv_path)
+    info = os.stat(json_copy)
+    # Only the modification time changed: the digest still matches
+    os.utime(json_copy, ns=(info.st_atime_ns, info.st_mtime_ns + 10 ** 9))
+    assert load_snapshot(json_copy) is not None
+    # Same size, different content
+    records = load_records()
+    speed = records[0]['base']['Speed']
+    records[0]['base']['Speed'] = speed + 1 if speed % 10 != 9 else speed - 1
+    with open(json_copy, 'r', encoding='utf-8') as f:
+        text = f.read()
+    position = text.index(f'"Speed": {speed}')
+    with open(json_copy, 'w', encoding='utf-8') as f:
+        f.write(text[:position] + f'"Speed": {records[0]["base"]["Speed"]}' + text[position + len(f'"Speed": {speed}'):])
+    assert os.path.getsize(json_copy) == info.st_size
+    os.utime(json_copy, ns=(info.st_atime_ns, info.st_mtime_ns + 2 * 10 ** 9))
+    assert load_snapshot(json_copy) is None
+    assert Pokedex(json_copy, snapshot=True, csv_path=csv_path).pokemon[0].speed == records[0]['base']['Speed']
+    assert load_snapshot(json_copy)[0][0].speed == records[0]['base']['Speed']
+    # Different size
+    write_records(json_copy, records[:10])
+    assert load_snapshot(json_copy) is None
+    assert len(Pokedex(json_copy, snapshot=True, csv_path=csv_path).pokemon) == 10
+    assert len(load_snapshot(json_copy)[0]) == 10
+
+
+@pytest.mark.parametrize('damage', ['truncate', 'header', 'garbage', 'empty', 'extend'])
+def test_damaged_snapshot_is_ignored(json_copy, csv_path, damage):
+    Pokedex(json_copy, snapshot=True, csv_path=csv_path)
+    snapshot_path = json_copy + SNAPSHOT_SUFFIX
+    with open(snapshot_path, 'rb') as f:
+        data = f.read()
+    if damage == 'truncate':
+        data = data[:len(data) // 2]
+    elif damage == 'header':
+        data = data[:8] + b'\xff\xff' + data[10:]
+    elif damage == 'garbage':
+        data = data[:200] + bytes(random.Random(0).getrandbits(8) for _ in range(len(data) - 200))
+    elif damage == 'empty':
+        data = b''
+    else:
+        data += b'\0' * 8
+    with open(snapshot_path, 'wb') as f:
+        f.write(data)
+    assert load_snapshot(json_copy) is None
+    expected = [pkmn.to_dict() for pkmn in Pokedex(json_copy, csv_path=csv_path).pokemon]
+    assert [pkmn.to_dict() for pkmn in Pokedex(json_copy, snapshot=True, csv_path=csv_path).pokemon] == expected
+    assert load_snapshot(json_copy) is not None
+
+
+def test_snapshot_keeps_every_type_and_missing_names(tmp_path, csv_path):
+    json_path = str(tmp_path / 'odd.json')
+    records = load_records()[:3]
+    records[0]['type'] = ['Grass', 'Poison', 'Fairy']
+    records[1]['type'] = []
+    records[1]['name']['japanese'] = None
+    del records[2]['name']['french']
+    records[2]['name']['chinese'] = ''
+    write_records(json_path, records)
+    Pokedex(json_path, snapshot=True, csv_path=csv_path)
+    warm = Pokedex(json_path, snapshot=True, csv_path=csv_path)
+    assert load_snapshot(json_path) is not None
+    assert [pkmn.to_dict() for pkmn in warm.pokemon] == records
+    assert [pkmn.id for pkmn in warm.search_by_type('Fairy', None)] == [records[0]['id']]
+
+
+def test_reload_applies_each_remove_once(tmp_path, csv_path):
+    json_path = str(tmp_path / 'pokedex.json')
+    records = load_records()
+    write_records(json_path, records)
+    pokedex = Pokedex(json_path, csv_path=csv_path)
+    pokedex.add_pokemon(list(NEW_ROW))
+    pokedex.remove_pokemon('Bulbasaur')
+    write_records(json_path, [record for record in records if record['name']['english'] != 'Bulbasaur'])
+    pokedex.reload(force=True)
+    assert pokedex.search_by_name('Bulbasaur') is None
+    assert not pokedex._removed
+    # A later edit that restores the name wins, and the added Pokemon stays
+    write_records(json_path, records)
+    assert pokedex.reload(force=True)['inserted'] == 1
+    assert pokedex.search_by_name('Bulbasaur').id == 1
+    assert pokedex.search_by_name('Zed') is not None
+    pokedex.remove_pokemon('Zed')
+    assert not pokedex._added
+    pokedex.reload(force=True)
+    assert pokedex.search_by_name('Zed') is None
+    assert [pkmn.to_dict() for pkmn in pokedex.pokemon] == records
+
+
+def test_add_during_reload(tmp_path, csv_path):
+    json_path = str(tmp_path / 'pokedex.json')
+    shutil.copy(JSON_PATH, json_path)
+    pokedex = Pokedex(json_path, csv_path=csv_path)
+    replay = pokedex._replay_changes
+    calls = []
+    adder = threading.Thread(target=pokedex.add_pokemon, args=(list(NEW_ROW),))
+
+    def replay_and_add(parsed):
+        # The add has to wait for the read lock held here, so it lands between
+        # the comparison and the swap and makes reload compare again
+        calls.append(len(parsed))
+        if len(calls) == 1:
+            adder.start()
+            while not pokedex._journal_lock.locked():
+                time.sleep(0.001)
+        return replay(parsed)
+
+    pokedex._replay_changes = replay_and_add
+    write_records(json_path, edited_records())
+    changes = pokedex.reload(force=True)
+    adder.join()
+    assert len(calls) >= 2
+    assert changes['deleted'] == 1
+    assert pokedex.search_by_name('Zed') is not None
+    assert pokedex.search_by_name('Newmon') is not None
+    assert len({pkmn.id for pkmn in pokedex.pokemon}) == len(pokedex.pokemon) == len(edited_records()) + 1
+    assert sorted(pokedex._by_id) == sorted(pkmn.id for pkmn in pokedex.pokemon)
+
+
+def test_instrumentation_reports_calls_and_restores_methods(csv_path):
+    originals = dict(vars(Pokedex))
+    enable_instrumentation()
+    try:
+        pokedex = Pokedex(JSON_PATH, csv_path=csv_path)
+        pokedex.search_by_stats('speed', 100, 150)
+        pokedex.search_by_stats('speed', 300, 400, quiet=True)
+        assert execute_query(pokedex, {'op': 'stats', 'stat': 'attack', 'min': 0, 'max': 50}) is not None
+        run_batch(pokedex, io.StringIO('{"op": "stats", "stat": "hp", "min": 10, "max": 20}\n'), io.StringIO())
+        pokedex.search_by_name('Pikachu')
+        report = instrumentation_report()
+    finally:
+        final = disable_instrumentation()
+    assert report['search_by_stats']['calls'] == 4
+    assert report['search_by_name']['calls'] == 1
+    assert report['load']['calls'] == 1
+    assert report['load']['bytes_read'] == os.path.getsize(JSON_PATH)
+    for operation in report.values():
+        assert sum(operation['histogram'].values()) == operation['calls']
+        assert operation['max_us'] <= operation['total_ms'] * 1000 + 1e-6
+    assert final == report
+    assert vars(Pokedex) == originals
+    assert not any(hasattr(method, '_instrumented') for method in vars(Pokedex).values())
+    assert instrumentation_report() is None
+    assert disable_instrumentation() is None
+
+
+def test_file_sizes_not_read_without_instrumentation(json_copy, csv_path, tmp_path, monkeypatch):
+    def fail(path):
+        raise AssertionError(f"size of {path} read with instrumentation off")
+
+    monkeypatch.setattr(pokemon, '_file_size', fail)
+    pokedex = Pokedex(json_copy, snapshot=True, csv_path=csv_path)
+    Pokedex(json_copy, snapshot=True, csv_path=csv_path)
+    pokedex.add_pokemon(list(NEW_ROW))
+    pokedex.compact_journal()
+    pokedex.reload(force=True)
+
+
+def english_names(matches):
+    return [pkmn.name['english'] for pkmn in matches]
+
+
+def test_cache_counts_hits_and_misses(pokedex):
+    before = pokedex.cache_stats()
+    first = pokedex.search_by_stats('speed', 50, 60)
+    assert pokedex.search_by_stats('speed', 50, 60) is first
+    assert pokedex.search_by_type('Fire') == pokedex.search_by_type('fire')
+    stats = pokedex.cache_stats()
+    assert stats['misses'] - before['misses'] == 2
+    assert stats['hits'] - before['hits'] == 2
+    assert stats['size'] == before['size'] + 2
+
+
+def test_cache_invalidated_by_add_and_remove(pokedex):
+    fire = english_names(pokedex.search_by_type('Fire'))
+    best = pokedex.search_by_stats('hp', 50, 50)
+    before = pokedex.cache_stats()
+    pokedex.add_pokemon(list(NEW_ROW))
+    assert english_names(pokedex.search_by_type('Fire')) == fire + ['Zed']
+    assert pokedex.search_by_stats('hp', 50, 50) is best
+    assert pokedex.cache_stats()['invalidations'] - before['invalidations'] == 2
+    pokedex.remove_pokemon('Zed')
+    assert english_names(pokedex.search_by_type('Fire')) == fire
+    assert pokedex.cache_stats()['hits'] == before['hits']
+
+
+def test_cache_entries_expire(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    cache = QueryCache(ttl=5)
+    cache.put('key', 0, 'value')
+    now[0] += 4.9
+    assert cache.get('key', 0) == 'value'
+    now[0] += 0.2
+    assert cache.get('key', 0) is _MISSING
+    assert cache.stats() == {'size': 0, 'maxsize': 1024, 'hits': 1, 'misses': 1, 'hit_rate': 0.5,
+                             'evictions': 0, 'invalidations': 1}
+
+
+def test_cache_evicts_least_recently_used():
+    cache = QueryCache(maxsize=2)
+    cache.put('a', 0, 1)
+    cache.put('b', 0, 2)
+    assert cache.get('a', 0) == 1
+    cache.put('c', 0, 3)
+    assert cache.get('b', 0) is _MISSING
+    assert (cache.get('a', 0), cache.get('c', 0)) == (1, 3)
+    assert cache.get('a', 1) is _MISSING
+    stats = cache.stats()
+    assert (stats['size'], stats['evictions'], stats['invalidations']) == (1, 1, 1)
+
+
+def test_pokedex_cache_holds_at_most_cache_size(csv_path):
+    pokedex = Pokedex(JSON_PATH, csv_path=csv_path, cache_size=3)
+    for low in range(0, 100, 10):
+        pokedex.search_by_stats('attack', low, low + 9)
+    stats = pokedex.cache_stats()
+    assert (stats['size'], stats['evictions']) == (3, 7)
+    pokedex.search_by_stats('attack', 0, 9)
+    assert pokedex.cache_stats()['hits'] == 0
+
+
+def test_cache_size_zero_disables_cache(csv_path):
+    pokedex = Pokedex(JSON_PATH, csv_path=csv_path, cache_size=0)
+    cached = Pokedex(JSON_PATH, csv_path=csv_path)
+    for _ in range(3):
+        assert pokedex.search_by_stats('defense', 80, 90) is not None
+        assert english_names(pokedex.search_by_type('Grass OR Bug')) == english_names(cached.search_by_type('Grass OR Bug'))
+    stats = pokedex.cache_stats()
+    assert (stats['size'], stats['hits'], stats['misses']) == (0, 0, 6)
+
+
+def test_cached_type_query_samples_each_call(pokedex):
+    random.seed(7)
+    water = set(english_names(pokedex.search_by_type('Water')))
+    samples = {tuple(english_names(pokedex.search_by_type('Water', 3))) for _ in range(20)}
+    assert len(samples) > 1
+    assert all(len(sample) == 3 and set(sample) <= water for sample in samples)
+    assert pokedex.cache_stats()['hits'] >= 20
+
+
+def all_pages(page, page_size):
+    pages, cursor = [], None
+    while True:
+        matches, cursor = page(page_size, cursor)
+        assert len(matches) <= page_size
+        pages.append(matches)
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize('page_size', [1, 7, 10 ** 4])
+def test_pages_concatenate_to_full_result(pokedex, page_size):
+    by_id = sorted(pokedex.pokemon, key=lambda pkmn: pkmn.id)
+    water_or_ice = [pkmn for pkmn in by_id if {'Water', 'Ice'} & set(pkmn.type)]
+    strong = [pkmn for pkmn in by_id if 80 <= pkmn.attack <= 120]
+    pages = all_pages(lambda size, cursor: pokedex.page_by_type('water OR Ice', size, cursor=cursor), page_size)
+    assert [pkmn for page in pages for pkmn in page] == water_or_ice == list(pokedex.iter_by_type(['Water', 'Ice'], 'or'))
+    pages = all_pages(lambda size, cursor: pokedex.page_by_stats('Attack', 80, 120, size, cursor=cursor), page_size)
+    assert [pkmn for page in pages for pkmn in page] == strong == list(pokedex.iter_by_stats('attack', 80, 120))
+
+
+def test_cursor_survives_add_and_remove(pokedex):
+    first, cursor = pokedex.page_by_type('Fire', 10)
+    fire = [pkmn for pkmn in sorted(pokedex.pokemon, key=lambda pkmn: pkmn.id) if 'Fire' in pkmn.type]
+    pokedex.remove_pokemon(first[3].name['english'])
+    pokedex.remove_pokemon(fire[15].name['english'])
+    pokedex.add_pokemon(list(NEW_ROW))
+    resumed = list(pokedex.iter_by_type('Fire', cursor=cursor))
+    expected = [pkmn for pkmn in sorted(pokedex.pokemon, key=lambda pkmn: pkmn.id)
+                if 'Fire' in pkmn.type and pkmn.id > first[-1].id]
+    assert resumed == expected
+    assert fire[15] not in resumed
+    assert resumed[-1].name['english'] == 'Zed'
+    page, _ = pokedex.page_by_type('Fire', 5, cursor=cursor)
+    assert page == expected[:5]
+
+
+def garbled(payload):
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+@pytest.mark.parametrize('make_cursor', [
+    lambda pokedex: pokedex.page_by_type('Water', 2)[1],
+    lambda pokedex: pokedex.page_by_type('Fire', 2, operator='or')[1],
+    lambda pokedex: pokedex.page_by_stats('speed', 0, 50, 2)[1],
+    lambda pokedex: 'not a cursor',
+    lambda pokedex: garbled('{"query": ["type", "and", ["fire"]]'),
+    lambda pokedex: garbled('{"query": ["type", "and", ["fire"]]}'),
+    lambda pokedex: garbled('{"query": ["type", "and", ["fire"]], "after": "x"}'),
+    lambda pokedex: garbled('[1, 2]'),
+    lambda pokedex: 'café',
+], ids=['other-type', 'other-operator', 'other-op', 'not-base64', 'truncated', 'no-position', 'bad-position',
+        'not-object', 'not-ascii'])
+def test_mismatched_or_garbled_cursor(pokedex, make_cursor):
+    cursor = make_cursor(pokedex)
+    with pytest.raises(ValueError):
+        pokedex.page_by_type('Fire', 2, cursor=cursor)
+    with pytest.raises(ValueError):
+        pokedex.iter_by_type('Fire', cursor=cursor)
+
+
+def test_page_size_must_be_positive(pokedex):
+    with pytest.raises(ValueError):
+        pokedex.page_by_type('Fire', 0)
+
+
+@pytest.mark.parametrize('k', [0, 1, 5, 10, 25])
+def test_reservoir_sample_size_and_members(k):
+    items = list(range(100, 110))
+    sample = reservoir_sample(iter(items), k, random.Random(k))
+    assert len(sample) == min(k, len(items))
+    assert len(set(sample)) == len(sample)
+    assert set(sample) <= set(items)
+
+
+def test_reservoir_sample_reaches_every_item():
+    rng = random.Random(3)
+    seen = {item for _ in range(300) for item in reservoir_sample(range(20), 3, rng)}
+    assert seen == set(range(20))
+
+
+def test_samples_come_from_matches(pokedex):
+    rng = random.Random(5)
+    grass = set(english_names(pokedex.search_by_type('Grass')))
+    fast = set(english_names(pokedex.search_by_stat_ranges({'speed': (100, None)})))
+    sample = english_names(pokedex.sample_by_type('grass', 8, rng=rng))
+    assert len(sample) == len(set(sample)) == 8 and set(sample) <= grass
+    sample = english_names(pokedex.sample_by_stats('Speed', 100, None, 8, rng=rng))
+    assert len(sample) == len(set(sample)) == 8 and set(sample) <= fast
+    assert pokedex.sample_by_type('Fire AND Fairy AND Ghost', 3) == []
+
+
+@pytest.mark.parametrize('text', ['[1, 23456, 7]', '[-1.5e+10,2.25, 0 ,true,null, "x", 123456789]', '[12345678]', '[]'])
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 5, 8])
+def test_iter_records_across_chunk_boundaries(tmp_path, text, chunk_size):
+    path = tmp_path / 'values.json'
+    path.write_text(text, encoding='utf-8')
+    assert list(_iter_records(str(path), chunk_size)) == json.loads(text)
+
+
+@pytest.mark.parametrize('chunk_size', [2, 7, 64, 1000])
+def test_iter_pokemon_small_chunks_match_json_load(chunk_size):
+    assert [pkmn.to_dict() for pkmn in iter_pokemon(JSON_PATH, chunk_size)] == load_records()
+
+
+def pairs_of(pokedex):
+    rng = random.Random(11)
+    pokemon = pokedex.pokemon
+    pairs = [(pokemon[0], pokemon[0]), (pokemon[0], pokemon[1])]
+    return pairs + [(rng.choice(pokemon), rng.choice(pokemon)) for _ in range(25)]
+
+
+def test_compare_stats_matches_compare_pokemon(pokedex, capsys):
+    for first, second in pairs_of(pokedex):
+        comparison = pokedex.compare_stats(first, second)
+        pokedex.compare_pokemon(first, second)
+        lines = capsys.readouterr().out.splitlines()[2:]
+        name1, name2 = first.name['english'], second.name['english']
+        assert (comparison['first'], comparison['second']) == (name1, name2)
+        assert len(lines) == len(STATS)
+        for stat, line in zip(STATS, lines):
+            value1, value2 = getattr(first, stat), getattr(second, stat)
+            result = comparison['stats'][stat]
+            assert (result['first'], result['second'], result['delta']) == (value1, value2, value1 - value2)
+            if value1 > value2:
+                assert result['winner'] == 'first'
+                assert line == f"{name1} has higher {stat}: {value1} vs {value2}"
+            elif value1 < value2:
+                assert result['winner'] == 'second'
+                assert line == f"{name2} has higher {stat}: {value2} vs {value1}"
+            else:
+                assert result['winner'] == 'tie'
+                assert line == f"{name1} and {name2} have the same {stat}: {value1}"
+        winners = [comparison['stats'][stat]['winner'] for stat in STATS]
+        assert (comparison['wins'], comparison['losses'], comparison['ties']) == \
+            (winners.count('first'), winners.count('second'), winners.count('tie'))
+
+
+def assert_matrix_matches_pairwise(pokedex, matrix, rows, columns):
+    assert matrix['first_ids'] == [pkmn.id for pkmn in rows]
+    assert matrix['second_ids'] == [pkmn.id for pkmn in columns]
+    assert matrix['deltas'].shape == (len(rows), len(columns), len(STATS))
+    for i, first in enumerate(rows):
+        for j, second in enumerate(columns):
+            comparison = pokedex.compare_stats(first, second)
+            assert matrix['deltas'][i, j].tolist() == [comparison['stats'][stat]['delta'] for stat in STATS]
+            assert (matrix['wins'][i, j], matrix['losses'][i, j], matrix['ties'][i, j]) == \
+                (comparison['wins'], comparison['losses'], comparison['ties'])
+
+
+def test_comparison_matrix_matches_pairwise(pokedex):
+    pytest.importorskip('numpy')
+    rng = random.Random(12)
+    rows, columns = rng.sample(pokedex.pokemon, 12), rng.sample(pokedex.pokemon, 9)
+    assert_matrix_matches_pairwise(pokedex, pokedex.comparison_matrix(rows, columns), rows, columns)
+    assert_matrix_matches_pairwise(pokedex, pokedex.comparison_matrix(rows), rows, rows)
+    matrix = pokedex.comparison_matrix(None, columns)
+    everyone = [pokedex._by_id[pkmn_id] for pkmn_id in matrix['first_ids']]
+    assert sorted(matrix['first_ids']) == sorted(pkmn.id for pkmn in pokedex.pokemon)
+    assert_matrix_matches_pairwise(pokedex, matrix, everyone, columns)
+
+
+def brute_force_nearest(pokedex, target, metric, p_type=None):
+    candidates = pokedex.pokemon
+    if p_type is not None:
+        allowed = {pkmn.id for pkmn in pokedex.search_by_type(p_type)}
+        candidates = [pkmn for pkmn in candidates if pkmn.id in allowed]
+    scale = [1.0] * len(STATS)
+    if metric == 'normalized':
+        count = len(pokedex.pokemon)
+        for i, stat in enumerate(STATS):
+            mean = sum(getattr(pkmn, stat) for pkmn in pokedex.pokemon) / count
+            deviation = (sum((getattr(pkmn, stat) - mean) ** 2 for pkmn in pokedex.pokemon) / count) ** 0.5
+            scale[i] = deviation or 1.0
+    squared = ((sum(((getattr(pkmn, stat) - getattr(target, stat)) / scale[i]) ** 2 for i, stat in enumerate(STATS)), pkmn)
+               for pkmn in candidates if pkmn.id != target.id)
+    return sorted(squared, key=lambda pair: (pair[0], pair[1].id))
+
+
+def assert_nearest_matches(found, expected, k):
+    # Float32 distances can reorder near-ties, so compare distances rather than identities
+    squared = {pkmn.id: distance for distance, pkmn in expected}
+    assert len(found) == min(k, len(expected))
+    assert len({pkmn.id for pkmn, _ in found}) == len(found)
+    for (pkmn, distance), (expected_squared, _) in zip(found, expected):
+        assert distance ** 2 == pytest.approx(expected_squared, rel=1e-4, abs=0.05)
+        assert squared[pkmn.id] == pytest.approx(expected_squared, rel=1e-4, abs=0.05)
+
+
+@pytest.mark.parametrize('metric', ['euclidean', 'normalized'])
+@pytest.mark.parametrize('p_type', [None, 'Dragon', 'Water OR Ice', 'Fire AND Fairy'])
+def test_nearest_pokemon_matches_brute_force(pokedex, metric, p_type):
+    pytest.importorskip('numpy')
+    targets = random.Random(13).sample(pokedex.pokemon, 6)
+    many = pokedex.nearest_pokemon_many(targets, k=4, metric=metric, p_type=p_type, block_size=4)
+    for target, found in zip(targets, many):
+        expected = brute_force_nearest(pokedex, target, metric, p_type)
+        assert_nearest_matches(found, expected, 4)
+        assert pokedex.nearest_pokemon(target, k=4, metric=metric, p_type=p_type) == found
+
+
+def test_nearest_pokemon_rejects_unknown_metric(pokedex):
+    pytest.importorskip('numpy')
+    with pytest.raises(ValueError):
+        pokedex.nearest_pokemon(pokedex.pokemon[0], metric='cosine')
+
+
+def test_nearest_pokemon_sees_adds_and_removes(pokedex):
+    pytest.importorskip('numpy')
+    target = pokedex.search_by_name('Pikachu')
+    before = pokedex.nearest_pokemon(target, k=3)
+    twin = ['', 'Twin', '', '', '', 'Rock', ''] + [str(getattr(target, stat)) for stat in STATS]
+    pokedex.add_pokemon(twin)
+    found = pokedex.nearest_pokemon(target, k=3)
+    assert found[0][0].name['english'] == 'Twin' and found[0][1] == pytest.approx(0, abs=0.25)
+    assert_nearest_matches(found, brute_force_nearest(pokedex, target, 'euclidean'), 3)
+    assert pokedex.nearest_pokemon(target, k=1, p_type='Rock')[0][0].name['english'] == 'Twin'
+    pokedex.remove_pokemon('Twin')
+    assert pokedex.nearest_pokemon(target, k=3) == before
+    pokedex.remove_pokemon(before[0][0].name['english'])
+    assert_nearest_matches(pokedex.nearest_pokemon(target, k=3), brute_force_nearest(pokedex, target, 'euclidean'), 3)
+
+
+def scanned_aggregates(pokedex):
+    members = {}
+    for pkmn in pokedex.pokemon:
+        for p_type in pkmn.type:
+            members.setdefault(p_type, []).append(pkmn)
+    summaries, distributions = [], {}
+    for p_type in sorted(members):
+        summary = {'type': p_type, 'count': len(members[p_type])}
+        for stat in STATS + ('total',):
+            values = [sum(getattr(pkmn, s) for s in STATS) if stat == 'total' else getattr(pkmn, stat)
+                      for pkmn in members[p_type]]
+            summary[stat] = {'mean': sum(values) / len(values), 'min': min(values), 'max': max(values)}
+            distributions[p_type, stat] = sorted(collections.Counter(values).items())
+        summaries.append(summary)
+    return summaries, distributions
+
+
+def assert_aggregates_match_scan(pokedex):
+    summaries, distributions = scanned_aggregates(pokedex)
+    assert pokedex.type_summaries() == summaries
+    for summary in summaries:
+        assert pokedex.type_summary(summary['type'].upper()) == summary
+    for (p_type, stat), distribution in distributions.items():
+        assert pokedex.type_distribution(p_type, stat) == distribution
+
+
+def only_holder(pokemon, stat, pick):
+    # The Pokemon of some type that alone holds that type's extreme value of a stat
+    for p_type in sorted({p_type for pkmn in pokemon for p_type in pkmn.type}):
+        members = [pkmn for pkmn in pokemon if p_type in pkmn.type]
+        extreme = pick(getattr(pkmn, stat) for pkmn in members)
+        holders = [pkmn for pkmn in members if getattr(pkmn, stat) == extreme]
+        if len(members) > 1 and len(holders) == 1:
+            return holders[0]
+    raise AssertionError(f"no type has a single holder of its {stat} extreme")
+
+
+def test_type_aggregates_match_scan_after_changes(pokedex):
+    assert_aggregates_match_scan(pokedex)
+    pokedex.remove_pokemon(only_holder(pokedex.pokemon, 'speed', max).name['english'])
+    pokedex.remove_pokemon(only_holder(pokedex.pokemon, 'attack', min).name['english'])
+    assert_aggregates_match_scan(pokedex)
+    pokedex.add_pokemon(list(NEW_ROW))
+    pokedex.add_pokemon(['', 'Stardust', '', '', '', 'Cosmic', '', '1', '255', '2', '254', '3', '253'])
+    assert_aggregates_match_scan(pokedex)
+    assert pokedex.type_summary('cosmic')['count'] == 1
+    pokedex.remove_pokemon('Stardust')
+    pokedex.remove_pokemon('Zed')
+    assert pokedex.type_summary('Cosmic') is None
+    assert pokedex.type_distribution('Cosmic', 'speed') == []
+    assert_aggregates_match_scan(pokedex)
+
+
+def test_type_aggregates_after_removing_whole_type(pokedex):
+    counts = collections.Counter(p_type for pkmn in pokedex.pokemon for p_type in pkmn.type)
+    rarest = min(counts, key=lambda p_type: (counts[p_type], p_type))
+    for pkmn in [pkmn for pkmn in pokedex.pokemon if rarest in pkmn.type]:
+        pokedex.remove_pokemon(pkmn.name['english'])
+        assert_aggregates_match_scan(pokedex)
+    assert pokedex.type_summary(rarest) is None
+    assert rarest not in [summary['type'] for summary in pokedex.type_summaries()]
+
+
+def test_render_many_skips_unchanged_charts(tmp_path, csv_path):
+    matplotlib = pytest.importorskip('matplotlib')
+    json_path = str(tmp_path / 'pokedex.json')
+    records = load_records()[:4]
+    write_records(json_path, records)
+    pokedex = Pokedex(json_path, csv_path=csv_path)
+    names = [record['name']['english'] for record in records]
+    out_dir = str(tmp_path / 'charts')
+    backend = dict.__getitem__(matplotlib.rcParams, 'backend')
+    pyplot_loaded = 'matplotlib.pyplot' in sys.modules
+
+    first = pokedex.render_many(names, out_dir, processes=2)
+    assert len(first['rendered']) == 4 and first['skipped'] == []
+    assert sorted(os.listdir(out_dir)) == sorted([RENDER_MANIFEST] + [os.path.basename(path) for path in first['rendered']])
+    assert all(os.path.getsize(path) > 0 for path in first['rendered'])
+    assert pokedex.render_all(out_dir) == {'rendered': [], 'skipped': first['rendered']}
+
+    records[2]['base']['Speed'] += 1
+    write_records(json_path, records)
+    pokedex.reload(force=True)
+    assert pokedex.render_many(names, out_dir, processes=1) == {
+        'rendered': [first['rendered'][2]], 'skipped': [first['rendered'][i] for i in (0, 1, 3)]}
+
+    os.remove(first['rendered'][0])
+    assert pokedex.render_all(out_dir)['rendered'] == [first['rendered'][0]]
+    assert os.path.exists(first['rendered'][0])
+    assert pokedex.render_many([pokedex.search_by_name(names[1])], out_dir)['skipped'] == [first['rendered'][1]]
+
+    assert dict.__getitem__(matplotlib.rcParams, 'backend') == backend
+    assert ('matplotlib.pyplot' in sys.modules) == pyplot_loaded
+    with pytest.raises(ValueError):
+        pokedex.render_many(['Missingno'], out_dir)
+
+
+def brute_force_types(pokedex, types, operator):
+    wanted = [p_type.strip().casefold() for p_type in types]
+    combine = any if operator == 'or' else all
+    return sorted((pkmn for pkmn in pokedex.pokemon
+                   if wanted and combine(p_type in {t.casefold() for t in pkmn.type} for p_type in wanted)),
+                  key=lambda pkmn: pkmn.id)
+
+
+@pytest.mark.parametrize('query, operator, types, expected_operator', [
+    ('Fire', 'and', ['Fire'], 'and'),
+    ('fIRE', 'and', ['Fire'], 'and'),
+    ('Fire AND Flying', 'and', ['Fire', 'Flying'], 'and'),
+    ('water and ice', 'or', ['Water', 'Ice'], 'and'),
+    ('Grass   OR  poison', 'and', ['Grass', 'Poison'], 'or'),
+    ('Dragon OR Fairy OR Ghost', 'and', ['Dragon', 'Fairy', 'Ghost'], 'or'),
+    ('Bug AND Steel AND Flying', 'and', ['Bug', 'Steel', 'Flying'], 'and'),
+    ('Fire AND Shadow', 'and', ['Fire', 'Shadow'], 'and'),
+    ('Fire OR Shadow', 'and', ['Fire', 'Shadow'], 'or'),
+    ('Shadow', 'and', ['Shadow'], 'and'),
+    (['normal', 'FLYING'], 'and', ['Normal', 'Flying'], 'and'),
+    (['Rock', 'ground'], 'OR', ['Rock', 'Ground'], 'or'),
+    ([' Psychic ', 'Shadow'], 'or', ['Psychic', 'Shadow'], 'or'),
+    ([], 'and', [], 'and'),
+    ([], 'or', [], 'or'),
+])
+def test_search_by_type_matches_brute_force(pokedex, query, operator, types, expected_operator):
+    expected = brute_force_types(pokedex, types, expected_operator)
+    assert pokedex.search_by_type(query, None, operator) == expected
+    assert pokedex.search_by_type(query, operator=operator) == expected
+    ids = {pkmn.id for pkmn in expected}
+    for limit in (0, 1, 5, len(expected) + 3):
+        sample = pokedex.search_by_type(query, limit, operator)
+        assert len(sample) == min(limit, len(expected))
+        assert len({pkmn.id for pkmn in sample}) == len(sample)
+        assert {pkmn.id for pkmn in sample} <= ids
+
+
+@pytest.mark.parametrize('query, operator', [('Fire AND Water OR Ice', 'and'), ('Fire', 'xor'), (['Fire'], 'nand')])
+def test_search_by_type_rejects_bad_operators(pokedex, query, operator):
+    with pytest.raises(ValueError):
+        pokedex.search_by_type(query, None, operator)
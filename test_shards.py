@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from pokemon import Pokedex
+from shards import ShardedPokedex
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+JSON_PATH = os.path.join(HERE, 'pokedex.json')
+
+
+@pytest.fixture(scope='module')
+def pokedex():
+    return Pokedex(JSON_PATH)
+
+
+@pytest.fixture(scope='module', params=['range', 'hash'])
+def sharded(request):
+    with ShardedPokedex(JSON_PATH, shards=3, partition=request.param) as sharded:
+        yield sharded
+
+
+def ids(pokemon):
+    return [pkmn.id for pkmn in pokemon]
+
+
+@pytest.mark.parametrize('name', ['Pikachu', 'pikachu', 'ピカチュウ', 'Dracaufeu', 'Mew', 'Missingno', ''])
+def test_search_by_name(sharded, pokedex, name):
+    expected = pokedex.search_by_name(name)
+    found = sharded.search_by_name(name)
+    assert (found and found.to_dict()) == (expected and expected.to_dict())
+
+
+@pytest.mark.parametrize('query', ['Fire', 'water', 'Fire AND Flying', 'Water OR Ice', ['Grass', 'Poison'], 'Unknown'])
+def test_search_by_type(sharded, pokedex, query):
+    expected = ids(pokedex.search_by_type(query, None))
+    assert ids(sharded.search_by_type(query, None)) == expected
+    sample = ids(sharded.search_by_type(query, 5))
+    assert len(sample) == min(5, len(expected))
+    assert len(set(sample)) == len(sample)
+    assert set(sample) <= set(expected)
+
+
+@pytest.mark.parametrize('stat, stat_min, stat_max', [
+    ('speed', 100, 150), ('HP', None, 30), ('Sp. Attack', 150, None), ('attack', 200, 100), ('defense', None, None)])
+def test_search_by_stats(sharded, pokedex, stat, stat_min, stat_max):
+    expected = pokedex.search_by_stats(stat, stat_min, stat_max)
+    found = sharded.search_by_stats(stat, stat_min, stat_max)
+    assert (found and found.to_dict()) == (expected and expected.to_dict())
+
+
+def test_bad_query_leaves_workers_running(sharded):
+    with pytest.raises(TypeError):
+        sharded.search_by_stats('speed', '1', 2)
+    with pytest.raises(ValueError):
+        sharded.search_by_stats('luck', 1, 2)
+    assert sharded.search_by_name('Pikachu').name['english'] == 'Pikachu'
+    assert sharded.search_by_stats('speed', 1, 255) is not None
+    assert all(worker.is_alive() for worker in sharded._workers)